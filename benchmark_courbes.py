@@ -0,0 +1,85 @@
+"""
+Comparaison des deux analyseurs de CSV de courbes sur les fichiers livrés.
+
+    python benchmark_courbes.py [nombre_repetitions]
+
+- ligne_a_ligne : ancien analyseur de /Courbe/CsvVersJson (csv.reader, conversion cellule par cellule)
+- numpy         : lire_courbe_colonnes (conversion en bloc puis np.loadtxt)
+"""
+import csv
+import glob
+import os
+import sys
+import time
+
+from main import DOSSIER_BASE, DOSSIER_COURBES, lire_courbe_colonnes, courbe_format_lignes
+
+
+def lire_csv_ligne_a_ligne(chemin_fichier):
+    """Reproduction de l'ancien analyseur (résultat au format ligne par ligne)."""
+    result = {"metadata": [], "data": []}
+    with open(chemin_fichier, 'r', encoding='utf-8') as file:
+        types_line = next(csv.reader(file, delimiter=';'))
+        file.seek(0)
+        csv_reader = csv.reader(file, delimiter=';')
+        headers = next(csv_reader)
+        for row in csv_reader:
+            if len(row) != len(headers):
+                continue
+            row_dict = {}
+            for i, value in enumerate(row):
+                if not value.strip():
+                    row_dict[f"CSV..{headers[i]}.."] = None
+                    continue
+                try:
+                    type_champ = types_line[i] if i < len(types_line) else "string"
+                    if type_champ == "number":
+                        if '.' in value:
+                            row_dict[f"CSV..{headers[i]}.."] = float(value)
+                        else:
+                            row_dict[f"CSV..{headers[i]}.."] = int(value)
+                    else:
+                        row_dict[f"CSV..{headers[i]}.."] = value
+                except Exception:
+                    row_dict[f"CSV..{headers[i]}.."] = value
+            result["data"].append(row_dict)
+    return result
+
+
+def lire_csv_numpy(chemin_fichier):
+    return lire_courbe_colonnes(chemin_fichier)
+
+
+def lire_csv_numpy_lignes(chemin_fichier):
+    return courbe_format_lignes(*lire_courbe_colonnes(chemin_fichier))
+
+
+def mesurer(fonction, chemin, repetitions):
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        fonction(chemin)
+    return (time.perf_counter() - debut) / repetitions
+
+
+def main():
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    fichiers = sorted(glob.glob(os.path.join(DOSSIER_COURBES, '*.csv')))
+    fichiers += sorted(glob.glob(os.path.join(DOSSIER_BASE, 'Mesure simple *.csv')))
+
+    print(f"{'Fichier':<45} {'Lignes':>7} {'ligne_a_ligne':>14} {'numpy':>10} {'numpy+dict':>11} {'Gain':>7}")
+    total_ancien = total_numpy = 0.0
+    for chemin in fichiers:
+        nb_lignes = len(lire_courbe_colonnes(chemin)[1][0])
+        ancien = mesurer(lire_csv_ligne_a_ligne, chemin, repetitions)
+        rapide = mesurer(lire_csv_numpy, chemin, repetitions)
+        rapide_lignes = mesurer(lire_csv_numpy_lignes, chemin, repetitions)
+        total_ancien += ancien
+        total_numpy += rapide
+        print(f"{os.path.basename(chemin)[:45]:<45} {nb_lignes:>7} {ancien * 1000:>12.1f}ms "
+              f"{rapide * 1000:>8.1f}ms {rapide_lignes * 1000:>9.1f}ms {ancien / rapide:>6.1f}x")
+    print(f"{'TOTAL':<45} {'':>7} {total_ancien * 1000:>12.1f}ms {total_numpy * 1000:>8.1f}ms "
+          f"{'':>11} {total_ancien / total_numpy:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,82 +1,1131 @@
-from flask import Flask, request, jsonify, make_response
+from flask import Flask, request, g, jsonify, make_response, Response, stream_with_context, send_file, has_request_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from dotenv import load_dotenv
+import numpy as np
 import sqlite3
 import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import queue
+import random
+import fnmatch
+import bisect
 import os
+import sys
+import threading
+import time
+import atexit
+import base64
+import json
+import re
+import itertools
+import io
+import hashlib
+import shutil
+from datetime import datetime
+import zlib
+import codecs
+from collections import OrderedDict
+from functools import wraps
+from contextlib import contextmanager
 
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
-
-# Chargement des variables d'environnement
+# Chargement des variables d'environnement (avant la configuration du logging, qui en dépend)
 load_dotenv()
 
+#======================================================================================================
+# LOGGING
+#
+# Les appels de log ne font que déposer l'enregistrement dans une file en mémoire
+# (QueueHandler) ; un thread d'écriture (QueueListener) le met en forme et l'écrit. Une
+# requête n'attend donc jamais la console ni la mémoire flash. Si la file est pleine,
+# l'enregistrement est abandonné et compté plutôt que de bloquer.
+#
+# Seuls les loggers « acrn » (et acrn.requetes, acrn.sql...) passent par la file : la
+# configuration des autres (racine, werkzeug, gunicorn, application hôte) n'est pas touchée.
+# La file est démarrée par create_app() et par « python main.py », jamais à l'import.
+#
+#   LOG_NIVEAU            niveau par défaut (INFO)
+#   LOG_NIVEAUX           niveaux par sous-système : "acrn.sql=DEBUG,werkzeug=WARNING"
+#   LOG_FORMAT            json (défaut) ou texte
+#   LOG_FICHIER           fichier de log tournant (optionnel, sinon sortie standard)
+#   LOG_TAILLE_FILE       nombre maximal d'enregistrements en attente (10000)
+
+LOG_TAILLE_FILE = int(os.getenv('LOG_TAILLE_FILE', '10000'))
+
+class FormateurJSON(logging.Formatter):
+    """Une ligne JSON par enregistrement ; le dictionnaire extra={'donnees': {...}} est fusionné."""
+
+    def format(self, record):
+        entree = {
+            'date': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'niveau': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        donnees = getattr(record, 'donnees', None)
+        if isinstance(donnees, dict):
+            entree.update(donnees)
+        if record.exc_info:
+            entree['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entree, ensure_ascii=False, default=str)
+
+class QueueHandlerNonBloquant(QueueHandler):
+    """QueueHandler qui abandonne l'enregistrement quand la file est pleine."""
+
+    def __init__(self, file):
+        super().__init__(file)
+        self.perdus = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.perdus += 1
+
+def lire_paires_configuration(valeur):
+    """Lit une variable de la forme "cle=valeur,cle=valeur" en dictionnaire (ordre conservé)."""
+    paires = {}
+    for element in valeur.split(','):
+        if '=' in element:
+            cle, val = element.split('=', 1)
+            paires[cle.strip()] = val.strip()
+    return paires
+
+class ConfigurationLogging:
+    """Installe la file de log sur le logger « acrn » et démarre le thread d'écriture."""
+
+    def __init__(self, nom_logger):
+        self.nom_logger = nom_logger
+        self.file = None
+        self.handler = None
+        self.ecouteur = None
+
+    def demarrer(self):
+        """Démarre la file de log ; sans effet si elle tourne déjà."""
+        if self.ecouteur is not None:
+            return
+        if os.getenv('LOG_FORMAT', 'json').lower() == 'texte':
+            formateur = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        else:
+            formateur = FormateurJSON()
+
+        fichier = os.getenv('LOG_FICHIER')
+        if fichier:
+            sortie = RotatingFileHandler(fichier, maxBytes=1024 * 1024, backupCount=3, encoding='utf-8')
+        else:
+            sortie = logging.StreamHandler()
+        sortie.setFormatter(formateur)
+
+        journal = logging.getLogger(self.nom_logger)
+        if self.handler is not None:
+            journal.removeHandler(self.handler)  # file d'un démarrage précédent (processus père)
+        self.file = queue.Queue(maxsize=LOG_TAILLE_FILE)
+        self.handler = QueueHandlerNonBloquant(self.file)
+        journal.addHandler(self.handler)
+        journal.setLevel(os.getenv('LOG_NIVEAU', 'INFO').upper())
+        # Pas de propagation : un handler installé sur la racine par l'hôte écrirait chaque ligne en double
+        journal.propagate = False
+        for nom, niveau in lire_paires_configuration(os.getenv('LOG_NIVEAUX', '')).items():
+            logging.getLogger(nom).setLevel(niveau.upper())
+
+        self.ecouteur = QueueListener(self.file, sortie, respect_handler_level=True)
+        self.ecouteur.start()
+
+    def arreter(self):
+        """Vide la file puis arrête le thread d'écriture ; les logs suivants reprennent la voie par défaut."""
+        if self.ecouteur is not None:
+            self.ecouteur.stop()
+            for handler in self.ecouteur.handlers:
+                handler.close()
+            self.ecouteur = None
+        if self.handler is not None:
+            journal = logging.getLogger(self.nom_logger)
+            journal.removeHandler(self.handler)
+            journal.propagate = True
+
+    def apres_fork(self):
+        """
+        Redémarre la file dans un processus fils. Le thread d'écriture du père n'existe pas
+        ici et sa file peut avoir été copiée verrouillée : on l'abandonne sans l'arrêter.
+        """
+        if self.ecouteur is not None:
+            for handler in self.ecouteur.handlers:
+                handler.close()
+            self.ecouteur = None
+        self.demarrer()
+
+    def statistiques(self):
+        return {
+            'en_attente': self.file.qsize() if self.file is not None else 0,
+            'perdus': self.handler.perdus if self.handler is not None else 0
+        }
+
+configuration_logging = ConfigurationLogging('acrn')
+atexit.register(configuration_logging.arreter)
+
+logger = logging.getLogger('acrn')
+logger_requetes = logging.getLogger('acrn.requetes')
+logger_sql = logging.getLogger('acrn.sql')
+
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": ["http://localhost:3000", "http://127.0.0.1:3000", "https://acrn.netlify.app"]}})
 DATABASE = os.getenv('DATABASE_URL', './Bdd_Systeme_ACRN.db').replace('sqlite:///', '')
 # DATABASE = os.getenv('DATABASE_URL', 'ACRN_API_REST_EMBARQ/Bdd_Systeme_ACRN_NEW.db').replace('sqlite:///', '')
-DictDesriptionTable = {}  
+
+#======================================================================================================
+# METRIQUES
+#
+# Histogrammes à seuils fixes et compteurs en mémoire, exposés par GET /metrics au format
+# texte Prometheus (ou JSON avec ?format=json). Une observation coûte une recherche
+# dichotomique et deux additions sous verrou : l'instrumentation reste active sur
+# l'appareil. METRIQUES_ACTIVES=0 la désactive entièrement.
+
+METRIQUES_ACTIVES = os.getenv('METRIQUES_ACTIVES', '1').lower() not in ('0', 'false', 'non')
+SEUILS_DUREE = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SEUILS_OCTETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+class Histogramme:
+    __slots__ = ('seuils', 'comptes', 'somme', 'nombre')
+
+    def __init__(self, seuils):
+        self.seuils = seuils
+        self.comptes = [0] * (len(seuils) + 1)  # dernier compartiment : +Inf
+        self.somme = 0.0
+        self.nombre = 0
+
+    def observer(self, valeur):
+        self.comptes[bisect.bisect_left(self.seuils, valeur)] += 1
+        self.somme += valeur
+        self.nombre += 1
+
+def _echapper_etiquette(valeur):
+    return str(valeur).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class RegistreMetriques:
+    """
+    Registre des métriques : nom -> {étiquettes: Histogramme ou valeur de compteur}.
+
+    Les étiquettes sont des tuples (clé, valeur) triés ; leur nombre reste borné car elles ne
+    portent que des noms d'endpoint, de table ou d'opération SQL.
+    """
+
+    def __init__(self, actif):
+        self.actif = actif
+        self._verrou = threading.Lock()
+        self._definitions = {}  # nom -> (type, aide, seuils)
+        self._series = {}
+        self._etiquettes_sql = {}  # requête SQL -> (opération, table)
+        self._requetes = OrderedDict()  # requêtes de lecture/modification distinctes (conseiller d'index)
+
+    def declarer(self, nom, type_metrique, aide, seuils=None):
+        self._definitions[nom] = (type_metrique, aide, seuils)
+        self._series[nom] = {}
+
+    def observer(self, nom, valeur, **etiquettes):
+        if self.actif:
+            self.observer_cle(nom, tuple(sorted(etiquettes.items())), valeur)
+
+    def observer_cle(self, nom, cle, valeur):
+        """Variante de observer() avec des étiquettes déjà mises en forme (chemins fréquents)."""
+        with self._verrou:
+            series = self._series[nom]
+            histogramme = series.get(cle)
+            if histogramme is None:
+                histogramme = series[cle] = Histogramme(self._definitions[nom][2])
+            histogramme.observer(valeur)
+
+    def incrementer(self, nom, valeur=1, **etiquettes):
+        if self.actif:
+            self.incrementer_cle(nom, tuple(sorted(etiquettes.items())), valeur)
+
+    def incrementer_cle(self, nom, cle, valeur=1):
+        with self._verrou:
+            series = self._series[nom]
+            series[cle] = series.get(cle, 0) + valeur
+
+    @contextmanager
+    def chronometre(self, nom, **etiquettes):
+        debut = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observer(nom, time.perf_counter() - debut, **etiquettes)
+
+    def etiquettes_sql(self, sql):
+        """
+        Étiquettes d'une requête SQL, mémorisées par texte de requête : (clé opération+table
+        pour acrn_sql_duree_secondes, clé table pour acrn_sql_lignes_total).
+        """
+        etiquettes = self._etiquettes_sql.get(sql)
+        if etiquettes is None:
+            operation = RE_OPERATION_SQL.match(sql)
+            table = RE_TABLE_SQL.search(sql)
+            operation = operation.group(1).upper() if operation else ''
+            table = table.group(1) if table else ''
+            etiquettes = ((('operation', operation), ('table', table)), (('table', table),))
+            if len(self._etiquettes_sql) >= 1024:
+                self._etiquettes_sql.clear()
+            self._etiquettes_sql[sql] = etiquettes
+            if operation in OPERATIONS_CONSEILLEES:
+                self._noter_requete(sql)
+        return etiquettes
+
+    def _noter_requete(self, sql):
+        # Les listes IN (?, ?, ...) de longueurs différentes ne donnent qu'une seule requête
+        requete = RE_LISTE_IN.sub('IN (?)', ' '.join(sql.split()))
+        with self._verrou:
+            self._requetes[requete] = self._requetes.pop(requete, 0) + 1
+            if len(self._requetes) > REQUETES_DISTINCTES_MAX:
+                self._requetes.popitem(last=False)
+
+    def requetes_distinctes(self):
+        """Requêtes SELECT/UPDATE/DELETE vues depuis le démarrage (les plus récentes en dernier)."""
+        with self._verrou:
+            return list(self._requetes)
+
+    def _instantane(self):
+        with self._verrou:
+            return {nom: {cle: (list(s.comptes), s.somme, s.nombre) if isinstance(s, Histogramme) else s
+                          for cle, s in series.items()}
+                    for nom, series in self._series.items()}
+
+    @staticmethod
+    def _format_etiquettes(cle, supplementaire=None):
+        paires = list(cle) + ([supplementaire] if supplementaire else [])
+        if not paires:
+            return ''
+        texte = ','.join(f'{k}="{_echapper_etiquette(v)}"' for k, v in paires)
+        return '{' + texte + '}'
+
+    def texte_prometheus(self, jauges, compteurs=None):
+        lignes = []
+        for nom, series in self._instantane().items():
+            type_metrique, aide, seuils = self._definitions[nom]
+            lignes.append(f'# HELP {nom} {aide}')
+            lignes.append(f'# TYPE {nom} {type_metrique}')
+            for cle, serie in series.items():
+                if type_metrique != 'histogram':
+                    lignes.append(f'{nom}{self._format_etiquettes(cle)} {serie}')
+                    continue
+                comptes, somme, nombre = serie
+                cumul = 0
+                for seuil, compte in zip(list(seuils) + ['+Inf'], comptes):
+                    cumul += compte
+                    lignes.append(f'{nom}_bucket{self._format_etiquettes(cle, ("le", seuil))} {cumul}')
+                lignes.append(f'{nom}_sum{self._format_etiquettes(cle)} {somme}')
+                lignes.append(f'{nom}_count{self._format_etiquettes(cle)} {nombre}')
+        # Valeurs fournies par l'appelant : jauges, et compteurs tenus hors du registre
+        for type_metrique, valeurs_externes in (('gauge', jauges), ('counter', compteurs or {})):
+            for nom, (aide, valeurs) in valeurs_externes.items():
+                lignes.append(f'# HELP {nom} {aide}')
+                lignes.append(f'# TYPE {nom} {type_metrique}')
+                for etiquettes, valeur in valeurs:
+                    lignes.append(f'{nom}{self._format_etiquettes(tuple(sorted(etiquettes.items())))} {valeur}')
+        return '\n'.join(lignes) + '\n'
+
+    def en_json(self, jauges, compteurs=None):
+        resultat = {}
+        for nom, series in self._instantane().items():
+            type_metrique, _, seuils = self._definitions[nom]
+            resultat[nom] = []
+            for cle, serie in series.items():
+                entree = {'etiquettes': dict(cle)}
+                if type_metrique == 'histogram':
+                    comptes, somme, nombre = serie
+                    entree.update({
+                        'nombre': nombre,
+                        'somme': somme,
+                        'moyenne': somme / nombre if nombre else None,
+                        'compartiments': dict(zip([str(s) for s in seuils] + ['+Inf'], comptes))
+                    })
+                else:
+                    entree['valeur'] = serie
+                resultat[nom].append(entree)
+        for nom, (_, valeurs) in {**jauges, **(compteurs or {})}.items():
+            resultat[nom] = [{'etiquettes': etiquettes, 'valeur': valeur} for etiquettes, valeur in valeurs]
+        return resultat
+
+RE_OPERATION_SQL = re.compile(r'\s*(\w+)')
+RE_TABLE_SQL = re.compile(r'\b(?:FROM|INTO|UPDATE|JOIN)\s+["\[`]?(\w+)', re.IGNORECASE)
+RE_LISTE_IN = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+OPERATIONS_CONSEILLEES = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+REQUETES_DISTINCTES_MAX = int(os.getenv('CONSEILLER_INDEX_REQUETES_MAX', '512'))
+
+metriques = RegistreMetriques(METRIQUES_ACTIVES)
+metriques.declarer('acrn_requete_duree_secondes', 'histogram', 'Durée des requêtes HTTP, corps en flux compris', SEUILS_DUREE)
+metriques.declarer('acrn_requetes_total', 'counter', 'Requêtes HTTP par endpoint et statut')
+metriques.declarer('acrn_reponse_octets', 'histogram', 'Taille des réponses HTTP (hors flux)', SEUILS_OCTETS)
+metriques.declarer('acrn_json_serialisation_secondes', 'histogram', 'Durée de jsonify', SEUILS_DUREE)
+metriques.declarer('acrn_sqlite_ouverture_secondes', 'histogram', 'Ouverture d\'une connexion SQLite, pragmas compris', SEUILS_DUREE)
+metriques.declarer('acrn_sql_duree_secondes', 'histogram', 'Exécution des requêtes SQL par opération et table', SEUILS_DUREE)
+metriques.declarer('acrn_sql_lignes_total', 'counter', 'Lignes lues par table')
+metriques.declarer('acrn_conversion_lignes_secondes', 'histogram', 'Lecture des lignes et conversion en dict (ConvertiRequeteEnJSON)', SEUILS_DUREE)
+metriques.declarer('acrn_csv_analyse_secondes', 'histogram', 'Analyse d\'un CSV de courbe', SEUILS_DUREE)
+metriques.declarer('acrn_csv_octets_total', 'counter', 'Octets de CSV analysés')
+metriques.declarer('acrn_csv_points_total', 'counter', 'Lignes de CSV analysées')
+
+class CurseurMesure(sqlite3.Cursor):
+    """Curseur qui mesure la durée de chaque requête et compte les lignes lues."""
+
+    cle_lignes = (('table', ''),)
+
+    def execute(self, sql, parameters=()):
+        debut = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            cle_duree, self.cle_lignes = metriques.etiquettes_sql(sql)
+            metriques.observer_cle('acrn_sql_duree_secondes', cle_duree, time.perf_counter() - debut)
+
+    def executemany(self, sql, seq_of_parameters):
+        debut = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            cle_duree, self.cle_lignes = metriques.etiquettes_sql(sql)
+            metriques.observer_cle('acrn_sql_duree_secondes', cle_duree, time.perf_counter() - debut)
+
+    def compter_lignes(self, nombre):
+        if nombre:
+            metriques.incrementer_cle('acrn_sql_lignes_total', self.cle_lignes, nombre)
+
+    def fetchone(self):
+        ligne = super().fetchone()
+        self.compter_lignes(ligne is not None)
+        return ligne
+
+    def fetchmany(self, size=None):
+        lignes = super().fetchmany(self.arraysize if size is None else size)
+        self.compter_lignes(len(lignes))
+        return lignes
+
+    def fetchall(self):
+        lignes = super().fetchall()
+        self.compter_lignes(len(lignes))
+        return lignes
+
+class FournisseurJSONMesure(DefaultJSONProvider):
+    """Fournisseur JSON de Flask qui mesure la durée de jsonify par endpoint."""
+
+    def response(self, *args, **kwargs):
+        if not metriques.actif:
+            return super().response(*args, **kwargs)
+        with metriques.chronometre('acrn_json_serialisation_secondes',
+                                   endpoint=(request.endpoint if has_request_context() else None) or 'inconnu'):
+            return super().response(*args, **kwargs)
+
+app.json = FournisseurJSONMesure(app)
+
+#======================================================================================================
+# POOL DE CONNEXIONS SQLITE
+
+# Pragmas appliqués à chaque nouvelle connexion (surchargeables par variables d'environnement)
+PRAGMAS_SQLITE = [
+    ('journal_mode', os.getenv('SQLITE_JOURNAL_MODE', 'WAL')),
+    ('synchronous', os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')),
+    ('mmap_size', os.getenv('SQLITE_MMAP_SIZE', str(64 * 1024 * 1024))),
+    ('cache_size', os.getenv('SQLITE_CACHE_SIZE', '-8000')),
+    ('busy_timeout', os.getenv('SQLITE_BUSY_TIMEOUT', '5000')),
+]
+INTERVALLE_VERIFICATION_CONNEXION = float(os.getenv('SQLITE_INTERVALLE_VERIFICATION', '30'))
+TAILLE_MAX_CONNEXIONS_LIBRES = int(os.getenv('SQLITE_CONNEXIONS_LIBRES_MAX', '8'))
+
+class ConnexionPoolee(sqlite3.Connection):
+    """
+    Connexion SQLite réutilisable : close() rend la connexion au pool au lieu de la fermer.
+
+    La connexion étant partagée par toutes les fonctions d'un même thread, close() ne touche
+    pas à la transaction en cours (une fonction utilitaire appelée au milieu d'une écriture
+    ne doit pas l'annuler). Les transactions restées ouvertes sont annulées en fin de
+    requête par PoolConnexions.nettoyer(). fermer() ferme réellement la connexion.
+    """
+
+    def close(self):
+        pass
+
+    def commit(self):
+        if not self.in_transaction:
+            return super().commit()
+        # Relevé pour cache_reponses : le verrou d'écriture est tenu, aucune autre connexion ne
+        # valide entre la première lecture et notre commit ; le data_version de cette connexion
+        # ne change ensuite que si une AUTRE connexion valide avant la seconde lecture.
+        avant = version_donnees.lire()
+        data_version = self.execute('PRAGMA data_version').fetchone()[0]
+        super().commit()
+        apres = version_donnees.lire()
+        seul = self.execute('PRAGMA data_version').fetchone()[0] == data_version
+        cache_reponses.noter_commit(avant, apres if seul else None)
+
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = CurseurMesure if metriques.actif else sqlite3.Cursor
+        return super().cursor(factory)
+
+    # Connection.execute() n'appelle pas cursor() : on repasse par lui pour la mesure
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def fermer(self):
+        super().close()
+
+class PoolConnexions:
+    """
+    Pool de connexions persistantes, une par thread de travail.
+
+    Chaque thread garde sa connexion d'une requête à l'autre. Les connexions des threads
+    terminés (le serveur de développement crée un thread par requête) sont récupérées
+    dans une liste de connexions libres pour être confiées au thread suivant.
+    """
+
+    def __init__(self, chemin_base, pragmas):
+        self.chemin_base = chemin_base
+        self.pragmas = pragmas
+        self._local = threading.local()
+        self._verrou = threading.Lock()
+        self._attribuees = {}  # thread -> connexion
+        self._libres = []
+
+    def _ouvrir(self):
+        with metriques.chronometre('acrn_sqlite_ouverture_secondes'):
+            conn = sqlite3.connect(self.chemin_base, factory=ConnexionPoolee, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            for nom, valeur in self.pragmas:
+                try:
+                    conn.execute(f"PRAGMA {nom} = {valeur}")
+                except sqlite3.Error as e:
+                    logger.warning(f"Pragma {nom}={valeur} refusé : {str(e)}")
+        return conn
+
+    @staticmethod
+    def _est_saine(conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _recuperer_connexions_orphelines(self):
+        # Appelé sous verrou : récupère les connexions des threads qui n'existent plus
+        for thread in [t for t in self._attribuees if not t.is_alive()]:
+            conn = self._attribuees.pop(thread)
+            if conn.in_transaction:
+                conn.rollback()
+            if len(self._libres) < TAILLE_MAX_CONNEXIONS_LIBRES:
+                self._libres.append(conn)
+            else:
+                conn.fermer()
+
+    def obtenir(self):
+        conn = getattr(self._local, 'conn', None)
+        maintenant = time.monotonic()
+
+        if conn is not None:
+            if maintenant - self._local.derniere_verification < INTERVALLE_VERIFICATION_CONNEXION:
+                return conn
+            if self._est_saine(conn):
+                self._local.derniere_verification = maintenant
+                return conn
+            logger.warning("Connexion SQLite invalide, réouverture")
+            self._liberer_thread_courant(fermer=True)
+            conn = None
+
+        with self._verrou:
+            self._recuperer_connexions_orphelines()
+            while self._libres and conn is None:
+                candidate = self._libres.pop()
+                if self._est_saine(candidate):
+                    conn = candidate
+                else:
+                    candidate.fermer()
+
+        if conn is None:
+            conn = self._ouvrir()
+
+        with self._verrou:
+            self._attribuees[threading.current_thread()] = conn
+        self._local.conn = conn
+        self._local.derniere_verification = maintenant
+        return conn
+
+    def _liberer_thread_courant(self, fermer=False):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._verrou:
+            self._attribuees.pop(threading.current_thread(), None)
+        if fermer:
+            try:
+                conn.fermer()
+            except sqlite3.Error:
+                pass
+
+    def nettoyer(self):
+        """Annule la transaction laissée ouverte par la requête du thread courant."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and conn.in_transaction:
+            try:
+                conn.rollback()
+            except sqlite3.Error as e:
+                logger.warning(f"Erreur lors de l'annulation d'une transaction : {str(e)}")
+
+    def statistiques(self):
+        with self._verrou:
+            return {'attribuees': len(self._attribuees), 'libres': len(self._libres)}
+
+    def fermer_tout(self):
+        """Ferme toutes les connexions du pool (arrêt du serveur)."""
+        with self._verrou:
+            connexions = list(self._attribuees.values()) + self._libres
+            self._attribuees.clear()
+            self._libres = []
+        for conn in connexions:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+                conn.fermer()
+            except sqlite3.Error as e:
+                logger.warning(f"Erreur lors de la fermeture d'une connexion : {str(e)}")
+        self._local = threading.local()
+
+pool_connexions = PoolConnexions(DATABASE, PRAGMAS_SQLITE)
+atexit.register(pool_connexions.fermer_tout)
 
 def get_db():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return pool_connexions.obtenir()
+
+@app.teardown_request
+def nettoyer_connexion(exception=None):
+    # close() ne fait rien (la connexion est partagée par le thread) : c'est ici, en fin de
+    # requête, qu'une transaction restée ouverte (route interrompue par une exception) est
+    # annulée pour ne pas passer à la requête suivante
+    pool_connexions.nettoyer()
+
+class VersionDonnees:
+    """
+    Compteur de modifications de la base, tous processus confondus.
+
+    Repose sur PRAGMA data_version d'une connexion dédiée qui n'écrit jamais : la valeur
+    change à chaque transaction validée par une autre connexion (API ou logiciel
+    d'acquisition). Lire le compteur ne coûte qu'un PRAGMA, sans parcourir de table.
+    """
+
+    def __init__(self, chemin_base):
+        self.chemin_base = chemin_base
+        self._verrou = threading.Lock()
+        self._conn = None
+        self._data_version = None
+        self._compteur = 0
+
+    def lire(self):
+        """Retourne un entier qui augmente à chaque modification de la base."""
+        with self._verrou:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.chemin_base, check_same_thread=False)
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                self._data_version = data_version
+                self._compteur += 1
+            return self._compteur
+
+    def fermer(self):
+        with self._verrou:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            # data_version n'est comparable que sur une même connexion : la prochaine lecture,
+            # sur une connexion neuve, compte une modification (écritures faites entre-temps)
+            self._data_version = None
+
+version_donnees = VersionDonnees(DATABASE)
+atexit.register(version_donnees.fermer)
+
+#======================================================================================================
 
 #======================================================================================================
 # ROUTES STANDARDS POUR LE LOGICIEL EMBARQUE
 #======================================================================================================
 
 
+#======================================================================================================
+# CATALOGUE DU SCHEMA
+
+class CatalogueSchema:
+    """
+    Cache en mémoire du schéma de la base : tables, colonnes, clé primaire et colonnes NOT NULL.
+
+    Le catalogue est lu une seule fois depuis sqlite_master et PRAGMA table_info. Il n'est
+    relu que si le fichier de la base (ou son -wal) a changé ET que PRAGMA schema_version
+    a évolué : une simple écriture de données ne provoque donc qu'une lecture du PRAGMA.
+    """
+
+    def __init__(self, chemin_base):
+        self.chemin_base = chemin_base
+        self._verrou = threading.Lock()
+        self._tables = {}
+        self._schema_version = None
+        self._empreinte = None
+
+    def _empreinte_fichier(self):
+        # mtime et taille de la base et du journal WAL : un stat() ne coûte presque rien
+        empreinte = []
+        for suffixe in ('', '-wal'):
+            try:
+                st = os.stat(self.chemin_base + suffixe)
+                empreinte.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                empreinte.append(None)
+        return tuple(empreinte)
+
+    @staticmethod
+    def _lire_schema(conn):
+        tables = {}
+        noms = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+        for nom in noms:
+            colonnes = []
+            cle_primaire = None
+            for row in conn.execute(f'PRAGMA table_info("{nom}")'):
+                colonnes.append({
+                    'name': row[1],
+                    'type': row[2],
+                    'not_null': bool(row[3]),
+                    'default_value': row[4],
+                    'primary_key': bool(row[5])
+                })
+                if row[5] == 1 and cle_primaire is None:
+                    cle_primaire = row[1]
+            tables[nom] = {
+                'colonnes': colonnes,
+                'noms_colonnes': frozenset(col['name'] for col in colonnes),
+                'cle_primaire': cle_primaire,
+                'obligatoires': [col['name'] for col in colonnes if col['not_null'] and col['name'] != cle_primaire]
+            }
+        return tables
+
+    def _verifier(self):
+        empreinte = self._empreinte_fichier()
+        if empreinte == self._empreinte:
+            return self._tables
+
+        with self._verrou:
+            if empreinte == self._empreinte:
+                return self._tables
+            conn = get_db()
+            try:
+                version = conn.execute("PRAGMA schema_version").fetchone()[0]
+                if version != self._schema_version:
+                    # Remplacement atomique : les lecteurs gardent l'ancien dictionnaire
+                    self._tables = self._lire_schema(conn)
+                    self._schema_version = version
+                    logger.info(f"Catalogue du schéma chargé ({len(self._tables)} tables, version {version})")
+                self._empreinte = empreinte
+            finally:
+                conn.close()
+        return self._tables
+
+    def invalider(self):
+        with self._verrou:
+            self._empreinte = None
+            self._schema_version = None
+
+    def tables(self):
+        return list(self._verifier())
+
+    def existe(self, nom_table):
+        return nom_table in self._verifier()
+
+    def colonnes(self, nom_table):
+        return list(self._verifier()[nom_table]['colonnes'])
+
+    def noms_colonnes(self, nom_table):
+        return self._verifier()[nom_table]['noms_colonnes']
+
+    def cle_primaire(self, nom_table):
+        return self._verifier()[nom_table]['cle_primaire']
+
+    def colonnes_obligatoires(self, nom_table):
+        return list(self._verifier()[nom_table]['obligatoires'])
+
+catalogue_schema = CatalogueSchema(DATABASE)
+
 def get_tables():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-    tables = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    return tables
+    return catalogue_schema.tables()
 
 def get_table_columns(table_name):
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute(f"PRAGMA table_info({table_name})")
-    columns_info = []
-    for row in cursor.fetchall():
-        technical_name = row[1]
-        columns_info.append({
-            'name': technical_name,
-            'type': row[2],
-            'not_null': bool(row[3]),
-            'default_value': row[4],
-            'primary_key': bool(row[5])
-        })
-    conn.close()
-    return columns_info
-
+    return catalogue_schema.colonnes(table_name)
 
 def get_primary_key(table_name):
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute(f"PRAGMA table_info({table_name})")
-    primary_key = None
-    for row in cursor.fetchall():
-        if row[5] == 1:  # pk column
-            primary_key = row[1]
-            break
-    conn.close()
-    return primary_key
+    return catalogue_schema.cle_primaire(table_name)
+
+#======================================================================================================
+
+#======================================================================================================
+# ETAGS ET REQUETES CONDITIONNELLES
+
+TAILLE_MAX_ETAGS = int(os.getenv('TAILLE_MAX_ETAGS', '1024'))
+
+class RegistreEtags:
+    """
+    ETag connu de chaque lecture (route + paramètres), avec la version des données à laquelle
+    il a été calculé.
+
+    Tant que la base n'a pas été modifiée, un If-None-Match égal à l'ETag connu reçoit un
+    304 sans exécuter la requête ni sérialiser la réponse. Après une modification, la
+    réponse est recalculée une fois : si son contenu est identique, l'ETag aussi et le
+    client reçoit quand même un 304.
+    """
+
+    def __init__(self, taille_max):
+        self.taille_max = taille_max
+        self._verrou = threading.Lock()
+        self._etags = OrderedDict()
+
+    def obtenir(self, cle, version):
+        etag_connu = self._etags.get(cle)
+        if etag_connu is not None and etag_connu[0] == version:
+            return etag_connu[1]
+        return None
+
+    def vider(self):
+        with self._verrou:
+            self._etags.clear()
+
+    def enregistrer(self, cle, version, etag):
+        with self._verrou:
+            self._etags[cle] = (version, etag)
+            self._etags.move_to_end(cle)
+            while len(self._etags) > self.taille_max:
+                self._etags.popitem(last=False)
+
+registre_etags = RegistreEtags(TAILLE_MAX_ETAGS)
+
+def cle_requete():
+    """Clé d'une lecture : route, paramètres de route et paramètres d'URL triés."""
+    return (request.endpoint,
+            tuple(sorted((request.view_args or {}).items())),
+            tuple(sorted(request.args.items(multi=True))))
+
+def etag_contenu(donnees):
+    return hashlib.blake2b(donnees, digest_size=16).hexdigest()
+
+def avec_etag(fonction):
+    """
+    Décorateur des routes de lecture : ETag sur le contenu et réponse 304 sur If-None-Match.
+    Les réponses en flux et les erreurs ne sont pas concernées.
+    """
+    @wraps(fonction)
+    def enveloppe(*args, **kwargs):
+        if request.method != 'GET' or demande_flux():
+            return fonction(*args, **kwargs)
+
+        cle = cle_requete()
+        # Version lue avant l'exécution : une écriture concurrente invalidera l'ETag enregistré.
+        # en_cache reprend la même version, l'ETag enregistré correspond donc au corps servi.
+        version = g.version_donnees = version_donnees.lire()
+        etag_connu = registre_etags.obtenir(cle, version)
+        if etag_connu is not None and request.if_none_match.contains(etag_connu):
+            response = Response(status=304)
+            response.set_etag(etag_connu)
+            response.cache_control.no_cache = True
+            return response
+
+        response = app.make_response(fonction(*args, **kwargs))
+        if response.status_code != 200 or response.is_streamed:
+            return response
+
+        etag = response.get_etag()[0] or etag_contenu(response.get_data())
+        registre_etags.enregistrer(cle, version, etag)
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    return enveloppe
+
+#======================================================================================================
+
+#======================================================================================================
+# CACHE DES REPONSES
+
+# Les lectures sont gardées en mémoire (LRU, plafond en octets), rattachées aux tables lues.
+# Une route d'écriture de l'API invalide les tables qu'elle a écrites, les autres entrées
+# restent servies. La version des données (PRAGMA data_version) sert de garde contre les
+# écritures hors de ce processus (autre worker, logiciel d'acquisition, commit non suivi d'une
+# invalidation) : on ne sait pas quelles tables elles touchent, le cache est donc vidé dès
+# que la version change sans qu'un commit de l'API l'explique. La durée de vie
+# (CACHE_REPONSES_TTL) borne celle des entrées restantes.
+CACHE_REPONSES_TAILLE_MAX = int(os.getenv('CACHE_REPONSES_TAILLE_MAX', str(16 * 1024 * 1024)))
+CACHE_REPONSES_TTL = float(os.getenv('CACHE_REPONSES_TTL', '5'))
+
+class CacheReponses:
+    """
+    Cache LRU/TTL des réponses GET, indexé par table lue.
+
+    _version est la version des données dont le contenu du cache tient compte : elle n'avance
+    sans vider le cache que par invalider(), juste après un commit de l'API que rien d'autre
+    n'a accompagné (relevé de ConnexionPoolee.commit).
+    """
+
+    def __init__(self, taille_max, ttl):
+        self.taille_max = taille_max
+        self.ttl = ttl
+        self._verrou = threading.Lock()
+        self._local = threading.local()
+        self._entrees = OrderedDict()
+        self._par_table = {}
+        self._generations = {}
+        self._version = None
+        self.taille = 0
+        self.succes = 0
+        self.echecs = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.vidages_externes = 0
+
+    def generations(self, tables):
+        """Générations des tables : une écriture pendant le calcul d'une réponse empêche sa mise en cache."""
+        return tuple(self._generations.get(table, 0) for table in tables)
+
+    def noter_commit(self, avant, apres):
+        """Versions des données avant et après le dernier commit du thread (apres None si une autre connexion a validé entre les deux)."""
+        self._local.commit = (avant, apres)
+
+    def _verifier_version(self, version):
+        """
+        Vide le cache si la version a avancé sans explication. Retourne False pour une version
+        plus ancienne que celle du cache (lecture commencée avant une écriture déjà prise en compte).
+        """
+        if self._version is None or version > self._version:
+            if self._version is not None and self._entrees:
+                self._vider()
+                self.vidages_externes += 1
+            self._version = version
+        return version == self._version
+
+    def obtenir(self, cle, version):
+        with self._verrou:
+            if not self._verifier_version(version):
+                self.echecs += 1
+                return None
+            entree = self._entrees.get(cle)
+            if entree is None or entree['expiration'] < time.monotonic():
+                if entree is not None:
+                    self._retirer(cle)
+                self.echecs += 1
+                return None
+            self._entrees.move_to_end(cle)
+            self.succes += 1
+            return entree
+
+    def enregistrer(self, cle, response, tables, generations, version):
+        corps = response.get_data()
+        if len(corps) > self.taille_max // 4:
+            return
+        with self._verrou:
+            if not self._verifier_version(version) or self.generations(tables) != generations:
+                return
+            if cle in self._entrees:
+                self._retirer(cle)
+            self._entrees[cle] = {
+                'corps': corps,
+                'mimetype': response.mimetype,
+                'etag': response.get_etag()[0] or etag_contenu(corps),
+                'tables': tables,
+                'expiration': time.monotonic() + self.ttl
+            }
+            self.taille += len(corps)
+            for table in tables:
+                self._par_table.setdefault(table, set()).add(cle)
+            while self.taille > self.taille_max:
+                self._retirer(next(iter(self._entrees)))
+                self.evictions += 1
+
+    def _retirer(self, cle):
+        entree = self._entrees.pop(cle)
+        self.taille -= len(entree['corps'])
+        for table in entree['tables']:
+            cles = self._par_table.get(table)
+            if cles is not None:
+                cles.discard(cle)
+
+    def invalider(self, *tables):
+        """
+        Supprime les réponses qui ont lu l'une des tables. À appeler juste après le commit de
+        l'écriture : si ce commit est la seule modification depuis la version du cache, la
+        nouvelle version est adoptée et les entrées des autres tables restent valides.
+        """
+        commit = getattr(self._local, 'commit', None)
+        self._local.commit = None
+        with self._verrou:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+                for cle in list(self._par_table.pop(table, ())):
+                    if cle in self._entrees:
+                        self._retirer(cle)
+                        self.invalidations += 1
+            if commit is not None and commit[1] is not None and commit[0] == self._version:
+                self._version = commit[1]
+
+    def _vider(self):
+        for table in list(self._par_table):
+            self._generations[table] = self._generations.get(table, 0) + 1
+        self._entrees.clear()
+        self._par_table.clear()
+        self.taille = 0
+
+    def vider(self):
+        with self._verrou:
+            self._vider()
+
+    def statistiques(self):
+        return {
+            'entrees': len(self._entrees),
+            'octets': self.taille,
+            'octets_max': self.taille_max,
+            'ttl': self.ttl,
+            'succes': self.succes,
+            'echecs': self.echecs,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'vidages_externes': self.vidages_externes
+        }
+
+cache_reponses = CacheReponses(CACHE_REPONSES_TAILLE_MAX, CACHE_REPONSES_TTL)
+
+def en_cache(tables):
+    """
+    Décorateur des routes de lecture : sert la réponse depuis cache_reponses.
+
+    Args:
+        tables (tuple | callable): Tables lues par la route, ou fonction des paramètres de route
+            qui les retourne
+    """
+    def decorateur(fonction):
+        @wraps(fonction)
+        def enveloppe(*args, **kwargs):
+            if request.method != 'GET' or demande_flux():
+                return fonction(*args, **kwargs)
+
+            # La version de la description fait partie de la clé : le metadata en dépend.
+            # La version des données, lue avant l'exécution, vide le cache si elle a changé
+            # sans écriture de l'API (autre worker, logiciel d'acquisition).
+            version = g.get('version_donnees')
+            if version is None:
+                version = version_donnees.lire()
+            cle = cle_requete() + (cache_description.version(),)
+            entree = cache_reponses.obtenir(cle, version)
+            if entree is not None:
+                response = Response(entree['corps'], mimetype=entree['mimetype'])
+                response.set_etag(entree['etag'])
+                return response
+
+            tables_lues = tuple(tables(**kwargs) if callable(tables) else tables)
+            generations = cache_reponses.generations(tables_lues)
+            response = app.make_response(fonction(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                cache_reponses.enregistrer(cle, response, tables_lues, generations, version)
+            return response
+        return enveloppe
+    return decorateur
+
+@app.route('/metrics', methods=['GET'])
+def exposer_metriques():
+    pool = pool_connexions.statistiques()
+    reponses = cache_reponses.statistiques()
+    logs = configuration_logging.statistiques()
+    jauges = {
+        'acrn_sqlite_connexions': ('Connexions SQLite du pool', [
+            ({'etat': 'attribuees'}, pool['attribuees']), ({'etat': 'libres'}, pool['libres'])]),
+        'acrn_cache_reponses_octets': ('Taille du cache des réponses', [({}, reponses['octets'])]),
+        'acrn_logs_perdus': ('Enregistrements de log abandonnés (file pleine)', [({}, logs['perdus'])])
+    }
+    compteurs = {
+        'acrn_cache_reponses_succes_total': ('Succès du cache des réponses', [({}, reponses['succes'])]),
+        'acrn_cache_reponses_echecs_total': ('Échecs du cache des réponses', [({}, reponses['echecs'])]),
+        'acrn_cache_reponses_vidages_externes_total': ('Cache des réponses vidé après une écriture hors API', [({}, reponses['vidages_externes'])])
+    }
+    if request.args.get('format') == 'json':
+        return jsonify(metriques.en_json(jauges, compteurs))
+    return Response(metriques.texte_prometheus(jauges, compteurs), mimetype='text/plain; version=0.0.4')
+
+@app.route('/Cache/Statistiques', methods=['GET'])
+def statistiques_cache():
+    return jsonify({
+        'reponses': cache_reponses.statistiques(),
+        'description': cache_description.statistiques(),
+        'courbes': cache_courbes.statistiques(),
+        'connexions': pool_connexions.statistiques()
+    })
+
+#======================================================================================================
 
 # Middleware pour le logging des requêtes
+#
+# Une ligne par requête (méthode, chemin, statut, durée, taille), écrite après la réponse.
+# Les requêtes réussies sont échantillonnées par route :
+#   LOG_ECHANTILLONNAGE   "motif=taux,..." sur le chemin, ex. "/Courbe/*=0.05,/Capteur/*=0.2"
+#                         (premier motif correspondant ; sinon LOG_TAUX_REQUETES, défaut 1)
+# Les erreurs (statut >= 400) sont toujours journalisées. Le corps de la requête n'est ajouté
+# qu'au niveau DEBUG de acrn.requetes, tronqué à LOG_TAILLE_MAX_CORPS octets.
+
+LOG_TAUX_REQUETES = float(os.getenv('LOG_TAUX_REQUETES', '1'))
+LOG_TAILLE_MAX_CORPS = int(os.getenv('LOG_TAILLE_MAX_CORPS', '512'))
+ECHANTILLONNAGE_ROUTES = [(motif, float(taux)) for motif, taux in lire_paires_configuration(os.getenv('LOG_ECHANTILLONNAGE', '')).items()]
+
+def taux_echantillonnage(chemin):
+    for motif, taux in ECHANTILLONNAGE_ROUTES:
+        if fnmatch.fnmatchcase(chemin, motif):
+            return taux
+    return LOG_TAUX_REQUETES
+
+def corps_tronque():
+    """Corps déjà lu par la route (JSON ou formulaire), tronqué ; None s'il n'est plus disponible."""
+    if request.form:
+        corps = '&'.join(f'{cle}={valeur}' for cle, valeur in request.form.items(multi=True)).encode()
+    else:
+        corps = request.get_data(cache=True)
+    if not corps:
+        return None
+    texte = corps[:LOG_TAILLE_MAX_CORPS].decode('utf-8', errors='replace')
+    return texte + '…' if len(corps) > LOG_TAILLE_MAX_CORPS else texte
+
 @app.before_request
 def log_request_info():
-    logger.info(f"Requête {request.method} sur {request.path}")
-    if request.is_json:
-        logger.info(f"Données JSON: {request.get_json()}")
-    elif request.form:
-        logger.info(f"Données form: {request.form}")
+    g.debut_requete = time.perf_counter()
+    g.log_requete = random.random() < taux_echantillonnage(request.path)
+
+@app.after_request
+def log_request_result(response):
+    if not (getattr(g, 'log_requete', False) or response.status_code >= 400):
+        return response
+    donnees = {
+        'methode': request.method,
+        'chemin': request.path,
+        'statut': response.status_code,
+        'duree_ms': round((time.perf_counter() - g.get('debut_requete', time.perf_counter())) * 1000, 2),
+        'taille': response.content_length
+    }
+    if logger_requetes.isEnabledFor(logging.DEBUG):
+        donnees['corps'] = corps_tronque()
+    niveau = logging.WARNING if response.status_code >= 500 else logging.INFO
+    logger_requetes.log(niveau, f"{request.method} {request.path} {response.status_code}", extra={'donnees': donnees})
+    return response
+
+@app.after_request
+def mesurer_requete(response):
+    if not metriques.actif:
+        return response
+    endpoint = request.endpoint or 'inconnu'
+    methode = request.method
+    debut = g.get('debut_requete', time.perf_counter())
+    metriques.incrementer('acrn_requetes_total', endpoint=endpoint, methode=methode, statut=response.status_code)
+    if response.content_length is not None:
+        metriques.observer('acrn_reponse_octets', response.content_length, endpoint=endpoint)
+    # Mesurée à la fermeture de la réponse, pour inclure l'envoi des réponses en flux
+    response.call_on_close(lambda: metriques.observer(
+        'acrn_requete_duree_secondes', time.perf_counter() - debut, endpoint=endpoint, methode=methode))
+    return response
 
 # Route racine pour lister toutes les tables disponibles
 @app.route('/', methods=['GET'])
@@ -87,6 +1136,7 @@ def list_tables():
     })
 
 @app.route('/profil/<int:idProfil>/droits', methods=['GET'])
+@en_cache(('TableProfils', 'TableDroits', 'TableProfilsDroits'))
 def get_droits_by_profil(idProfil):
     try:
         conn = get_db()
@@ -118,81 +1168,323 @@ def get_droits_by_profil(idProfil):
 # Route pour obtenir la structure d'une table
 @app.route('/<table_name>/structure', methods=['GET'])
 def get_table_structure(table_name):
-    if table_name not in get_tables():
+    if not catalogue_schema.existe(table_name):
         return jsonify({'error': 'Table non trouvée'}), 404
     columns = get_table_columns(table_name)
     return jsonify({
         'columns': columns
     })
 
-# Route GET pour tous les enregistrements d'une table
-@app.route('/<table_name>', methods=['GET'])
-def get_all_records(table_name):
-    if table_name not in get_tables():
-        return jsonify({'error': 'Table non trouvée'}), 404
-    
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute(f"SELECT * FROM {table_name}")
-    records = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return jsonify(records)
+#------------------------------------------------------------------------------------------------------
+# Réponses en flux (NDJSON)
+#
+# Activées par ?stream=1 ou par l'en-tête Accept: application/x-ndjson
 
-# Route GET pour un enregistrement spécifique
-@app.route('/<table_name>/<id>', methods=['GET'])
-def get_record(table_name, id):
-    if table_name not in get_tables():
-        return jsonify({'error': 'Table non trouvée'}), 404
+TAILLE_LOT_FLUX = int(os.getenv('TAILLE_LOT_FLUX', '500'))
 
-    primary_key = get_primary_key(table_name)
-    if not primary_key:
-        return jsonify({'error': 'Clé primaire non trouvée'}), 400
+def demande_flux():
+    """Indique si le client demande une réponse en flux NDJSON."""
+    if request.args.get('stream', '').lower() in ('1', 'true', 'oui'):
+        return True
+    return request.accept_mimetypes.best == 'application/x-ndjson'
 
-    conn = get_db()
-    cursor = conn.cursor()
+def lignes_par_paquets(cursor):
+    """Parcourt un curseur par paquets de TAILLE_LOT_FLUX lignes (fetchmany)."""
+    while True:
+        rows = cursor.fetchmany(TAILLE_LOT_FLUX)
+        if not rows:
+            return
+        yield from rows
 
-    # Si la table est TableProfils, on joint avec le profil d'origine
-    if table_name == "TableProfils":
-        cursor.execute("""
-            SELECT p.*, po.NomProfil AS NomProfilOrigine
-            FROM TableProfils p
-            LEFT JOIN TableProfils po ON p.IdProfilOrigineCopie = po.IdProfil
-            WHERE p.IdProfil = ?
-        """, (id,))
-    else:
-        cursor.execute(f"SELECT * FROM {table_name} WHERE {primary_key} = ?", (id,))
+def reponse_flux(entete, lignes, cursor):
+    """
+    Sérialise des enregistrements en NDJSON : une ligne d'en-tête, puis un enregistrement par ligne.
 
-    record = cursor.fetchone()
-    conn.close()
+    Args:
+        entete (dict): Première ligne envoyée (métadonnées)
+        lignes (iterable): Enregistrements (dict) à envoyer, produits au fil de la lecture
+        cursor (sqlite3.Cursor): Curseur source, fermé en fin de flux ou si le client se déconnecte
+    """
+    def generer():
+        try:
+            yield json.dumps(entete, ensure_ascii=False, default=str) + '\n'
+            lignes_iter = iter(lignes)
+            while True:
+                paquet = list(itertools.islice(lignes_iter, TAILLE_LOT_FLUX))
+                if not paquet:
+                    break
+                yield ''.join(json.dumps(ligne, ensure_ascii=False, default=str) + '\n' for ligne in paquet)
+        finally:
+            cursor.close()
 
-    if record is None:
-        return jsonify({'error': 'Enregistrement non trouvé'}), 404
+    return Response(stream_with_context(generer()), mimetype='application/x-ndjson')
 
-    return jsonify(dict(record))
+#------------------------------------------------------------------------------------------------------
+# Lecture filtrée / paginée des tables
+#
+#   ?fields=Col1,Col2            projection
+#   ?where[Col][op]=valeur       filtre (op : eq, ne, lt, lte, gt, gte, like, in, null)
+#   ?order_by=Col | -Col         tri (descendant avec '-')
+#   ?limit=N&after=<curseur>     pagination par clé (keyset), la réponse porte next_cursor
 
+OPERATEURS_FILTRE = {'eq': '=', 'ne': '!=', 'lt': '<', 'lte': '<=', 'gt': '>', 'gte': '>=', 'like': 'LIKE'}
+RE_PARAMETRE_FILTRE = re.compile(r'^where\[(\w+)\](?:\[(\w+)\])?$')
+LIMITE_MAX_PAGE = int(os.getenv('LIMITE_MAX_PAGE', '1000'))
 
-# Route POST pour créer un enregistrement
-@app.route('/<table_name>', methods=['POST'])
-def create_record(table_name):
-    if table_name not in get_tables():
-        return jsonify({'error': 'Table non trouvée'}), 404
-    
-    data = request.get_json()
-    columns = get_table_columns(table_name)
-    
-    # Vérification des colonnes requises
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute(f"PRAGMA table_info({table_name})")
-    required_columns = [row[1] for row in cursor.fetchall() if row[3] == 1 and row[1] != get_primary_key(table_name)]
-    missing_columns = [col for col in required_columns if col not in data]
+def _encoder_curseur(valeurs):
+    return base64.urlsafe_b64encode(json.dumps(valeurs).encode('utf-8')).decode('ascii')
+
+def _decoder_curseur(curseur):
+    try:
+        valeurs = json.loads(base64.urlsafe_b64decode(curseur.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise ValueError('Curseur invalide')
+    if not isinstance(valeurs, list) or len(valeurs) != 2:
+        raise ValueError('Curseur invalide')
+    return valeurs
+
+def preparer_lecture_table(table_name, args):
+    """
+    Construit la requête SELECT de GET /<table_name> à partir des paramètres d'URL.
+
+    Toutes les colonnes citées sont vérifiées dans le catalogue du schéma et les valeurs
+    sont passées en paramètres liés : aucune donnée du client n'est concaténée au SQL.
+
+    Args:
+        table_name (str): Table existante
+        args (MultiDict): Paramètres de la requête
+
+    Returns:
+        dict: sql, params, champs retournés, colonnes ajoutées pour le curseur, infos de pagination
+
+    Raises:
+        ValueError: Paramètre invalide (colonne inconnue, opérateur non supporté, curseur...)
+    """
+    colonnes_table = catalogue_schema.noms_colonnes(table_name)
+    cle = catalogue_schema.cle_primaire(table_name) or 'rowid'
+
+    def verifier_colonne(col):
+        if col not in colonnes_table and col != cle:
+            raise ValueError(f'Colonne inconnue: {col}')
+        return col
+
+    # Projection
+    if args.get('fields'):
+        champs = [verifier_colonne(c.strip()) for c in args['fields'].split(',') if c.strip()]
+    else:
+        champs = [col['name'] for col in catalogue_schema.colonnes(table_name)]
+
+    # Filtres
+    conditions = []
+    params = []
+    for nom_param in args:
+        correspondance = RE_PARAMETRE_FILTRE.match(nom_param)
+        if not correspondance:
+            continue
+        col = verifier_colonne(correspondance.group(1))
+        op = correspondance.group(2) or 'eq'
+        for valeur in args.getlist(nom_param):
+            if op in OPERATEURS_FILTRE:
+                conditions.append(f'"{col}" {OPERATEURS_FILTRE[op]} ?')
+                params.append(valeur)
+            elif op == 'in':
+                valeurs = valeur.split(',')
+                conditions.append(f'"{col}" IN ({", ".join("?" for _ in valeurs)})')
+                params.extend(valeurs)
+            elif op == 'null':
+                est_null = valeur.lower() in ('1', 'true', 'oui')
+                conditions.append(f'"{col}" IS {"" if est_null else "NOT "}NULL')
+            else:
+                raise ValueError(f'Opérateur de filtre non supporté: {op}')
+
+    # Tri
+    ordre = args.get('order_by')
+    descendant = bool(ordre) and ordre.startswith('-')
+    colonne_tri = verifier_colonne(ordre.lstrip('-')) if ordre else cle
+    sens = 'DESC' if descendant else 'ASC'
+
+    # Pagination par clé : (colonne_tri, clé primaire) strictement après le curseur
+    pagination = 'limit' in args or 'after' in args
+    limite = None
+    if pagination:
+        try:
+            limite = min(int(args.get('limit', LIMITE_MAX_PAGE)), LIMITE_MAX_PAGE)
+        except ValueError:
+            raise ValueError('Le paramètre limit doit être un entier')
+        if limite <= 0:
+            raise ValueError('Le paramètre limit doit être positif')
+        if args.get('after'):
+            comparaison = '<' if descendant else '>'
+            if colonne_tri == cle:
+                conditions.append(f'"{cle}" {comparaison} ?')
+                params.append(args['after'])
+            else:
+                # SQLite classe NULL avant toute valeur (en tête en ASC, en fin en DESC) ; la
+                # comparaison de tuples vaut NULL dès qu'un membre est NULL, d'où les cas explicites
+                valeur, derniere_cle = _decoder_curseur(args['after'])
+                if valeur is None and descendant:
+                    conditions.append(f'("{colonne_tri}" IS NULL AND "{cle}" < ?)')
+                    params.append(derniere_cle)
+                elif valeur is None:
+                    conditions.append(f'("{colonne_tri}" IS NOT NULL OR "{cle}" > ?)')
+                    params.append(derniere_cle)
+                elif descendant:
+                    conditions.append(f'(("{colonne_tri}", "{cle}") < (?, ?) OR "{colonne_tri}" IS NULL)')
+                    params.extend([valeur, derniere_cle])
+                else:
+                    conditions.append(f'("{colonne_tri}", "{cle}") > (?, ?)')
+                    params.extend([valeur, derniere_cle])
+
+    supplementaires = [col for col in dict.fromkeys([colonne_tri, cle]) if pagination and col not in champs]
+    colonnes_sql = ', '.join(f'"{col}"' for col in champs + supplementaires)
+    sql = f'SELECT {colonnes_sql} FROM "{table_name}"'
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    if ordre or pagination:
+        sql += f' ORDER BY "{colonne_tri}" {sens}'
+        if colonne_tri != cle:
+            sql += f', "{cle}" {sens}'
+    if pagination:
+        # Une ligne de plus pour savoir s'il existe une page suivante
+        sql += ' LIMIT ?'
+        params.append(limite + 1)
+
+    return {
+        'sql': sql,
+        'params': params,
+        'champs': champs,
+        'supplementaires': supplementaires,
+        'cle': cle,
+        'colonne_tri': colonne_tri,
+        'pagination': pagination,
+        'limite': limite
+    }
+
+def curseur_suivant(lecture, derniere_ligne):
+    """Calcule next_cursor à partir de la dernière ligne renvoyée."""
+    if lecture['colonne_tri'] == lecture['cle']:
+        return derniere_ligne[lecture['cle']]
+    return _encoder_curseur([derniere_ligne[lecture['colonne_tri']], derniere_ligne[lecture['cle']]])
+
+def ligne_vers_dict(lecture, row):
+    record = dict(row)
+    for col in lecture['supplementaires']:
+        del record[col]
+    return record
+
+def flux_lecture_table(table_name, lecture, cursor):
+    """
+    Réponse NDJSON de GET /<table_name> : en-tête, lignes, puis {"next_cursor": ...} si paginé.
+    """
+    entete = {'metadata': {'table': table_name, 'champs': lecture['champs']}}
+
+    def lignes():
+        rows = lignes_par_paquets(cursor)
+        if not lecture['pagination']:
+            for row in rows:
+                yield ligne_vers_dict(lecture, row)
+            return
+
+        # limit + 1 lignes ont été demandées : la dernière sert uniquement à détecter la page suivante
+        derniere = None
+        for row in itertools.islice(rows, lecture['limite']):
+            derniere = row
+            yield ligne_vers_dict(lecture, row)
+        suite = next(rows, None) is not None
+        yield {'next_cursor': curseur_suivant(lecture, derniere) if suite else None}
+
+    return reponse_flux(entete, lignes(), cursor)
+
+# Route GET pour tous les enregistrements d'une table
+@app.route('/<table_name>', methods=['GET'])
+@avec_etag
+@en_cache(lambda table_name: (table_name,))
+def get_all_records(table_name):
+    if not catalogue_schema.existe(table_name):
+        return jsonify({'error': 'Table non trouvée'}), 404
+
+    try:
+        lecture = preparer_lecture_table(table_name, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute(lecture['sql'], lecture['params'])
+
+    if demande_flux():
+        return flux_lecture_table(table_name, lecture, cursor)
+
+    rows = cursor.fetchall()
+    conn.close()
+
+    if not lecture['pagination']:
+        return jsonify([ligne_vers_dict(lecture, row) for row in rows])
+
+    next_cursor = None
+    if len(rows) > lecture['limite']:
+        rows = rows[:lecture['limite']]
+        next_cursor = curseur_suivant(lecture, rows[-1])
+    return jsonify({
+        'data': [ligne_vers_dict(lecture, row) for row in rows],
+        'next_cursor': next_cursor
+    })
+
+# Route GET pour un enregistrement spécifique
+@app.route('/<table_name>/<id>', methods=['GET'])
+@avec_etag
+@en_cache(lambda table_name, id: (table_name,))
+def get_record(table_name, id):
+    if not catalogue_schema.existe(table_name):
+        return jsonify({'error': 'Table non trouvée'}), 404
+
+    primary_key = get_primary_key(table_name)
+    if not primary_key:
+        return jsonify({'error': 'Clé primaire non trouvée'}), 400
+
+    conn = get_db()
+    cursor = conn.cursor()
+
+    # Si la table est TableProfils, on joint avec le profil d'origine
+    if table_name == "TableProfils":
+        cursor.execute("""
+            SELECT p.*, po.NomProfil AS NomProfilOrigine
+            FROM TableProfils p
+            LEFT JOIN TableProfils po ON p.IdProfilOrigineCopie = po.IdProfil
+            WHERE p.IdProfil = ?
+        """, (id,))
+    else:
+        cursor.execute(f"SELECT * FROM {table_name} WHERE {primary_key} = ?", (id,))
+
+    record = cursor.fetchone()
+    conn.close()
+
+    if record is None:
+        return jsonify({'error': 'Enregistrement non trouvé'}), 404
+
+    return jsonify(dict(record))
+
+
+# Route POST pour créer un enregistrement
+@app.route('/<table_name>', methods=['POST'])
+def create_record(table_name):
+    if not catalogue_schema.existe(table_name):
+        return jsonify({'error': 'Table non trouvée'}), 404
+    
+    data = request.get_json()
+    
+    # Vérification des colonnes requises
+    required_columns = catalogue_schema.colonnes_obligatoires(table_name)
+    missing_columns = [col for col in required_columns if col not in data]
     
     if missing_columns:
-        conn.close()
         return jsonify({
             'error': f'Colonnes manquantes: {", ".join(missing_columns)}'
         }), 400
     
+    conn = get_db()
+    cursor = conn.cursor()
+
     # Construction de la requête SQL
     placeholders = ', '.join(['?' for _ in data])
     columns_str = ', '.join(data.keys())
@@ -200,6 +1492,7 @@ def create_record(table_name):
     
     cursor.execute(f"INSERT INTO {table_name} ({columns_str}) VALUES ({placeholders})", values)
     conn.commit()
+    cache_reponses.invalider(table_name)
     new_id = cursor.lastrowid
     conn.close()
     
@@ -208,7 +1501,7 @@ def create_record(table_name):
 # Route PUT pour mettre à jour un enregistrement
 @app.route('/<table_name>/<id>', methods=['PUT'])
 def update_record(table_name, id):
-    if table_name not in get_tables():
+    if not catalogue_schema.existe(table_name):
         return jsonify({'error': 'Table non trouvée'}), 404
     
     primary_key = get_primary_key(table_name)
@@ -231,6 +1524,7 @@ def update_record(table_name, id):
     
     cursor.execute(f"UPDATE {table_name} SET {set_clause} WHERE {primary_key} = ?", values)
     conn.commit()
+    cache_reponses.invalider(table_name)
     conn.close()
     
     return jsonify({'id': id, **data})
@@ -238,7 +1532,7 @@ def update_record(table_name, id):
 # Route DELETE pour supprimer un enregistrement
 @app.route('/<table_name>/<id>', methods=['DELETE'])
 def delete_record(table_name, id):
-    if table_name not in get_tables():
+    if not catalogue_schema.existe(table_name):
         return jsonify({'error': 'Table non trouvée'}), 404
     
     primary_key = get_primary_key(table_name)
@@ -256,10 +1550,210 @@ def delete_record(table_name, id):
     
     cursor.execute(f"DELETE FROM {table_name} WHERE {primary_key} = ?", (id,))
     conn.commit()
+    cache_reponses.invalider(table_name)
     conn.close()
     
     return '', 204
 
+#------------------------------------------------------------------------------------------------------
+# Écritures par lot
+#
+# POST /<nom_table>/batch reçoit une liste d'opérations, en tableau JSON ou en NDJSON (une
+# opération par ligne, Content-Type application/x-ndjson) :
+#     {"op": "insert", "data": {...}}
+#     {"op": "update", "id": 12, "data": {...}}
+#     {"op": "delete", "id": 12}
+# Les opérations consécutives de même type portant sur les mêmes colonnes sont regroupées
+# en un seul executemany, le tout dans une transaction.
+
+LOT_MAX_OPERATIONS = int(os.getenv('LOT_MAX_OPERATIONS', '10000'))
+MODES_LOT = ('tout', 'ligne')
+
+def lire_operations_lot():
+    """
+    Lit le corps de la requête (tableau JSON ou NDJSON) et retourne la liste des opérations.
+    Lève ValueError si le corps est illisible ou dépasse LOT_MAX_OPERATIONS.
+    """
+    if request.mimetype == 'application/x-ndjson':
+        operations = []
+        for numero, ligne in enumerate(request.stream, start=1):
+            if not ligne.strip():
+                continue
+            try:
+                operations.append(json.loads(ligne))
+            except ValueError:
+                raise ValueError(f'Ligne NDJSON {numero} invalide')
+            if len(operations) > LOT_MAX_OPERATIONS:
+                break
+    else:
+        operations = request.get_json(silent=True)
+        if not isinstance(operations, list):
+            raise ValueError('Le corps doit être un tableau JSON ou un flux NDJSON d\'opérations')
+
+    if len(operations) > LOT_MAX_OPERATIONS:
+        raise ValueError(f'Un lot est limité à {LOT_MAX_OPERATIONS} opérations')
+    return operations
+
+def preparer_operation_lot(table_name, operation):
+    """
+    Valide une opération contre le schéma et retourne (sql, paramètres).
+    Lève ValueError avec un message destiné au client si l'opération est invalide.
+    """
+    if not isinstance(operation, dict):
+        raise ValueError('Une opération doit être un objet JSON')
+    type_op = operation.get('op')
+    if type_op not in ('insert', 'update', 'delete'):
+        raise ValueError('Le champ op doit valoir "insert", "update" ou "delete"')
+
+    colonnes_table = catalogue_schema.noms_colonnes(table_name)
+    primary_key = get_primary_key(table_name)
+    data = operation.get('data', {})
+    if not isinstance(data, dict):
+        raise ValueError('Le champ data doit être un objet JSON')
+    inconnues = [col for col in data if col not in colonnes_table]
+    if inconnues:
+        raise ValueError(f'Colonnes inconnues: {", ".join(inconnues)}')
+
+    if type_op == 'insert':
+        missing_columns = [col for col in catalogue_schema.colonnes_obligatoires(table_name) if col not in data]
+        if missing_columns:
+            raise ValueError(f'Colonnes manquantes: {", ".join(missing_columns)}')
+        if not data:
+            return f'INSERT INTO "{table_name}" DEFAULT VALUES', ()
+        columns_str = ', '.join(f'"{col}"' for col in data)
+        placeholders = ', '.join(['?' for _ in data])
+        return f'INSERT INTO "{table_name}" ({columns_str}) VALUES ({placeholders})', tuple(data.values())
+
+    if not primary_key:
+        raise ValueError('Clé primaire non trouvée')
+    if 'id' not in operation:
+        raise ValueError('Le champ id est requis')
+
+    if type_op == 'update':
+        if not data:
+            raise ValueError('Le champ data ne peut pas être vide')
+        set_clause = ', '.join(f'"{col}" = ?' for col in data)
+        return (f'UPDATE "{table_name}" SET {set_clause} WHERE "{primary_key}" = ?',
+                tuple(data.values()) + (operation['id'],))
+
+    return f'DELETE FROM "{table_name}" WHERE "{primary_key}" = ?', (operation['id'],)
+
+def _executer_groupe_lot(cursor, sql, groupe):
+    """
+    Exécute un groupe (liste de (index, paramètres)) en un executemany, sous un point de
+    sauvegarde. En cas d'échec, le groupe est annulé puis rejoué ligne par ligne pour
+    identifier les opérations fautives ; les lignes valides restent appliquées.
+
+    Returns:
+        list: erreurs [{'index', 'error'}], vide si tout le groupe est passé
+    """
+    verifier_lignes = not sql.startswith('INSERT')
+    cursor.execute("SAVEPOINT lot_groupe")
+    try:
+        cursor.executemany(sql, [params for _, params in groupe])
+        if not verifier_lignes or cursor.rowcount == len(groupe):
+            cursor.execute("RELEASE lot_groupe")
+            return []
+    except sqlite3.Error:
+        pass
+    cursor.execute("ROLLBACK TO lot_groupe")
+
+    erreurs = []
+    for index, params in groupe:
+        cursor.execute("SAVEPOINT lot_ligne")
+        try:
+            cursor.execute(sql, params)
+            if verifier_lignes and cursor.rowcount == 0:
+                cursor.execute("ROLLBACK TO lot_ligne")
+                erreurs.append({'index': index, 'error': 'Enregistrement non trouvé'})
+        except sqlite3.Error as e:
+            cursor.execute("ROLLBACK TO lot_ligne")
+            erreurs.append({'index': index, 'error': str(e)})
+        cursor.execute("RELEASE lot_ligne")
+    cursor.execute("RELEASE lot_groupe")
+    return erreurs
+
+# Route POST pour appliquer un lot d'insertions / mises à jour / suppressions
+@app.route('/<table_name>/batch', methods=['POST'])
+def batch_records(table_name):
+    """
+    ?mode=tout (défaut) : le lot est appliqué entièrement ou pas du tout ; la première
+    erreur est renvoyée avec l'index de l'opération.
+    ?mode=ligne : les opérations valides sont appliquées, les autres sont listées dans
+    'erreurs' avec leur index.
+    """
+    if not catalogue_schema.existe(table_name):
+        return jsonify({'error': 'Table non trouvée'}), 404
+
+    mode = request.args.get('mode', 'tout')
+    if mode not in MODES_LOT:
+        return jsonify({'error': f'Mode inconnu: {mode} (attendu : {", ".join(MODES_LOT)})'}), 400
+
+    try:
+        operations = lire_operations_lot()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Validation de toutes les opérations avant d'écrire, puis regroupement des opérations
+    # consécutives partageant la même requête SQL
+    erreurs = []
+    groupes = []  # [(sql, [(index, paramètres)])]
+    comptes = {'insert': 0, 'update': 0, 'delete': 0}
+    for index, operation in enumerate(operations):
+        try:
+            sql, params = preparer_operation_lot(table_name, operation)
+        except ValueError as e:
+            erreurs.append({'index': index, 'error': str(e)})
+            continue
+        if groupes and groupes[-1][0] == sql:
+            groupes[-1][1].append((index, params))
+        else:
+            groupes.append((sql, [(index, params)]))
+
+    if erreurs and mode == 'tout':
+        return jsonify({'error': 'Lot refusé, aucune opération appliquée', 'erreurs': erreurs}), 400
+
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        if not conn.in_transaction:
+            cursor.execute("BEGIN")
+
+        for sql, groupe in groupes:
+            erreurs_groupe = _executer_groupe_lot(cursor, sql, groupe)
+            if erreurs_groupe and mode == 'tout':
+                conn.rollback()
+                return jsonify({
+                    'error': 'Lot refusé, aucune opération appliquée',
+                    'erreurs': erreurs_groupe[:1]
+                }), 409
+            erreurs.extend(erreurs_groupe)
+            indices_en_erreur = {erreur['index'] for erreur in erreurs_groupe}
+            type_op = sql.split(' ', 1)[0].lower()
+            comptes[type_op] += sum(1 for index, _ in groupe if index not in indices_en_erreur)
+
+        conn.commit()
+        if any(comptes.values()):
+            cache_reponses.invalider(table_name)
+
+        erreurs.sort(key=lambda erreur: erreur['index'])
+        return jsonify({
+            'mode': mode,
+            'operations': len(operations),
+            'appliquees': sum(comptes.values()),
+            **comptes,
+            'erreurs': erreurs
+        }), 200
+
+    except Exception as e:
+        if 'conn' in locals():
+            conn.rollback()
+        return jsonify({'error': f'Erreur lors de l\'application du lot: {str(e)}'}), 500
+
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
 
 
 
@@ -282,9 +1776,8 @@ def get_table_description_dict():
     try:
 
         
-        # Connexion à la base de données
-        conn = sqlite3.connect(DATABASE)
-        conn.row_factory = sqlite3.Row
+        # Connexion à la base de données (connexion du pool, lignes en sqlite3.Row)
+        conn = get_db()
         cursor = conn.cursor()
         
         # Récupération des données
@@ -302,12 +1795,168 @@ def get_table_description_dict():
         return description_dict
         
     except Exception as e:
-        print(f"Erreur lors de la création du dictionnaire : {str(e)}")
+        logger.error(f"Erreur lors de la création du dictionnaire : {str(e)}")
         return {}
     finally:
         if 'conn' in locals():
             conn.close()
 
+INTERVALLE_VERIFICATION_DESCRIPTION = float(os.getenv('INTERVALLE_VERIFICATION_DESCRIPTION', '1'))
+
+class CacheDescriptionTables:
+    """
+    Cache de TableDescriptionTable (NomComplet -> description du champ).
+
+    Chargé à la création de l'application puis tenu à jour : au plus une fois par
+    INTERVALLE_VERIFICATION_DESCRIPTION secondes, le compteur de modifications de la base
+    est comparé à celui du dernier chargement. S'il a bougé, la table est relue et le
+    dictionnaire remplacé d'un bloc ; la version n'augmente que si le contenu a changé,
+    ce qui invalide alors les plans de requêtes.
+    """
+
+    def __init__(self, intervalle):
+        self.intervalle = intervalle
+        self._verrou = threading.Lock()
+        self._descriptions = {}
+        self._version = 0
+        self._version_donnees = None
+        self._derniere_verification = 0.0
+        self.succes = 0
+        self.echecs = 0
+        self.rechargements = 0
+
+    def _verifier(self):
+        maintenant = time.monotonic()
+        if maintenant - self._derniere_verification < self.intervalle:
+            return
+        with self._verrou:
+            if maintenant - self._derniere_verification < self.intervalle:
+                return
+            self._derniere_verification = maintenant
+            # Version lue AVANT le rechargement : une écriture concurrente sera vue au prochain passage
+            version = version_donnees.lire()
+            if version != self._version_donnees:
+                self._recharger()
+                self._version_donnees = version
+
+    def _recharger(self):
+        descriptions = get_table_description_dict()
+        if descriptions != self._descriptions:
+            self._descriptions = descriptions
+            self._version += 1
+            self.rechargements += 1
+            logger.info(f"TableDescriptionTable chargée ({len(descriptions)} champs, version {self._version})")
+
+    def charger(self):
+        """Force la relecture de TableDescriptionTable."""
+        with self._verrou:
+            self._version_donnees = version_donnees.lire()
+            self._derniere_verification = time.monotonic()
+            self._recharger()
+
+    def version(self):
+        self._verifier()
+        return self._version
+
+    def obtenir(self, nom_complet):
+        """Description du champ NomComplet, ou {} si elle est introuvable."""
+        self._verifier()
+        description = self._descriptions.get(nom_complet)
+        if description is None:
+            self.echecs += 1
+            return {}
+        self.succes += 1
+        return description
+
+    def statistiques(self):
+        return {
+            'champs': len(self._descriptions),
+            'version': self._version,
+            'succes': self.succes,
+            'echecs': self.echecs,
+            'rechargements': self.rechargements
+        }
+
+cache_description = CacheDescriptionTables(INTERVALLE_VERIFICATION_DESCRIPTION)
+
+def _construire_metadonnees(columns):
+    """
+    Construit le bloc metadata d'une requête à partir de cursor.description et de TableDescriptionTable.
+    """
+    metadata = []
+    for col in columns:
+        # Le nom complet est déjà dans le format attendu grâce à l'alias dans la requête
+        nom_complet = col[0]
+        
+        # Récupération des informations du dictionnaire
+        dict_info = cache_description.obtenir(nom_complet)
+        
+        field_info = {
+            "NomComplet": nom_complet,
+            "libelle": dict_info.get('LibelleChamp', "Libelle Introuvable"),
+            "EstScrutable": dict_info.get('EstScrutable', False),  # Par défaut True si non spécifié
+            "EstFiltrable": dict_info.get('EstFiltrable', True),  # Par défaut True si non spécifié
+            "EstModifiable": dict_info.get('EstModifiable', True),  # Par défaut True si non spécifié
+            "TypeChamp": dict_info.get('TypeChamp', False),  # Par défaut True si non spécifié
+            "ValeurParDefaut": dict_info.get('ValeurParDefaut', True),  # Par défaut True si non spécifié
+        }   
+        metadata.append(field_info)
+
+    return metadata
+
+class RegistrePlansRequetes:
+    """
+    Plans compilés des requêtes passées à ConvertiRequeteEnJSON.
+
+    Un plan fige, pour un texte de requête et une version de TableDescriptionTable, la liste
+    des colonnes et le bloc metadata. Les requêtes des routes /Capteur/Tableau* étant
+    constantes, le metadata n'est construit qu'une fois ; la requête préparée elle-même
+    est réutilisée par le cache d'instructions de la connexion du pool.
+    """
+
+    TAILLE_MAX = 256
+
+    def __init__(self):
+        self._plans = {}
+        self._verrou = threading.Lock()
+
+    def plan(self, query, description):
+        """
+        Retourne le plan de la requête, compilé à la première exécution.
+
+        Args:
+            query (str): Texte de la requête
+            description (tuple): cursor.description de l'exécution courante
+
+        Returns:
+            dict: {"colonnes": tuple des noms, "metadata": bloc metadata}
+        """
+        version = cache_description.version()
+        cle = (query, version)
+        plan = self._plans.get(cle)
+        colonnes = tuple(col[0] for col in description)
+        if plan is not None and plan['colonnes'] == colonnes:
+            return plan
+
+        plan = {'colonnes': colonnes, 'metadata': _construire_metadonnees(description)}
+        with self._verrou:
+            if len(self._plans) >= self.TAILLE_MAX or any(v != version for _, v in self._plans):
+                # Plans d'une ancienne version de la description : devenus inutiles
+                self._plans = {k: p for k, p in self._plans.items() if k[1] == version}
+                if len(self._plans) >= self.TAILLE_MAX:
+                    self._plans.clear()
+            self._plans[cle] = plan
+        return plan
+
+registre_plans = RegistrePlansRequetes()
+
+# Pas de chargement à l'import (il ouvrirait la base) : create_app() appelle charger(), et sans
+# elle (flask --app main run) la première lecture charge la table, _version_donnees étant None.
+
+@app.route('/Description/Statistiques', methods=['GET'])
+def statistiques_description():
+    return jsonify(cache_description.statistiques())
+
 def ConvertiRequeteEnJSON(query, params=None):
     """
     Analyse une requête SQL et retourne les métadonnées et les données.
@@ -322,9 +1971,8 @@ def ConvertiRequeteEnJSON(query, params=None):
             - data: Les données de la requête
     """
     try:
-        # Connexion à la base de données
-        conn = sqlite3.connect(DATABASE)
-        conn.row_factory = sqlite3.Row  # Pour avoir accès aux colonnes par nom
+        # Connexion à la base de données (connexion du pool, lignes en sqlite3.Row)
+        conn = get_db()
         cursor = conn.cursor()
         
         # Exécution de la requête
@@ -333,58 +1981,14 @@ def ConvertiRequeteEnJSON(query, params=None):
         else:
             cursor.execute(query)
             
-        # Récupération des données
-        data = cursor.fetchall()
-        
-        # Récupération des métadonnées des colonnes
-        columns = cursor.description
-        
         # Construction du résultat
-        result = {
-            "metadata": [],
-            "data": []
-        }
-        
-        # Extraction des noms de tables de la requête
-        tables = []
-        if "FROM" in query:
-            from_part = query.split("FROM")[1].split("WHERE")[0].strip()
-            tables = [t.strip() for t in from_part.split("JOIN")[0].split(",")]
-            if "JOIN" in from_part:
-                join_tables = from_part.split("JOIN")[1:]
-                for join in join_tables:
-                    tables.append(join.split("ON")[0].strip())
-        
-        # Traitement des métadonnées
-        for col in columns:
-            # Détermination de la table d'origine
-            table_name = "N/A"
-            for table in tables:
-                if col[0].startswith(table + "."):
-                    table_name = table
-                    break
-            
-            # Construction du NomComplet pour la recherche dans le dictionnaire
-            nom_complet = col[0]  # Le nom complet est déjà dans le format attendu grâce à l'alias dans la requête
-            
-            # Récupération des informations du dictionnaire
-            dict_info = DictDesriptionTable.get(nom_complet, {})
-            
-            field_info = {
-                "NomComplet": nom_complet,
-                "libelle": dict_info.get('LibelleChamp', "Libelle Introuvable"),
-                "EstScrutable": dict_info.get('EstScrutable', False),  # Par défaut True si non spécifié
-                "EstFiltrable": dict_info.get('EstFiltrable', True),  # Par défaut True si non spécifié
-                "EstModifiable": dict_info.get('EstModifiable', True),  # Par défaut True si non spécifié
-                "TypeChamp": dict_info.get('TypeChamp', False),  # Par défaut True si non spécifié
-                "ValeurParDefaut": dict_info.get('ValeurParDefaut', True),  # Par défaut True si non spécifié
-            }   
-            result["metadata"].append(field_info)
-        
-        # Traitement des données
-        for row in data:
-            row_dict = dict(row)  # Conversion de sqlite3.Row en dict
-            result["data"].append(row_dict)
+        metadata = registre_plans.plan(query, cursor.description)['metadata']
+        with metriques.chronometre('acrn_conversion_lignes_secondes'):
+            # Conversion de sqlite3.Row en dict directement depuis le curseur, sans liste intermédiaire
+            data = [dict(row) for row in cursor]
+        if isinstance(cursor, CurseurMesure):
+            cursor.compter_lignes(len(data))
+        result = {"metadata": metadata, "data": data}
             
         return result
         
@@ -394,15 +1998,35 @@ def ConvertiRequeteEnJSON(query, params=None):
         if 'conn' in locals():
             conn.close()
 
-def GenereSQLPourSelectEtoile(NomTable):
-    conn = get_db()
-    cursor = conn.cursor()
+def ConvertiRequeteEnFluxJSON(query, params=None):
+    """
+    Variante en flux de ConvertiRequeteEnJSON (NDJSON).
 
-    cursor.execute(f'PRAGMA table_info({NomTable})')
-    columns = cursor.fetchall()
+    La première ligne contient {"metadata": [...]}, puis chaque ligne est un enregistrement.
+    Les lignes sont lues par paquets de TAILLE_LOT_FLUX : la mémoire reste bornée et le
+    premier octet part dès que la requête a démarré.
+
+    Args:
+        query (str): La requête SQL à exécuter
+        params (tuple, optional): Les paramètres de la requête
+
+    Returns:
+        Response: Réponse application/x-ndjson
+    """
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute(query, params or ())
+        entete = {"metadata": registre_plans.plan(query, cursor.description)['metadata']}
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    return reponse_flux(entete, (dict(row) for row in lignes_par_paquets(cursor)), cursor)
+
+def GenereSQLPourSelectEtoile(NomTable):
+    columns = get_table_columns(NomTable)
 
     select_parts = [
-        f'{NomTable}.{col[1]} as "{NomTable}..{col[1]}.."' for col in columns
+        f'{NomTable}.{col["name"]} as "{NomTable}..{col["name"]}.."' for col in columns
     ]
 
     joined_selects = ',\n            '.join(select_parts)
@@ -422,6 +2046,282 @@ def GenereSQLPourSelectEtoile(NomTable):
 #======================================================================================================
 # PROFILS
 
+#------------------------------------------------------------------------------------------------------
+# Droits effectifs
+#
+# TableDroits.IdDroitPrerequis forme un graphe : un droit accordé n'est effectif que si son
+# prérequis l'est aussi, de proche en proche. Chaque droit reçoit une position de bit ; pour
+# chaque droit on précalcule le masque de sa fermeture (lui-même et tous ses prérequis), puis
+# pour chaque profil le masque des droits accordés et celui des droits effectifs. « L'utilisateur
+# X peut-il faire Y ? » se réduit alors à deux recherches dans un dictionnaire et un test de bit.
+
+INTERVALLE_VERIFICATION_DROITS = float(os.getenv('INTERVALLE_VERIFICATION_DROITS', '1'))
+
+class DroitsEffectifs:
+    """
+    Droits effectifs de chaque profil, sous forme d'entiers utilisés comme ensembles de bits.
+
+    Les routes de l'API qui modifient droits, profils ou utilisateurs mettent à jour les seuls
+    profils concernés (rafraichir). Les autres écritures (CRUD générique, logiciel d'acquisition)
+    sont rattrapées par une reconstruction complète lorsque le compteur de modifications de la
+    base a bougé, vérifié au plus une fois par INTERVALLE_VERIFICATION_DROITS secondes.
+
+    L'état est un tuple remplacé d'un bloc : les lectures ne prennent pas de verrou.
+    """
+
+    def __init__(self, intervalle):
+        self.intervalle = intervalle
+        self._verrou = threading.Lock()
+        # (bits, fermetures, accordes, effectifs, profils_utilisateurs)
+        #   bits                 : IdDroit -> position du bit
+        #   fermetures           : position -> masque du droit et de tous ses prérequis
+        #   accordes / effectifs : IdProfil -> masque
+        #   profils_utilisateurs : IdUtilisateur -> IdProfil (utilisateurs non clôturés)
+        self._etat = ({}, [], {}, {}, {})
+        self._version_donnees = None
+        self._derniere_verification = 0.0
+        self.reconstructions = 0
+        self.mises_a_jour = 0
+
+    @staticmethod
+    def _construire_graphe(cursor):
+        cursor.execute("SELECT IdDroit, IdDroitPrerequis FROM TableDroits ORDER BY IdDroit")
+        prerequis = {row[0]: row[1] for row in cursor.fetchall()}
+        bits = {id_droit: position for position, id_droit in enumerate(prerequis)}
+
+        fermetures = []
+        for id_droit in prerequis:
+            masque = 0
+            courant = id_droit
+            # Remonte la chaîne des prérequis ; un cycle ou un prérequis inconnu l'arrête
+            while courant is not None and courant in bits and not masque >> bits[courant] & 1:
+                masque |= 1 << bits[courant]
+                courant = prerequis[courant]
+            if courant is not None and courant not in bits:
+                logger.warning(f"Prérequis inconnu {courant} pour le droit {id_droit}, ignoré")
+            fermetures.append(masque)
+        return bits, fermetures
+
+    @staticmethod
+    def _masque_effectif(accordes, fermetures):
+        effectif = 0
+        reste = accordes
+        while reste:
+            bit = reste & -reste
+            fermeture = fermetures[bit.bit_length() - 1]
+            if accordes & fermeture == fermeture:
+                effectif |= bit
+            reste ^= bit
+        return effectif
+
+    @staticmethod
+    def _lire_profils(cursor, bits, ids_profils=None):
+        filtre, params = '', ()
+        if ids_profils is not None:
+            filtre = f"WHERE IdProfil IN ({', '.join('?' for _ in ids_profils)})"
+            params = tuple(ids_profils)
+        cursor.execute(f"SELECT IdProfil FROM TableProfils {filtre}", params)
+        accordes = {row[0]: 0 for row in cursor.fetchall()}
+        cursor.execute(f"SELECT IdProfil, IdDroit FROM TableProfilsDroits {filtre}", params)
+        for id_profil, id_droit in cursor.fetchall():
+            if id_profil in accordes and id_droit in bits:
+                accordes[id_profil] |= 1 << bits[id_droit]
+        return accordes
+
+    @staticmethod
+    def _lire_utilisateurs(cursor, colonne=None, ids=None):
+        filtre, params = '', ()
+        if ids is not None:
+            filtre = f"AND {colonne} IN ({', '.join('?' for _ in ids)})"
+            params = tuple(ids)
+        cursor.execute(f"""
+            SELECT IdUtilisateur, IdProfil
+            FROM TableUtilisateurs
+            WHERE COALESCE(EstCloture, 0) = 0 {filtre}
+        """, params)
+        return {row[0]: row[1] for row in cursor.fetchall()}
+
+    def _reconstruire(self):
+        cursor = get_db().cursor()
+        bits, fermetures = self._construire_graphe(cursor)
+        accordes = self._lire_profils(cursor, bits)
+        effectifs = {id_profil: self._masque_effectif(masque, fermetures) for id_profil, masque in accordes.items()}
+        self._etat = (bits, fermetures, accordes, effectifs, self._lire_utilisateurs(cursor))
+        self.reconstructions += 1
+        logger.info(f"Droits effectifs reconstruits ({len(bits)} droits, {len(accordes)} profils)")
+
+    def _verifier(self):
+        maintenant = time.monotonic()
+        if maintenant - self._derniere_verification < self.intervalle:
+            return
+        with self._verrou:
+            if maintenant - self._derniere_verification < self.intervalle:
+                return
+            self._derniere_verification = maintenant
+            # Version lue AVANT la reconstruction : une écriture concurrente sera vue au prochain passage
+            version = version_donnees.lire()
+            if version != self._version_donnees:
+                self._reconstruire()
+                self._version_donnees = version
+
+    def charger(self):
+        """Force la reconstruction complète."""
+        with self._verrou:
+            self._version_donnees = version_donnees.lire()
+            self._derniere_verification = time.monotonic()
+            self._reconstruire()
+
+    @staticmethod
+    def releve_avant_commit(conn):
+        """
+        À appeler dans la transaction d'écriture, juste avant conn.commit() : le verrou d'écriture
+        est tenu, aucune autre connexion ne peut valider entre ce relevé et notre commit.
+        PRAGMA data_version de conn ne change ensuite que si une AUTRE connexion valide.
+        """
+        return version_donnees.lire(), conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def rafraichir(self, ids_profils=(), ids_utilisateurs=(), avant=None):
+        """
+        Relit les droits des profils donnés (et leurs utilisateurs) ainsi que les utilisateurs
+        donnés, sans reconstruire le reste. À appeler après le commit d'une écriture, avec
+        avant = releve_avant_commit(conn).
+
+        Une écriture d'un tiers (autre worker, CRUD générique, logiciel d'acquisition) pas encore
+        prise en compte impose une reconstruction complète ; la version des données n'est adoptée
+        que si notre commit est la seule modification depuis la dernière vérification.
+        """
+        ids_profils, ids_utilisateurs = list(ids_profils), list(ids_utilisateurs)
+        version_avant, data_version_avant = avant if avant is not None else (None, None)
+        with self._verrou:
+            if self._version_donnees is None:
+                return  # Jamais construit : la première lecture fera une reconstruction complète
+            if version_avant is not None and version_avant != self._version_donnees:
+                # Version lue AVANT la reconstruction : une écriture concurrente sera vue au prochain passage
+                version = version_donnees.lire()
+                self._reconstruire()
+                self._version_donnees = version
+                self._derniere_verification = time.monotonic()
+                return
+            bits, fermetures, accordes, effectifs, profils_utilisateurs = self._etat
+            accordes, effectifs, profils_utilisateurs = dict(accordes), dict(effectifs), dict(profils_utilisateurs)
+            cursor = get_db().cursor()
+
+            if ids_profils:
+                nouveaux = self._lire_profils(cursor, bits, ids_profils)
+                for id_profil in ids_profils:
+                    accordes.pop(id_profil, None)
+                    effectifs.pop(id_profil, None)
+                for id_profil, masque in nouveaux.items():
+                    accordes[id_profil] = masque
+                    effectifs[id_profil] = self._masque_effectif(masque, fermetures)
+                profils = set(ids_profils)
+                for id_utilisateur in [u for u, p in profils_utilisateurs.items() if p in profils]:
+                    del profils_utilisateurs[id_utilisateur]
+                profils_utilisateurs.update(self._lire_utilisateurs(cursor, 'IdProfil', ids_profils))
+
+            if ids_utilisateurs:
+                for id_utilisateur in ids_utilisateurs:
+                    profils_utilisateurs.pop(id_utilisateur, None)
+                profils_utilisateurs.update(self._lire_utilisateurs(cursor, 'IdUtilisateur', ids_utilisateurs))
+
+            self._etat = (bits, fermetures, accordes, effectifs, profils_utilisateurs)
+            self.mises_a_jour += 1
+            if version_avant is None:
+                return  # Sans relevé, la prochaine vérification reconstruira si besoin
+
+            # Notre commit a fait bouger le compteur : l'adopter évite une reconstruction complète
+            # à la lecture suivante, sauf si une autre connexion a validé depuis (data_version de
+            # notre connexion relu APRÈS le compteur : rien ne peut se glisser entre les deux)
+            version = version_donnees.lire()
+            if cursor.execute('PRAGMA data_version').fetchone()[0] == data_version_avant:
+                self._version_donnees = version
+                self._derniere_verification = time.monotonic()
+
+    def droit_existe(self, id_droit):
+        self._verifier()
+        return id_droit in self._etat[0]
+
+    def profil_existe(self, id_profil):
+        self._verifier()
+        return id_profil in self._etat[2]
+
+    def utilisateur_actif(self, id_utilisateur):
+        self._verifier()
+        return id_utilisateur in self._etat[4]
+
+    def profil_peut(self, id_profil, id_droit):
+        """Vrai si le droit est effectif pour le profil (accordé avec tous ses prérequis)."""
+        self._verifier()
+        bits, _, _, effectifs, _ = self._etat
+        position = bits.get(id_droit)
+        return position is not None and bool(effectifs.get(id_profil, 0) >> position & 1)
+
+    def peut(self, id_utilisateur, id_droit):
+        """Vrai si l'utilisateur, non clôturé, dispose du droit effectif."""
+        self._verifier()
+        id_profil = self._etat[4].get(id_utilisateur)
+        return id_profil is not None and self.profil_peut(id_profil, id_droit)
+
+    def detail_profil(self, id_profil):
+        """Droits accordés, effectifs et, pour les droits inactifs, les prérequis manquants."""
+        self._verifier()
+        bits, fermetures, accordes, effectifs, _ = self._etat
+        accorde, effectif = accordes.get(id_profil, 0), effectifs.get(id_profil, 0)
+        inactifs = {}
+        for id_droit, position in bits.items():
+            if accorde >> position & 1 and not effectif >> position & 1:
+                manquants = fermetures[position] & ~accorde
+                inactifs[id_droit] = [d for d, p in bits.items() if manquants >> p & 1]
+        return {
+            'idProfil': id_profil,
+            'droits': [d for d, p in bits.items() if effectif >> p & 1],
+            'accordes': [d for d, p in bits.items() if accorde >> p & 1],
+            'inactifs': inactifs,
+            'masque': format(effectif, 'x')
+        }
+
+    def statistiques(self):
+        bits, _, accordes, _, profils_utilisateurs = self._etat
+        return {
+            'droits': len(bits),
+            'profils': len(accordes),
+            'utilisateurs': len(profils_utilisateurs),
+            'reconstructions': self.reconstructions,
+            'mises_a_jour': self.mises_a_jour
+        }
+
+droits_effectifs = DroitsEffectifs(INTERVALLE_VERIFICATION_DROITS)
+
+# Route pour lire les droits effectifs d'un profil (prérequis résolus)
+@app.route('/profil/<int:idProfil>/droits/effectifs', methods=['GET'])
+def get_droits_effectifs(idProfil):
+    try:
+        if not droits_effectifs.profil_existe(idProfil):
+            return jsonify({'error': 'Profil non trouvé'}), 404
+        return jsonify(droits_effectifs.detail_profil(idProfil))
+    except Exception as e:
+        return jsonify({'error': f'Erreur lors du calcul des droits effectifs: {str(e)}'}), 500
+
+# Route pour vérifier qu'un utilisateur dispose d'un droit
+@app.route('/Utilisateur/<int:idUtilisateur>/peut/<idDroit>', methods=['GET'])
+def utilisateur_peut(idUtilisateur, idDroit):
+    try:
+        if not droits_effectifs.droit_existe(idDroit):
+            return jsonify({'error': 'Droit non trouvé'}), 404
+        if not droits_effectifs.utilisateur_actif(idUtilisateur):
+            return jsonify({'error': 'Utilisateur non trouvé ou clôturé'}), 404
+        return jsonify({
+            'idUtilisateur': idUtilisateur,
+            'idDroit': idDroit,
+            'autorise': droits_effectifs.peut(idUtilisateur, idDroit)
+        })
+    except Exception as e:
+        return jsonify({'error': f'Erreur lors de la vérification du droit: {str(e)}'}), 500
+
+@app.route('/Droits/Statistiques', methods=['GET'])
+def statistiques_droits():
+    return jsonify(droits_effectifs.statistiques())
+
 # Route spécifique pour l'ajout de profil basé sur un profil existant
 @app.route("/profil/duplicate", methods=["POST", "OPTIONS"])
 def duplicate_profil():
@@ -476,27 +2376,24 @@ def duplicate_profil():
 
         new_id = cursor.lastrowid
         
-        # Récupération des droits du profil d'origine
-        cursor.execute("SELECT * FROM TableProfilsDroits WHERE IdProfil = ?", (data['idProfilOrigineCopie'],))
-        droits_origine = cursor.fetchall()
-        
-        # Pour chaque droit, création d'un nouvel enregistrement avec le nouvel IdProfil
-        for droit in droits_origine:
-            droit_dict = dict(droit)
-            # Suppression de l'id pour la création du nouveau droit
-            del droit_dict['IdProfilDroit']
-            # Mise à jour de l'IdProfil avec le nouvel ID
-            droit_dict['IdProfil'] = new_id
-            
-            # Construction de la requête SQL pour l'insertion du droit
-            columns = ', '.join(droit_dict.keys())
-            placeholders = ', '.join(['?' for _ in droit_dict])
-            values = tuple(droit_dict.values())
-            
-            cursor.execute(f"INSERT INTO TableProfilsDroits ({columns}) VALUES ({placeholders})", values)
+        # Copie de tous les droits du profil d'origine en une seule instruction INSERT ... SELECT
+        # (toutes les colonnes sauf l'identifiant, IdProfil remplacé par le nouvel ID)
+        cle_droit = get_primary_key('TableProfilsDroits')
+        colonnes_copiees = [col['name'] for col in get_table_columns('TableProfilsDroits')
+                            if col['name'] not in (cle_droit, 'IdProfil')]
+        columns = ', '.join(['IdProfil'] + colonnes_copiees)
+        cursor.execute(f"""
+            INSERT INTO TableProfilsDroits ({columns})
+            SELECT ?, {', '.join(colonnes_copiees)}
+            FROM TableProfilsDroits
+            WHERE IdProfil = ?
+        """, (new_id, data['idProfilOrigineCopie']))
         
         # Commit de toutes les modifications
+        releve = droits_effectifs.releve_avant_commit(conn)
         conn.commit()
+        cache_reponses.invalider('TableProfils', 'TableProfilsDroits')
+        droits_effectifs.rafraichir(ids_profils=[new_id], avant=releve)
         
         return jsonify({'idProfil': new_id, **profil_dict}), 201
         
@@ -565,7 +2462,10 @@ def modifier_droits_profil():
                 WHERE IdProfil = ? AND IdDroit = ?
             """, (data['idProfil'], data['idDroit']))
         
+        releve = droits_effectifs.releve_avant_commit(conn)
         conn.commit()
+        cache_reponses.invalider('TableProfilsDroits')
+        droits_effectifs.rafraichir(ids_profils=[data['idProfil']], avant=releve)
         
         # Récupération des droits actuels du profil pour la réponse
         cursor.execute("""
@@ -592,10 +2492,133 @@ def modifier_droits_profil():
         if 'conn' in locals():
             conn.close()
 
-# Route spécifique pour la suppression d'un profil
-@app.route('/profil/suppression', methods=['PUT'])
-def supprimer_profil():
-    data = request.get_json()
+def identifiant_entier(valeur):
+    """Identifiant entier reçu en JSON (3 ou "3"), None si ce n'en est pas un."""
+    if isinstance(valeur, bool):
+        return None
+    if isinstance(valeur, int):
+        return valeur
+    if isinstance(valeur, str) and re.fullmatch(r'\s*-?\d+\s*', valeur):
+        return int(valeur)
+    return None
+
+def droits_des_profils(cursor, ids_profils):
+    """Droits actuels de plusieurs profils en une requête : {idProfil: [droits]}."""
+    droits = {id_profil: [] for id_profil in ids_profils}
+    placeholders = ', '.join('?' for _ in ids_profils)
+    cursor.execute(f"""
+        SELECT pd.IdProfil AS IdProfilLien, d.*
+        FROM TableDroits d
+        INNER JOIN TableProfilsDroits pd ON d.IdDroit = pd.IdDroit
+        WHERE pd.IdProfil IN ({placeholders})
+    """, tuple(ids_profils))
+    for row in cursor.fetchall():
+        droit = dict(row)
+        droits[droit.pop('IdProfilLien')].append(droit)
+    return droits
+
+# Route pour appliquer une liste d'ajouts / suppressions de droits à un ou plusieurs profils
+@app.route('/profil/droits/lot', methods=['PUT'])
+def modifier_droits_profils_lot():
+    """
+    Exemple de JSON :
+        {
+            "idProfils": [3, 4],            (ou "idProfil": 3)
+            "operations": [
+                {"idDroit": "Acces_Programme", "typeAction": "Ajouter"},
+                {"idDroit": "Modifier_Programmes", "typeAction": "Supprimer"}
+            ]
+        }
+
+    Toutes les opérations sont appliquées dans une seule transaction (executemany). Pour un
+    même droit, la dernière opération l'emporte ; ajouter un droit déjà présent est sans effet.
+    La réponse contient les droits finaux de chaque profil.
+    """
+    data = request.get_json()
+
+    # Vérification des données requises
+    if not data or 'operations' not in data or ('idProfils' not in data and 'idProfil' not in data):
+        return jsonify({'error': 'Les champs idProfils (ou idProfil) et operations sont requis'}), 400
+
+    ids_profils = data['idProfils'] if 'idProfils' in data else [data['idProfil']]
+    if not isinstance(ids_profils, list) or not ids_profils \
+            or not isinstance(data['operations'], list) or not data['operations']:
+        return jsonify({'error': 'idProfils et operations doivent être des listes non vides'}), 400
+    # Identifiants normalisés comme les stocke la base (IdProfil entier, IdDroit texte) : les
+    # comparaisons avec les lignes lues sont faites en Python, sans les conversions de SQLite
+    ids_profils = [identifiant_entier(id_profil) for id_profil in ids_profils]
+    if None in ids_profils:
+        return jsonify({'error': 'Les identifiants de profil doivent être des entiers'}), 400
+    ids_profils = list(dict.fromkeys(ids_profils))
+
+    actions = {}
+    for operation in data['operations']:
+        if not isinstance(operation, dict) or 'idDroit' not in operation or 'typeAction' not in operation:
+            return jsonify({'error': 'Chaque opération doit contenir idDroit et typeAction'}), 400
+        if operation['typeAction'] not in ['Ajouter', 'Supprimer']:
+            return jsonify({'error': 'Le typeAction doit être "Ajouter" ou "Supprimer"'}), 400
+        if not isinstance(operation['idDroit'], (str, int)) or isinstance(operation['idDroit'], bool):
+            return jsonify({'error': 'idDroit doit être une chaîne'}), 400
+        actions[str(operation['idDroit'])] = operation['typeAction']
+
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+
+        # Vérification que les profils et les droits existent (une requête chacun)
+        placeholders = ', '.join('?' for _ in ids_profils)
+        cursor.execute(f"SELECT IdProfil FROM TableProfils WHERE IdProfil IN ({placeholders})", tuple(ids_profils))
+        profils_manquants = set(ids_profils) - {row[0] for row in cursor.fetchall()}
+        if profils_manquants:
+            return jsonify({'error': f'Profil(s) non trouvé(s) : {sorted(profils_manquants, key=str)}'}), 404
+
+        ids_droits = list(actions)
+        if ids_droits:
+            placeholders = ', '.join('?' for _ in ids_droits)
+            cursor.execute(f"SELECT IdDroit FROM TableDroits WHERE IdDroit IN ({placeholders})", tuple(ids_droits))
+            droits_manquants = set(ids_droits) - {row[0] for row in cursor.fetchall()}
+            if droits_manquants:
+                return jsonify({'error': f'Droit(s) non trouvé(s) : {sorted(droits_manquants, key=str)}'}), 404
+
+        ajouts = [(p, d, p, d) for p in ids_profils for d, action in actions.items() if action == 'Ajouter']
+        suppressions = [(p, d) for p in ids_profils for d, action in actions.items() if action == 'Supprimer']
+
+        cursor.executemany("""
+            INSERT INTO TableProfilsDroits (IdProfil, IdDroit)
+            SELECT ?, ?
+            WHERE NOT EXISTS (SELECT 1 FROM TableProfilsDroits WHERE IdProfil = ? AND IdDroit = ?)
+        """, ajouts)
+        nb_ajoutes = max(cursor.rowcount, 0)
+        cursor.executemany("""
+            DELETE FROM TableProfilsDroits 
+            WHERE IdProfil = ? AND IdDroit = ?
+        """, suppressions)
+        nb_supprimes = max(cursor.rowcount, 0)
+
+        releve = droits_effectifs.releve_avant_commit(conn)
+        conn.commit()
+        cache_reponses.invalider('TableProfilsDroits')
+        droits_effectifs.rafraichir(ids_profils=ids_profils, avant=releve)
+
+        droits = droits_des_profils(cursor, ids_profils)
+        return jsonify({
+            'message': f'{nb_ajoutes} droit(s) ajouté(s), {nb_supprimes} droit(s) supprimé(s)',
+            'profils': [{'idProfil': id_profil, 'droits': droits[id_profil]} for id_profil in ids_profils]
+        }), 200
+
+    except Exception as e:
+        if 'conn' in locals():
+            conn.rollback()
+        return jsonify({'error': f'Erreur lors de la modification des droits: {str(e)}'}), 500
+
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
+# Route spécifique pour la suppression d'un profil
+@app.route('/profil/suppression', methods=['PUT'])
+def supprimer_profil():
+    data = request.get_json()
     
     # Vérification des données requises
     if not data or 'idProfil' not in data:
@@ -632,7 +2655,10 @@ def supprimer_profil():
             WHERE IdProfil = ?
         """, (data['idProfil'],))
         
+        releve = droits_effectifs.releve_avant_commit(conn)
         conn.commit()
+        cache_reponses.invalider('TableProfils', 'TableUtilisateurs')
+        droits_effectifs.rafraichir(ids_profils=[data['idProfil']], avant=releve)
         
         return jsonify({
             'message': 'Profil supprimé avec succès',
@@ -655,284 +2681,2385 @@ def supprimer_profil():
 
 
 
-#======================================================================================================
-# UTILISATEURS
+#======================================================================================================
+# UTILISATEURS
+
+# Route spécifique pour la suppression logique d'un utilisateur
+@app.route('/Utilisateur/Cloture', methods=['PUT'])
+def Cloturer_utilisateur():
+    data = request.get_json()
+    
+    # Vérification des données requises
+    if not data or 'idUtilisateur' not in data:
+        return jsonify({'error': 'Le champ idUtilisateur est requis'}), 400
+    
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        # Vérification que l'utilisateur existe
+        cursor.execute("SELECT * FROM TableUtilisateurs WHERE IdUtilisateur = ?", (data['idUtilisateur'],))
+        utilisateur = cursor.fetchone()
+        if utilisateur is None:
+            conn.close()
+            return jsonify({'error': 'Utilisateur non trouvé'}), 404
+        
+        # Mise à jour du flag EstCloture
+        cursor.execute("""
+            UPDATE TableUtilisateurs 
+            SET EstCloture = 1
+            WHERE IdUtilisateur = ?
+        """, (data['idUtilisateur'],))
+        
+        releve = droits_effectifs.releve_avant_commit(conn)
+        conn.commit()
+        cache_reponses.invalider('TableUtilisateurs')
+        droits_effectifs.rafraichir(ids_utilisateurs=[data['idUtilisateur']], avant=releve)
+        
+        return jsonify({
+            'message': 'Utilisateur supprimé avec succès',
+            'idUtilisateur': data['idUtilisateur']
+        }), 200
+        
+    except Exception as e:
+        if 'conn' in locals():
+            conn.rollback()
+        return jsonify({'error': f'Erreur lors de la suppression de l\'utilisateur: {str(e)}'}), 500
+        
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
+# Route pour lire le tableau des utilisateurs
+@app.route('/Capteur/TableauUtilisateurs', methods=['GET'])
+@avec_etag
+@en_cache(('TableUtilisateurs', 'TableProfils'))
+def lire_tableau_utilisateurs():
+    query = """
+    SELECT 
+        u.Nom as "TableUtilisateurs..Nom..",
+        u.MDP as "TableUtilisateurs..MDP..",
+        p.NomProfil as "TableProfils..NomProfil..",
+        u.IdProfil as "TableUtilisateurs..IdProfil..",
+        u.EstCloture as "TableUtilisateurs..EstCloture..",
+        u.IdUtilisateur as "TableUtilisateurs..IdUtilisateur.."
+    FROM TableUtilisateurs u
+    INNER JOIN TableProfils p ON u.IdProfil = p.IdProfil
+    """
+    
+    if demande_flux():
+        return ConvertiRequeteEnFluxJSON(query)
+    result = ConvertiRequeteEnJSON(query)
+    return result
+
+#======================================================================================================
+
+
+
+
+
+
+#======================================================================================================
+# Overloads
+
+# Route spécifique pour la lecture du tableau de capteurs
+@app.route('/Capteur/TableauOverloads', methods=['GET'])
+@avec_etag
+@en_cache(('TableOverloads',))
+def lire_tableau_overloads():
+    try:
+        conn = get_db()
+        query=GenereSQLPourSelectEtoile('TableOverloads')
+        logger_sql.debug(query)
+        if demande_flux():
+            return ConvertiRequeteEnFluxJSON(query)
+        return ConvertiRequeteEnJSON(query)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
+#======================================================================================================
+
+
+
+#======================================================================================================
+# Droits
+
+# Route spécifique pour la lecture du tableau de capteurs
+@app.route('/Capteur/TableauDroits', methods=['GET'])
+@avec_etag
+@en_cache(('TableDroits',))
+def lire_tableau_Droits():
+    try:
+        conn = get_db()
+        query="""
+            SELECT
+            TableDroits.IdDroit as 'TableDroits..IdDroit..',
+            TableDroits.Nom as 'TableDroits..Nom..',
+            TableDroits2.nom as 'TableDroits..IdDroitPrerequis..',
+            TableDroits.EstModifiable as 'TableDroits..EstModifiable..',
+            TableDroits.EstAffichable as 'TableDroits..EstAffichable..',
+            TableDroits.ReferenceTraduction as 'TableDroits..ReferenceTraduction..'
+            FROM TableDroits left join TableDroits TableDroits2 on TableDroits.IdDroitPrerequis=TableDroits2.IdDroit
+            """
+        logger_sql.debug(query)
+        if demande_flux():
+            return ConvertiRequeteEnFluxJSON(query)
+        return ConvertiRequeteEnJSON(query)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
+#======================================================================================================
+
+
+
+
+
+#======================================================================================================
+# CAPTEURS
+
+# Route spécifique pour la lecture du tableau de capteurs
+@app.route('/Capteur/TableauCapteurs', methods=['GET'])
+@avec_etag
+@en_cache(('TableCapteur',))
+def lire_tableau_capteurs():
+    try:
+        conn = get_db()
+        query=GenereSQLPourSelectEtoile('TableCapteur')
+        if demande_flux():
+            return ConvertiRequeteEnFluxJSON(query)
+        return ConvertiRequeteEnJSON(query)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
+#======================================================================================================
+
+
+
+#======================================================================================================
+# COURBES
+
+# Les fichiers de courbes sont des CSV sans en-tête, séparateur ';' et virgule décimale :
+#     0,001;68,946377;0,0
+DOSSIER_BASE = os.path.dirname(os.path.abspath(__file__))
+DOSSIER_COURBES = os.getenv('DOSSIER_COURBES', os.path.join(DOSSIER_BASE, 'CSVCourbes'))
+# Dossiers des courbes, par ordre de priorité : CSVCourbes puis la racine du projet, où le
+# logiciel d'acquisition dépose les « Mesure simple *.csv »
+DOSSIERS_COURBES = [DOSSIER_COURBES, DOSSIER_BASE]
+
+def resoudre_chemin_courbe(nom_fichier):
+    """
+    Retrouve le fichier CSV d'une courbe dans CSVCourbes ou à la racine du projet.
+
+    Args:
+        nom_fichier (str): Nom du fichier (ou chemin relatif)
+
+    Returns:
+        str: Chemin absolu du fichier, ou None s'il n'existe pas
+
+    Raises:
+        ValueError: Le chemin sort des dossiers autorisés ou n'est pas un CSV
+    """
+    if not nom_fichier.lower().endswith('.csv'):
+        raise ValueError('Seuls les fichiers .csv sont autorisés')
+
+    dossiers_autorises = [os.path.realpath(dossier) for dossier in DOSSIERS_COURBES]
+    for dossier in dossiers_autorises:
+        chemin = os.path.realpath(os.path.join(dossier, nom_fichier))
+        if not any(chemin.startswith(d + os.sep) for d in dossiers_autorises):
+            raise ValueError(f'Chemin de fichier non autorisé : {nom_fichier}')
+        if os.path.isfile(chemin):
+            return chemin
+    return None
+
+def _est_ligne_numerique(champs):
+    try:
+        for champ in champs:
+            if champ.strip():
+                float(champ.replace(',', '.'))
+        return True
+    except ValueError:
+        return False
+
+def lire_courbe_colonnes(chemin_fichier):
+    """
+    Lit un CSV de courbe en colonnes NumPy (float64).
+
+    Le texte est converti en une fois (virgule décimale -> point) puis analysé par
+    np.loadtxt. Une éventuelle ligne d'en-tête non numérique donne les noms de colonnes,
+    sinon elles sont nommées Colonne1, Colonne2... Les cellules vides valent NaN et les
+    lignes dont le nombre de colonnes est incorrect sont ignorées.
+
+    Args:
+        chemin_fichier (str): Chemin du fichier CSV
+
+    Returns:
+        tuple: (noms des colonnes, liste de np.ndarray, une par colonne)
+    """
+    with open(chemin_fichier, 'r', encoding='utf-8-sig') as file:
+        texte = file.read()
+        taille = os.fstat(file.fileno()).st_size
+
+    with metriques.chronometre('acrn_csv_analyse_secondes'):
+        noms, colonnes = _analyser_texte_courbe(texte, chemin_fichier)
+    metriques.incrementer('acrn_csv_octets_total', taille)
+    metriques.incrementer('acrn_csv_points_total', len(colonnes[0]) if colonnes else 0)
+    return noms, colonnes
+
+def _analyser_texte_courbe(texte, chemin_fichier):
+    lignes = texte.splitlines()
+    while lignes and not lignes[0].strip():
+        lignes.pop(0)
+    if not lignes:
+        return [], []
+
+    premiere = lignes[0].split(';')
+    nb_colonnes = len(premiere)
+    if _est_ligne_numerique(premiere):
+        noms = [f'Colonne{i + 1}' for i in range(nb_colonnes)]
+        debut = 0
+    else:
+        noms = [nom.strip() for nom in premiere]
+        debut = 1
+
+    donnees = _analyser_lignes_courbe(lignes[debut:], nb_colonnes, chemin_fichier)
+    if donnees.size == 0:
+        return noms, [np.empty(0) for _ in noms]
+    return noms, [np.ascontiguousarray(donnees[:, i]) for i in range(donnees.shape[1])]
+
+def _analyser_lignes_courbe(lignes, nb_colonnes, chemin_fichier):
+    """Convertit des lignes de données (sans en-tête) en tableau (nb_lignes, nb_colonnes)."""
+    corps = '\n'.join(lignes).replace(',', '.')
+    if not corps.strip():
+        return np.empty((0, nb_colonnes))
+    try:
+        donnees = np.loadtxt(io.StringIO(corps), delimiter=';', ndmin=2, dtype=np.float64)
+        if donnees.shape[1] != nb_colonnes:
+            raise ValueError('nombre de colonnes inattendu')
+    except ValueError:
+        # Fichier irrégulier : on écarte les lignes mal formées et on tolère les cellules vides
+        valides = [ligne for ligne in corps.split('\n') if ligne.count(';') == nb_colonnes - 1]
+        if not valides:
+            donnees = np.empty((0, nb_colonnes))
+        else:
+            donnees = np.genfromtxt(io.StringIO('\n'.join(valides)), delimiter=';', ndmin=2,
+                                    dtype=np.float64, invalid_raise=False)
+        logger.warning(f"{len(lignes) - len(valides)} ligne(s) ignorée(s) dans {chemin_fichier}")
+    return donnees
+
+def est_croissante(colonne):
+    """Indique si une colonne est croissante (condition de la recherche dichotomique)."""
+    return len(colonne) < 2 or bool(np.all(np.diff(colonne) >= 0))
+
+def fenetre_courbe(colonnes, x_croissant, args):
+    """
+    Restreint les colonnes à l'intervalle [t_min, t_max] de la 1re colonne (temps).
+
+    La colonne de temps étant croissante, les bornes sont trouvées par recherche
+    dichotomique (np.searchsorted) et les colonnes sont découpées par tranche : sur un
+    tableau mappé seules les pages de la fenêtre sont lues, soit O(log n + k).
+
+    Args:
+        colonnes (list): Colonnes de la courbe
+        x_croissant (bool): La 1re colonne est-elle croissante
+        args (MultiDict): Paramètres de la requête (t_min, t_max, virgule décimale acceptée)
+
+    Returns:
+        list: Colonnes restreintes à la fenêtre (inchangées sans t_min ni t_max)
+
+    Raises:
+        ValueError: Borne non numérique
+    """
+    bornes = []
+    for nom in ('t_min', 't_max'):
+        valeur = args.get(nom)
+        try:
+            bornes.append(float(valeur.replace(',', '.')) if valeur not in (None, '') else None)
+        except ValueError:
+            raise ValueError(f'Le paramètre {nom} doit être un nombre')
+    t_min, t_max = bornes
+    if (t_min is None and t_max is None) or not colonnes:
+        return colonnes
+
+    x = colonnes[0]
+    if not x_croissant:
+        # Temps non monotone : filtrage par masque, en O(n)
+        masque = np.ones(len(x), dtype=bool)
+        if t_min is not None:
+            masque &= x >= t_min
+        if t_max is not None:
+            masque &= x <= t_max
+        return [col[masque] for col in colonnes]
+
+    debut = int(np.searchsorted(x, t_min, side='left')) if t_min is not None else 0
+    fin = int(np.searchsorted(x, t_max, side='right')) if t_max is not None else len(x)
+    return [col[debut:max(debut, fin)] for col in colonnes]
+
+def colonne_vers_liste(colonne):
+    """Convertit une colonne NumPy en liste JSON (NaN -> None)."""
+    valeurs = colonne.tolist()
+    if np.isnan(colonne).any():
+        return [None if v != v else v for v in valeurs]
+    return valeurs
+
+def courbe_format_colonnes(noms, colonnes, indice_y=1):
+    """Format colonnes : {"columns", "x", "y", "series"} (x = 1re colonne, y = colonne indice_y)."""
+    series = {nom: colonne_vers_liste(col) for nom, col in zip(noms[1:], colonnes[1:])}
+    return {
+        "columns": noms,
+        "x": colonne_vers_liste(colonnes[0]) if colonnes else [],
+        "y": series[noms[indice_y]] if len(noms) > indice_y else [],
+        "series": series
+    }
+
+def courbe_format_lignes(noms, colonnes):
+    """Format historique : {"metadata": [], "data": [{"CSV..<colonne>..": valeur, ...}, ...]}."""
+    cles = [f"CSV..{nom}.." for nom in noms]
+    listes = [colonne_vers_liste(col) for col in colonnes]
+    return {
+        "metadata": [],
+        "data": [dict(zip(cles, ligne)) for ligne in zip(*listes)]
+    }
+
+#------------------------------------------------------------------------------------------------------
+# Cache binaire des courbes
+#
+# Un fichier de mesure ne change plus après l'acquisition : à la première lecture, ses colonnes
+# sont enregistrées en .npy (une par colonne) avec un petit entete.json, dans un sous-dossier
+# dont le nom dépend du chemin, de la taille et du mtime du CSV. Les lectures suivantes
+# ouvrent directement les .npy en mémoire mappée, sans aucune analyse de texte.
+
+DOSSIER_CACHE_COURBES = os.getenv('DOSSIER_CACHE_COURBES', os.path.join(DOSSIER_BASE, '.cache_courbes'))
+TAILLE_MAX_CACHE_COURBES = int(os.getenv('TAILLE_MAX_CACHE_COURBES', str(256 * 1024 * 1024)))
+
+class CacheCourbes:
+    """
+    Cache disque des courbes au format colonnes .npy, lu en mémoire mappée.
+
+    Les entrées dont le CSV source a changé ou disparu sont supprimées, puis les moins
+    récemment utilisées tant que le dossier dépasse taille_max octets.
+    """
+
+    def __init__(self, dossier, taille_max):
+        self.dossier = dossier
+        self.taille_max = taille_max
+        self._verrou = threading.Lock()
+        self.succes = 0
+        self.echecs = 0
+
+    @staticmethod
+    def _cle(chemin, st):
+        empreinte = f"{os.path.realpath(chemin)}|{st.st_size}|{st.st_mtime_ns}"
+        return hashlib.sha1(empreinte.encode('utf-8')).hexdigest()[:24]
+
+    def _lire_entree(self, dossier_entree):
+        with open(os.path.join(dossier_entree, 'entete.json'), 'r', encoding='utf-8') as f:
+            entete = json.load(f)
+        colonnes = [np.load(os.path.join(dossier_entree, f'col{i}.npy'), mmap_mode='r')
+                    for i in range(len(entete['colonnes']))]
+        return entete['colonnes'], colonnes, entete['x_croissant']
+
+    def charger(self, chemin):
+        """
+        Retourne (noms, colonnes) d'une courbe, depuis le cache si l'entrée est à jour.
+
+        Args:
+            chemin (str): Chemin du fichier CSV
+
+        Returns:
+            tuple: (noms des colonnes, liste de tableaux NumPy en lecture seule,
+                    True si la 1re colonne est croissante)
+        """
+        st = os.stat(chemin)
+        dossier_entree = os.path.join(self.dossier, self._cle(chemin, st))
+
+        if os.path.isfile(os.path.join(dossier_entree, 'entete.json')):
+            try:
+                resultat = self._lire_entree(dossier_entree)
+                self.succes += 1
+                # mtime de l'entrée = date de dernière utilisation, pour l'éviction LRU
+                os.utime(os.path.join(dossier_entree, 'entete.json'))
+                return resultat
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Entrée de cache de courbe illisible, reconstruction : {str(e)}")
+
+        self.echecs += 1
+        noms, colonnes = lire_courbe_colonnes(chemin)
+        self.enregistrer(chemin, st, noms, colonnes)
+        return noms, colonnes, est_croissante(colonnes[0]) if colonnes else False
+
+    def enregistrer(self, chemin, st, noms, colonnes):
+        """Écrit l'entrée de cache d'une courbe déjà analysée."""
+        def ecrire_colonnes(dossier):
+            for i, colonne in enumerate(colonnes):
+                np.save(os.path.join(dossier, f'col{i}.npy'), np.asarray(colonne, dtype=np.float64))
+
+        nb_lignes = int(len(colonnes[0])) if colonnes else 0
+        x_croissant = est_croissante(colonnes[0]) if colonnes else False
+        self.enregistrer_entree(chemin, st, noms, nb_lignes, x_croissant, ecrire_colonnes)
+
+    def enregistrer_entree(self, chemin, st, noms, nb_lignes, x_croissant, ecrire_colonnes):
+        """
+        Publie une entrée de cache dont les fichiers col<i>.npy sont écrits par
+        ecrire_colonnes(dossier) (permet d'écrire une courbe sans la charger en mémoire).
+        """
+        dossier_entree = os.path.join(self.dossier, self._cle(chemin, st))
+        temporaire = f"{dossier_entree}.tmp-{os.getpid()}-{threading.get_ident()}"
+        try:
+            os.makedirs(temporaire, exist_ok=True)
+            ecrire_colonnes(temporaire)
+            entete = {
+                'source': os.path.realpath(chemin),
+                'taille': st.st_size,
+                'mtime_ns': st.st_mtime_ns,
+                'colonnes': noms,
+                'nb_lignes': nb_lignes,
+                'x_croissant': x_croissant
+            }
+            # entete.json écrit en dernier : une entrée sans entête n'est jamais lue
+            with open(os.path.join(temporaire, 'entete.json'), 'w', encoding='utf-8') as f:
+                json.dump(entete, f, ensure_ascii=False)
+            try:
+                os.rename(temporaire, dossier_entree)
+            except OSError:
+                # Un autre thread a écrit la même entrée entre-temps
+                shutil.rmtree(temporaire, ignore_errors=True)
+        except OSError as e:
+            shutil.rmtree(temporaire, ignore_errors=True)
+            logger.warning(f"Impossible d'écrire le cache de la courbe {chemin} : {str(e)}")
+            return
+        self.evincer()
+
+    def evincer(self):
+        """Supprime les entrées périmées puis les plus anciennes au-delà de la taille maximale."""
+        with self._verrou:
+            entrees = []
+            for entree in os.scandir(self.dossier):
+                if not entree.is_dir() or '.tmp-' in entree.name:
+                    continue
+                chemin_entete = os.path.join(entree.path, 'entete.json')
+                try:
+                    with open(chemin_entete, 'r', encoding='utf-8') as f:
+                        entete = json.load(f)
+                    derniere_utilisation = os.stat(chemin_entete).st_mtime
+                    st = os.stat(entete['source'])
+                    perimee = st.st_size != entete['taille'] or st.st_mtime_ns != entete['mtime_ns']
+                except (OSError, ValueError, KeyError):
+                    perimee, derniere_utilisation = True, 0
+                if perimee:
+                    shutil.rmtree(entree.path, ignore_errors=True)
+                    continue
+                taille = sum(f.stat().st_size for f in os.scandir(entree.path))
+                entrees.append((derniere_utilisation, taille, entree.path))
+
+            total = sum(taille for _, taille, _ in entrees)
+            for _, taille, chemin in sorted(entrees):
+                if total <= self.taille_max:
+                    break
+                shutil.rmtree(chemin, ignore_errors=True)
+                total -= taille
+
+    def statistiques(self):
+        return {'succes': self.succes, 'echecs': self.echecs, 'dossier': self.dossier}
+
+cache_courbes = CacheCourbes(DOSSIER_CACHE_COURBES, TAILLE_MAX_CACHE_COURBES)
+
+@app.route('/Courbe/CsvVersJson', methods=['GET'])
+def lire_csv_courbes():
+    try:
+        # Récupération du nom du fichier depuis les paramètres de requête
+        nom_fichier = request.args.get('nom_fichier')
+        if not nom_fichier:
+            return jsonify({'error': 'Le paramètre nom_fichier est requis'}), 400
+
+        # Construction du chemin complet du fichier
+        try:
+            chemin_fichier = resoudre_chemin_courbe(nom_fichier)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if chemin_fichier is None:
+            return jsonify({'error': f'Le fichier {nom_fichier} n\'existe pas'}), 404
+
+        noms, colonnes, x_croissant = cache_courbes.charger(chemin_fichier)
+        try:
+            colonnes = fenetre_courbe(colonnes, x_croissant, request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # ?format=colonnes : tableaux par colonne, sinon format historique ligne par ligne
+        if request.args.get('format') == 'colonnes':
+            return jsonify(courbe_format_colonnes(noms, colonnes))
+        return jsonify(courbe_format_lignes(noms, colonnes))
+
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture du CSV: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+
+
+#------------------------------------------------------------------------------------------------------
+# Décimation des courbes pour l'affichage
+
+POINTS_DECIMATION_DEFAUT = 1000
+POINTS_DECIMATION_MAX = 100000
+
+def decimer_lttb(x, y, nb_points):
+    """
+    Largest-Triangle-Three-Buckets : garde les points qui forment les plus grands triangles
+    avec leurs voisins, ce qui conserve la forme visuelle de la courbe et ses crêtes.
+
+    Returns:
+        np.ndarray: Indices des points conservés (croissants)
+    """
+    taille = len(x)
+    if nb_points >= taille or nb_points < 3:
+        return np.arange(taille)
+
+    # nb_points - 2 paquets entre le premier et le dernier point
+    pas = (taille - 2) / (nb_points - 2)
+    bornes = (np.arange(nb_points - 1) * pas).astype(np.int64) + 1
+    bornes[-1] = taille - 1
+
+    indices = np.empty(nb_points, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = taille - 1
+    a = 0
+    for i in range(nb_points - 2):
+        debut, fin = bornes[i], bornes[i + 1]
+        # Sommet C : moyenne du paquet suivant (ou dernier point)
+        if i + 2 < len(bornes):
+            moy_x = x[fin:bornes[i + 2]].mean()
+            moy_y = y[fin:bornes[i + 2]].mean()
+        else:
+            moy_x, moy_y = x[-1], y[-1]
+        aires = np.abs((x[a] - moy_x) * (y[debut:fin] - y[a]) - (x[a] - x[debut:fin]) * (moy_y - y[a]))
+        a = debut + int(np.argmax(np.nan_to_num(aires, nan=-1.0)))
+        indices[i + 1] = a
+    return indices
+
+def decimer_minmax(y, nb_points):
+    """
+    Min/max par paquet : garde le minimum et le maximum de chaque paquet, donc
+    toutes les crêtes exactes. Le premier et le dernier point sont toujours conservés ;
+    les (nb_points - 2) / 2 paquets couvrent les points intermédiaires, le résultat ne
+    dépasse donc jamais nb_points.
+
+    Returns:
+        np.ndarray: Indices des points conservés (croissants)
+    """
+    taille = len(y)
+    if nb_points >= taille:
+        return np.arange(taille)
+    nb_paquets = (nb_points - 2) // 2
+    if nb_paquets < 1:
+        return np.unique(np.asarray([0, taille - 1], dtype=np.int64))[:max(nb_points, 1)]
+
+    bornes = np.linspace(1, taille - 1, nb_paquets + 1).astype(np.int64)
+    indices = [0, taille - 1]
+    for debut, fin in zip(bornes[:-1], bornes[1:]):
+        paquet = y[debut:fin]
+        if fin <= debut or np.isnan(paquet).all():
+            continue
+        indices.append(debut + int(np.nanargmin(paquet)))
+        indices.append(debut + int(np.nanargmax(paquet)))
+    return np.unique(np.asarray(indices, dtype=np.int64))
+
+METHODES_DECIMATION = {
+    'lttb': lambda x, y, n: decimer_lttb(x, y, n),
+    'minmax': lambda x, y, n: decimer_minmax(y, n),
+}
+
+@app.route('/Courbe/Decime', methods=['GET'])
+def decimer_courbe():
+    """
+    Courbe réduite à ?points=N points (défaut 1000) par la méthode ?methode=lttb|minmax,
+    calculée sur la colonne ?colonne= (défaut 1, la première mesure). Réponse au format colonnes.
+    ?t_min= / ?t_max= restreignent d'abord la courbe à une fenêtre de temps (zoom).
+    """
+    try:
+        nom_fichier = request.args.get('nom_fichier')
+        if not nom_fichier:
+            return jsonify({'error': 'Le paramètre nom_fichier est requis'}), 400
+
+        methode = request.args.get('methode', 'lttb')
+        if methode not in METHODES_DECIMATION:
+            return jsonify({'error': f'Méthode inconnue : {methode} (lttb ou minmax)'}), 400
+        try:
+            nb_points = int(request.args.get('points', POINTS_DECIMATION_DEFAUT))
+            indice_y = int(request.args.get('colonne', 1))
+        except ValueError:
+            return jsonify({'error': 'Les paramètres points et colonne doivent être des entiers'}), 400
+        nb_points = max(3, min(nb_points, POINTS_DECIMATION_MAX))
+
+        try:
+            chemin_fichier = resoudre_chemin_courbe(nom_fichier)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if chemin_fichier is None:
+            return jsonify({'error': f'Le fichier {nom_fichier} n\'existe pas'}), 404
+
+        noms, colonnes, x_croissant = cache_courbes.charger(chemin_fichier)
+        try:
+            colonnes = fenetre_courbe(colonnes, x_croissant, request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not 1 <= indice_y < len(colonnes):
+            return jsonify({'error': f'Colonne invalide : {indice_y}'}), 400
+
+        indices = METHODES_DECIMATION[methode](colonnes[0], colonnes[indice_y], nb_points)
+        result = courbe_format_colonnes(noms, [col[indices] for col in colonnes], indice_y)
+        result.update({
+            'methode': methode,
+            'points_origine': int(len(colonnes[0])),  # dans la fenêtre demandée
+            'points': int(len(indices))
+        })
+        return jsonify(result)
+
+    except Exception as e:
+        logger.error(f"Erreur lors de la décimation de la courbe: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+COMPRESSION_TELECHARGEMENT = os.getenv('COMPRESSION_TELECHARGEMENT', '1') == '1'
+TAILLE_BLOC_TELECHARGEMENT = 64 * 1024
+
+def _flux_gzip(chemin_fichier):
+    # Le fichier n'est ouvert qu'au premier bloc demandé : rien n'est lu pour une réponse 304
+    compresseur = zlib.compressobj(6, zlib.DEFLATED, 31)
+    with open(chemin_fichier, 'rb') as file:
+        while True:
+            bloc = file.read(TAILLE_BLOC_TELECHARGEMENT)
+            if not bloc:
+                break
+            compresse = compresseur.compress(bloc)
+            if compresse:
+                yield compresse
+    yield compresseur.flush()
+
+@app.route('/Courbe/TelechargerCSV', methods=['GET'])
+def telecharger_csv():
+    """
+    Téléchargement d'une courbe, lue en flux depuis le disque.
+
+    - ETag / Last-Modified : un fichier inchangé répond 304 sans être relu ;
+    - Range : reprise ou lecture partielle (206) ;
+    - gzip à la volée si le client l'accepte et ne demande pas de plage
+      (désactivable avec COMPRESSION_TELECHARGEMENT=0).
+    """
+    try:
+        # Récupération du nom du fichier depuis les paramètres de requête
+        nom_fichier = request.args.get('nom_fichier')
+        if not nom_fichier:
+            return jsonify({'error': 'Le paramètre nom_fichier est requis'}), 400
+
+        # Construction du chemin complet du fichier
+        try:
+            chemin_fichier = resoudre_chemin_courbe(nom_fichier)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if chemin_fichier is None:
+            return jsonify({'error': f'Le fichier {nom_fichier} n\'existe pas'}), 404
+
+        nom_telechargement = os.path.basename(chemin_fichier)
+        if (COMPRESSION_TELECHARGEMENT and 'gzip' in request.accept_encodings
+                and 'Range' not in request.headers):
+            st = os.stat(chemin_fichier)
+            response = Response(_flux_gzip(chemin_fichier), mimetype='text/csv')
+            response.headers['Content-Encoding'] = 'gzip'
+            response.headers['Content-Disposition'] = f'attachment; filename="{nom_telechargement}"'
+            response.set_etag(f'{st.st_mtime_ns:x}-{st.st_size:x}-gz')
+            response.last_modified = st.st_mtime
+            response.cache_control.no_cache = True
+            response.vary.add('Accept-Encoding')
+            return response.make_conditional(request)
+
+        # send_file gère ETag, Last-Modified, 304 et Range, et délègue l'envoi au serveur (file_wrapper)
+        response = send_file(chemin_fichier, mimetype='text/csv', as_attachment=True,
+                             download_name=nom_telechargement, conditional=True, etag=True)
+        response.accept_ranges = 'bytes'
+        if COMPRESSION_TELECHARGEMENT:
+            response.vary.add('Accept-Encoding')
+        return response
+
+    except Exception as e:
+        logger.error(f"Erreur lors du téléchargement du CSV: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+#------------------------------------------------------------------------------------------------------
+# Index des courbes
+#
+# Manifeste JSON (index_courbes.json dans le dossier de cache) avec, pour chaque CSV de
+# DOSSIERS_COURBES (CSVCourbes et racine du projet, sans sous-dossiers) : nombre de points, plage de temps, min/max/moyenne par colonne et crêtes.
+# Il est complété au fil de l'eau : seuls les fichiers nouveaux ou modifiés sont analysés.
+
+NB_CRETES_MAX = 5
+SEUIL_RELATIF_CRETE = 0.5
+
+def detecter_cretes(x, y, seuil_relatif=SEUIL_RELATIF_CRETE, nb_max=NB_CRETES_MAX):
+    """
+    Détecte les crêtes principales d'une mesure.
+
+    Une crête est un maximum local de l'écart à la valeur initiale (la mesure peut être
+    négative) d'au moins seuil_relatif fois l'écart maximal. Deux crêtes retenues sont
+    séparées d'au moins 2 % de la courbe.
+
+    Returns:
+        list: [{"indice", "temps", "valeur"}] triées par temps
+    """
+    if len(y) < 3:
+        return []
+    ecart = np.nan_to_num(np.abs(y - y[0]), nan=0.0)
+    maximum = ecart.max()
+    if maximum <= 0:
+        return []
+
+    candidats = np.flatnonzero((ecart[1:-1] > ecart[:-2]) & (ecart[1:-1] >= ecart[2:])
+                               & (ecart[1:-1] >= seuil_relatif * maximum)) + 1
+    distance_min = max(1, len(y) // 50)
+    retenus = []
+    for indice in candidats[np.argsort(-ecart[candidats], kind='stable')]:
+        if all(abs(int(indice) - r) >= distance_min for r in retenus):
+            retenus.append(int(indice))
+            if len(retenus) == nb_max:
+                break
+    return [{'indice': i, 'temps': float(x[i]), 'valeur': float(y[i])} for i in sorted(retenus)]
+
+def _nombre_json(valeur):
+    valeur = float(valeur)
+    return None if valeur != valeur else valeur
+
+def statistiques_courbe(noms, colonnes):
+    """Statistiques d'une courbe pour l'index (temps = 1re colonne, crêtes sur la 2e)."""
+    nb_points = int(len(colonnes[0])) if colonnes else 0
+    entree = {'NombrePoints': nb_points, 'Colonnes': [], 'Cretes': []}
+    if nb_points == 0:
+        entree.update({'TempsDebut': None, 'TempsFin': None, 'Duree': None})
+        return entree
+
+    x = colonnes[0]
+    entree['TempsDebut'] = _nombre_json(x[0])
+    entree['TempsFin'] = _nombre_json(x[-1])
+    entree['Duree'] = _nombre_json(x[-1] - x[0])
+    for nom, colonne in zip(noms, colonnes):
+        vide = bool(np.isnan(colonne).all())
+        entree['Colonnes'].append({
+            'Nom': nom,
+            'Min': None if vide else _nombre_json(np.nanmin(colonne)),
+            'Max': None if vide else _nombre_json(np.nanmax(colonne)),
+            'Moyenne': None if vide else _nombre_json(np.nanmean(colonne))
+        })
+    if len(colonnes) > 1:
+        entree['Cretes'] = detecter_cretes(x, colonnes[1])
+    return entree
+
+class IndexCourbes:
+    """
+    Index persistant des fichiers de courbes et de leurs statistiques.
+
+    Les fichiers sont indexés par nom, comme resoudre_chemin_courbe les retrouve : un nom
+    présent dans plusieurs dossiers désigne celui du premier dossier.
+    """
+
+    def __init__(self, dossiers_courbes, chemin_manifeste):
+        self.dossiers_courbes = dossiers_courbes
+        self.chemin_manifeste = chemin_manifeste
+        self._verrou = threading.Lock()
+        self._entrees = None
+
+    def _charger_manifeste(self):
+        try:
+            with open(self.chemin_manifeste, 'r', encoding='utf-8') as f:
+                return json.load(f).get('fichiers', {})
+        except (OSError, ValueError):
+            return {}
+
+    def _enregistrer_manifeste(self):
+        os.makedirs(os.path.dirname(self.chemin_manifeste), exist_ok=True)
+        temporaire = f"{self.chemin_manifeste}.tmp-{os.getpid()}"
+        with open(temporaire, 'w', encoding='utf-8') as f:
+            json.dump({'fichiers': self._entrees}, f, ensure_ascii=False)
+        os.replace(temporaire, self.chemin_manifeste)
+
+    def mettre_a_jour(self):
+        """
+        Synchronise l'index avec le dossier : un stat() par fichier, analyse des seuls
+        fichiers nouveaux ou modifiés, retrait des fichiers disparus.
+
+        Returns:
+            list: Entrées de l'index
+        """
+        with self._verrou:
+            if self._entrees is None:
+                self._entrees = self._charger_manifeste()
+
+            presents = {}
+            for dossier in self.dossiers_courbes:
+                try:
+                    with os.scandir(dossier) as entrees:
+                        for entree in entrees:
+                            if entree.is_file() and entree.name.lower().endswith('.csv'):
+                                presents.setdefault(entree.name, (entree.path, entree.stat()))
+                except FileNotFoundError:
+                    continue
+
+            modifie = False
+            for nom in [nom for nom in self._entrees if nom not in presents]:
+                del self._entrees[nom]
+                modifie = True
+
+            for nom, (chemin, st) in presents.items():
+                connue = self._entrees.get(nom)
+                if connue and connue['Taille'] == st.st_size and connue['MtimeNs'] == st.st_mtime_ns:
+                    continue
+                try:
+                    noms, colonnes, _ = cache_courbes.charger(chemin)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Courbe {nom} non indexée : {str(e)}")
+                    continue
+                entree_index = {
+                    'NomFichierCSV': nom,
+                    'Taille': st.st_size,
+                    'MtimeNs': st.st_mtime_ns,
+                    'DateModification': datetime.fromtimestamp(st.st_mtime).isoformat(timespec='seconds')
+                }
+                entree_index.update(statistiques_courbe(noms, colonnes))
+                self._entrees[nom] = entree_index
+                modifie = True
+
+            if modifie:
+                try:
+                    self._enregistrer_manifeste()
+                except OSError as e:
+                    logger.warning(f"Impossible d'enregistrer l'index des courbes : {str(e)}")
+            return list(self._entrees.values())
+
+index_courbes = IndexCourbes(DOSSIERS_COURBES, os.path.join(DOSSIER_CACHE_COURBES, 'index_courbes.json'))
+
+CHAMPS_TRI_INDEX = ('NomFichierCSV', 'DateModification', 'NombrePoints', 'Duree', 'Taille', 'TempsDebut', 'TempsFin')
+
+@app.route('/Courbe/ListeFichiersCSV', methods=['GET'])
+def liste_fichiers_csv():
+    """
+    Liste des courbes avec leurs statistiques, sans ouvrir les CSV déjà indexés.
+
+    Paramètres optionnels :
+        contient       : partie du nom de fichier
+        points_min/max : bornes du nombre de points
+        duree_min/max  : bornes de la durée
+        date_min/max   : bornes de DateModification (ISO, ex. 2025-06-03)
+        tri            : champ de tri (NomFichierCSV par défaut), ordre=asc|desc
+    """
+    try:
+        entrees = index_courbes.mettre_a_jour()
+
+        args = request.args
+        if args.get('contient'):
+            motif = args['contient'].lower()
+            entrees = [e for e in entrees if motif in e['NomFichierCSV'].lower()]
+        try:
+            for param, champ, comparer in (
+                ('points_min', 'NombrePoints', lambda v, b: v >= b),
+                ('points_max', 'NombrePoints', lambda v, b: v <= b),
+                ('duree_min', 'Duree', lambda v, b: v >= b),
+                ('duree_max', 'Duree', lambda v, b: v <= b),
+            ):
+                if args.get(param):
+                    borne = float(args[param].replace(',', '.'))
+                    entrees = [e for e in entrees if e[champ] is not None and comparer(e[champ], borne)]
+        except ValueError:
+            return jsonify({'error': 'Les bornes numériques doivent être des nombres'}), 400
+        if args.get('date_min'):
+            entrees = [e for e in entrees if e['DateModification'] >= args['date_min']]
+        if args.get('date_max'):
+            entrees = [e for e in entrees if e['DateModification'][:len(args['date_max'])] <= args['date_max']]
+
+        tri = args.get('tri', 'NomFichierCSV')
+        if tri not in CHAMPS_TRI_INDEX:
+            return jsonify({'error': f'Champ de tri invalide : {tri}'}), 400
+        entrees.sort(key=lambda e: (e[tri] is None, e[tri] if e[tri] is not None else 0),
+                     reverse=args.get('ordre') == 'desc')
+
+        # Création de la réponse JSON
+        result = {
+            "data": entrees
+        }
+        
+        return jsonify(result)
+
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture des fichiers CSV: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+#------------------------------------------------------------------------------------------------------
+# Import des courbes
+#
+# POST /Courbe/Upload reçoit le CSV brut (éventuellement en Transfer-Encoding: chunked) et
+# l'analyse au fil de l'eau, par blocs de TAILLE_BLOC_UPLOAD octets : chaque bloc de lignes
+# complètes est converti par NumPy et ajouté, colonne par colonne, à des fichiers binaires.
+# La mémoire utilisée ne dépend pas de la longueur de la courbe. À la fin, le CSV est publié
+# dans CSVCourbes, les colonnes deviennent l'entrée du cache .npy, et la courbe est liée à
+# sa ligne de TableResultats (TableResultatsCourbes) dans la même transaction.
+
+TAILLE_BLOC_UPLOAD = 64 * 1024
+TAILLE_MAX_UPLOAD_COURBE = int(os.getenv('TAILLE_MAX_UPLOAD_COURBE', str(512 * 1024 * 1024)))
+
+# Table de liaison courbe / résultat, créée par la migration 5 (voir MIGRATIONS)
+SQL_TABLE_RESULTATS_COURBES = ("""
+    CREATE TABLE IF NOT EXISTS "TableResultatsCourbes" (
+        "IdResultatCourbe"  INTEGER NOT NULL UNIQUE,
+        "IdResultat"        INTEGER NOT NULL,
+        "NomFichierCSV"     TEXT NOT NULL UNIQUE,
+        "NombrePoints"      INTEGER,
+        "TempsDebut"        REAL,
+        "TempsFin"          REAL,
+        "DateImport"        TEXT,
+        PRIMARY KEY("IdResultatCourbe" AUTOINCREMENT)
+    )""",
+    'CREATE INDEX IF NOT EXISTS "IndexResultatsCourbesIdResultat" ON "TableResultatsCourbes" ("IdResultat")')
+
+class AnalyseurCourbeFlux:
+    """
+    Analyse incrémentale d'un CSV de courbe : alimenter() reçoit des octets, les lignes
+    complètes sont converties et écrites en float64 dans un fichier brut par colonne.
+    """
+
+    def __init__(self, dossier, nom_fichier):
+        self.dossier = dossier
+        self.nom_fichier = nom_fichier
+        self._decodeur = codecs.getincrementaldecoder('utf-8-sig')()
+        self._reste = ''
+        self._fichiers = []
+        self.noms = None
+        self.nb_lignes = 0
+        self.x_croissant = True
+        self.premier_x = None
+        self.dernier_x = None
+
+    def _ouvrir_colonnes(self, premiere_ligne):
+        champs = premiere_ligne.split(';')
+        if _est_ligne_numerique(champs):
+            self.noms = [f'Colonne{i + 1}' for i in range(len(champs))]
+            est_entete = False
+        else:
+            self.noms = [nom.strip() for nom in champs]
+            est_entete = True
+        self._fichiers = [open(os.path.join(self.dossier, f'col{i}.bin'), 'wb') for i in range(len(self.noms))]
+        return est_entete
+
+    def _traiter_lignes(self, lignes):
+        lignes = [ligne for ligne in lignes if ligne.strip()]
+        if not lignes:
+            return
+        if self.noms is None and self._ouvrir_colonnes(lignes[0]):
+            lignes = lignes[1:]
+        donnees = _analyser_lignes_courbe(lignes, len(self.noms), self.nom_fichier)
+        if not len(donnees):
+            return
+        x = donnees[:, 0]
+        if self.dernier_x is None:
+            self.premier_x = float(x[0])
+        elif x[0] < self.dernier_x:
+            self.x_croissant = False
+        self.x_croissant = self.x_croissant and est_croissante(x)
+        self.dernier_x = float(x[-1])
+        self.nb_lignes += len(donnees)
+        for i, fichier in enumerate(self._fichiers):
+            np.ascontiguousarray(donnees[:, i]).tofile(fichier)
+
+    def alimenter(self, octets):
+        texte = self._reste + self._decodeur.decode(octets)
+        coupure = texte.rfind('\n')
+        if coupure < 0:
+            self._reste = texte
+            return
+        self._reste = texte[coupure + 1:]
+        self._traiter_lignes(texte[:coupure].splitlines())
+
+    def terminer(self):
+        self._traiter_lignes((self._reste + self._decodeur.decode(b'', final=True)).splitlines())
+        self._reste = ''
+        self.fermer()
+        if self.noms is None:
+            raise ValueError('Le fichier ne contient aucune donnée')
+
+    def fermer(self):
+        for fichier in self._fichiers:
+            fichier.close()
+
+    def ecrire_npy(self, dossier_destination):
+        """Convertit les fichiers bruts en col<i>.npy (en-tête .npy + copie par blocs)."""
+        entete = {'descr': np.lib.format.dtype_to_descr(np.dtype(np.float64)),
+                  'fortran_order': False, 'shape': (self.nb_lignes,)}
+        for i in range(len(self.noms)):
+            with open(os.path.join(dossier_destination, f'col{i}.npy'), 'wb') as sortie, \
+                    open(os.path.join(self.dossier, f'col{i}.bin'), 'rb') as source:
+                np.lib.format.write_array_header_1_0(sortie, entete)
+                shutil.copyfileobj(source, sortie, TAILLE_BLOC_UPLOAD)
+
+@app.route('/Courbe/Upload', methods=['POST'])
+def upload_courbe():
+    """
+    Import d'une courbe : POST /Courbe/Upload?nom_fichier=<fichier.csv>&id_resultat=<IdResultat>
+    avec le CSV brut comme corps (Content-Type: text/csv, éventuellement en chunked).
+
+    Réponses : 201 (courbe importée), 400 (paramètres ou CSV invalides), 404 (résultat
+    inconnu), 409 (fichier déjà présent), 413 (taille maximale dépassée), 503 (migrations
+    non appliquées).
+    """
+    nom_fichier = request.args.get('nom_fichier', '')
+    id_resultat = request.args.get('id_resultat')
+    if not nom_fichier or not id_resultat:
+        return jsonify({'error': 'Les paramètres nom_fichier et id_resultat sont requis'}), 400
+    if os.path.basename(nom_fichier) != nom_fichier or not nom_fichier.lower().endswith('.csv'):
+        return jsonify({'error': 'nom_fichier doit être un nom de fichier .csv, sans dossier'}), 400
+    if request.content_length is not None and request.content_length > TAILLE_MAX_UPLOAD_COURBE:
+        return jsonify({'error': f'Fichier trop volumineux (maximum {TAILLE_MAX_UPLOAD_COURBE} octets)'}), 413
+
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        if not catalogue_schema.existe('TableResultatsCourbes'):
+            return jsonify({'error': 'Import indisponible : migrations non appliquées (flask --app main migrer)'}), 503
+
+        cursor.execute("SELECT IdResultat FROM TableResultats WHERE IdResultat = ?", (id_resultat,))
+        if cursor.fetchone() is None:
+            return jsonify({'error': 'Résultat non trouvé'}), 404
+        cursor.execute("SELECT 1 FROM TableResultatsCourbes WHERE NomFichierCSV = ?", (nom_fichier,))
+        if cursor.fetchone() is not None or resoudre_chemin_courbe(nom_fichier) is not None:
+            return jsonify({'error': f'Le fichier {nom_fichier} existe déjà'}), 409
+
+        os.makedirs(DOSSIER_COURBES, exist_ok=True)
+        os.makedirs(DOSSIER_CACHE_COURBES, exist_ok=True)
+        chemin_final = os.path.join(DOSSIER_COURBES, nom_fichier)
+        dossier_travail = os.path.join(DOSSIER_CACHE_COURBES, f"upload.tmp-{os.getpid()}-{threading.get_ident()}")
+        os.makedirs(dossier_travail, exist_ok=True)
+        chemin_brut = os.path.join(dossier_travail, 'source.csv')
+        analyseur = AnalyseurCourbeFlux(dossier_travail, nom_fichier)
+
+        try:
+            # Lecture du corps par blocs : copie brute et analyse incrémentale en parallèle
+            taille = 0
+            with metriques.chronometre('acrn_csv_analyse_secondes'), open(chemin_brut, 'wb') as brut:
+                while True:
+                    bloc = request.stream.read(TAILLE_BLOC_UPLOAD)
+                    if not bloc:
+                        break
+                    taille += len(bloc)
+                    if taille > TAILLE_MAX_UPLOAD_COURBE:
+                        analyseur.fermer()
+                        return jsonify({'error': f'Fichier trop volumineux (maximum {TAILLE_MAX_UPLOAD_COURBE} octets)'}), 413
+                    brut.write(bloc)
+                    analyseur.alimenter(bloc)
+                analyseur.terminer()
+            metriques.incrementer('acrn_csv_octets_total', taille)
+            metriques.incrementer('acrn_csv_points_total', analyseur.nb_lignes)
+
+            # Liaison au résultat, publication du CSV puis validation : en cas d'échec du
+            # commit, le fichier publié est retiré
+            cursor.execute("""
+                INSERT INTO TableResultatsCourbes (IdResultat, NomFichierCSV, NombrePoints, TempsDebut, TempsFin, DateImport)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (id_resultat, nom_fichier, analyseur.nb_lignes, analyseur.premier_x, analyseur.dernier_x,
+                  datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+            id_resultat_courbe = cursor.lastrowid
+            os.rename(chemin_brut, chemin_final)
+            try:
+                conn.commit()
+            except sqlite3.Error:
+                os.remove(chemin_final)
+                raise
+        except ValueError as e:
+            conn.rollback()
+            return jsonify({'error': f'CSV invalide : {str(e)}'}), 400
+        finally:
+            analyseur.fermer()
+
+        cache_reponses.invalider('TableResultatsCourbes')
+        cache_courbes.enregistrer_entree(chemin_final, os.stat(chemin_final), analyseur.noms, analyseur.nb_lignes,
+                                         analyseur.x_croissant, analyseur.ecrire_npy)
+
+        return jsonify({
+            'idResultatCourbe': id_resultat_courbe,
+            'idResultat': int(id_resultat),
+            'nomFichier': nom_fichier,
+            'colonnes': analyseur.noms,
+            'nombrePoints': analyseur.nb_lignes,
+            'tempsDebut': _nombre_json(analyseur.premier_x),
+            'tempsFin': _nombre_json(analyseur.dernier_x),
+            'taille': taille
+        }), 201
+
+    except Exception as e:
+        if 'conn' in locals():
+            conn.rollback()
+        logger.error(f"Erreur lors de l'import de la courbe: {str(e)}")
+        return jsonify({'error': f'Erreur lors de l\'import de la courbe: {str(e)}'}), 500
+
+    finally:
+        if 'dossier_travail' in locals():
+            shutil.rmtree(dossier_travail, ignore_errors=True)
+        if 'conn' in locals():
+            conn.close()
+
+
+
+
+#======================================================================================================
+# STATISTIQUES ET CONFORMITE DES LOTS
+#
+# Les agrégats de chaque lot sont tenus à jour par des triggers sur TableResultats (migration 6),
+# dans la transaction de l'écrivain (API ou logiciel d'acquisition) : une insertion ajoute la
+# valeur de chaque ParametreN numérique par l'algorithme de Welford (nombre, moyenne, somme des
+# carrés des écarts M2, min, max) et compte les conformités. GET /Lot/<id>/statistiques ne lit
+# donc que quelques lignes, quelle que soit la taille du lot.
+#
+# Une suppression, un changement de valeur, de lot ou de EstIgnore ne se retranche pas d'un
+# min/max : le lot est marqué AJour = 0. La lecture le recalcule alors (NumPy) sans l'enregistrer ;
+# POST /Lot/<id>/evaluer ou POST /Lot/<id>/statistiques/recalculer enregistrent les agrégats.
+#
+# Les grandeurs d'un programme sont les attributs de TableConformiteResultatEchantillonModele
+# de son modèle, par Ordre : _PIC_1 / _MAX désignent la première, _PIC_2 / _MIN la deuxième.
+# Cp / Cpk utilisent les bornes de TableConformiteResultatEchantillonSelect :
+#   TypeComparaison   ENTRE (Parametre1 ≤ v ≤ Parametre2), SUPERIEUR (v ≥ Parametre1),
+#                     INFERIEUR (v ≤ Parametre1), NOMINAL (Parametre1 ± Parametre2)
+# (alias : INTERVALLE, >=, >, <=, <). Ce vocabulaire est supposé : un autre type est signalé
+# (erreur_critere) et refusé par /evaluer (422), jamais traité comme un critère sans borne.
+
+ATTRIBUTS_VALEURS_RESULTAT = tuple(f'Parametre{i}' for i in range(1, 11))
+RE_VALEUR_NUMERIQUE = re.compile(r'^\s*[-+]?(\d+([.,]\d*)?|[.,]\d+)([eE][-+]?\d+)?\s*$', re.ASCII)
+
+def _sql_valeur(colonne):
+    return f"CAST(REPLACE(TRIM({colonne}), ',', '.') AS REAL)"
+
+def _sql_est_numerique(colonne):
+    # Équivalent SQL de RE_VALEUR_NUMERIQUE, sans fonction Python : les triggers s'exécutent aussi
+    # dans le logiciel d'acquisition. Comparé au CAST (affinité REAL), le texte ne devient un
+    # nombre que s'il en a entièrement la forme : '1-2' reste du texte, alors que CAST lit 1.
+    return f"REPLACE(TRIM({colonne}), ',', '.') = {_sql_valeur(colonne)}"
+
+def sql_statistiques_lots():
+    """Tables d'agrégats et triggers de TableResultats (compatibles avec un SQLite ancien : pas d'UPSERT)."""
+    instructions = ["""
+        CREATE TABLE IF NOT EXISTS "TableStatistiquesLotCumuls" (
+            "IdLot"                 INTEGER NOT NULL PRIMARY KEY,
+            "NombreResultats"       INTEGER NOT NULL,
+            "ConformesManuelle"     INTEGER NOT NULL,
+            "NonConformesManuelle"  INTEGER NOT NULL,
+            "ConformesCalculee"     INTEGER NOT NULL,
+            "NonConformesCalculee"  INTEGER NOT NULL,
+            "AJour"                 INTEGER NOT NULL
+        )""", """
+        CREATE TABLE IF NOT EXISTS "TableStatistiquesLotGrandeurs" (
+            "IdLot"     INTEGER NOT NULL,
+            "Attribut"  TEXT NOT NULL,
+            "Nombre"    INTEGER NOT NULL,
+            "Moyenne"   REAL NOT NULL,
+            "M2"        REAL NOT NULL,
+            "Minimum"   REAL,
+            "Maximum"   REAL,
+            PRIMARY KEY("IdLot", "Attribut")
+        ) WITHOUT ROWID"""]
+
+    insertion = [
+        # Un lot inconnu n'est à jour que si ce résultat est son premier (résultats antérieurs à la migration)
+        """INSERT OR IGNORE INTO "TableStatistiquesLotCumuls"
+               SELECT NEW.IdLot, 0, 0, 0, 0, 0,
+                      NOT EXISTS (SELECT 1 FROM TableResultats WHERE IdLot = NEW.IdLot AND IdResultat <> NEW.IdResultat)""",
+        """UPDATE "TableStatistiquesLotCumuls" SET
+               NombreResultats = NombreResultats + 1,
+               ConformesManuelle = ConformesManuelle + COALESCE(NEW.EstConformeManuelle = 1, 0),
+               NonConformesManuelle = NonConformesManuelle + COALESCE(NEW.EstConformeManuelle = 0, 0),
+               ConformesCalculee = ConformesCalculee + COALESCE(NEW.EstConformeCalculee = 1, 0),
+               NonConformesCalculee = NonConformesCalculee + COALESCE(NEW.EstConformeCalculee = 0, 0)
+           WHERE IdLot = NEW.IdLot"""]
+    for attribut in ATTRIBUTS_VALEURS_RESULTAT:
+        colonne = f'NEW.{attribut}'
+        x = _sql_valeur(colonne)
+        insertion.append(f"""INSERT OR IGNORE INTO "TableStatistiquesLotGrandeurs" (IdLot, Attribut, Nombre, Moyenne, M2)
+               SELECT NEW.IdLot, '{attribut}', 0, 0, 0 WHERE {_sql_est_numerique(colonne)}""")
+        # Welford : delta = x - moyenne ; moyenne += delta / (n + 1) ; M2 += delta² n / (n + 1)
+        insertion.append(f"""UPDATE "TableStatistiquesLotGrandeurs" SET
+               Nombre = Nombre + 1,
+               Moyenne = Moyenne + ({x} - Moyenne) / (Nombre + 1),
+               M2 = M2 + ({x} - Moyenne) * ({x} - Moyenne) * Nombre / (Nombre + 1),
+               Minimum = MIN(COALESCE(Minimum, {x}), {x}),
+               Maximum = MAX(COALESCE(Maximum, {x}), {x})
+           WHERE IdLot = NEW.IdLot AND Attribut = '{attribut}' AND {_sql_est_numerique(colonne)}""")
+    corps = ';\n            '.join(insertion)
+    instructions.append(f"""
+        CREATE TRIGGER IF NOT EXISTS "StatistiquesLot_Insertion"
+        AFTER INSERT ON "TableResultats" WHEN COALESCE(NEW.EstIgnore, 0) = 0
+        BEGIN
+            {corps};
+        END""")
+
+    # Changement de conformité seule (évaluation, validation manuelle) : ajustement des compteurs
+    instructions.append("""
+        CREATE TRIGGER IF NOT EXISTS "StatistiquesLot_Conformite"
+        AFTER UPDATE OF EstConformeManuelle, EstConformeCalculee ON "TableResultats"
+        WHEN OLD.IdLot = NEW.IdLot AND COALESCE(OLD.EstIgnore, 0) = 0 AND COALESCE(NEW.EstIgnore, 0) = 0
+        BEGIN
+            UPDATE "TableStatistiquesLotCumuls" SET
+                ConformesManuelle = ConformesManuelle + COALESCE(NEW.EstConformeManuelle = 1, 0) - COALESCE(OLD.EstConformeManuelle = 1, 0),
+                NonConformesManuelle = NonConformesManuelle + COALESCE(NEW.EstConformeManuelle = 0, 0) - COALESCE(OLD.EstConformeManuelle = 0, 0),
+                ConformesCalculee = ConformesCalculee + COALESCE(NEW.EstConformeCalculee = 1, 0) - COALESCE(OLD.EstConformeCalculee = 1, 0),
+                NonConformesCalculee = NonConformesCalculee + COALESCE(NEW.EstConformeCalculee = 0, 0) - COALESCE(OLD.EstConformeCalculee = 0, 0)
+            WHERE IdLot = NEW.IdLot;
+        END""")
 
-# Route spécifique pour la suppression logique d'un utilisateur
-@app.route('/Utilisateur/Cloture', methods=['PUT'])
-def Cloturer_utilisateur():
-    data = request.get_json()
-    
-    # Vérification des données requises
-    if not data or 'idUtilisateur' not in data:
-        return jsonify({'error': 'Le champ idUtilisateur est requis'}), 400
-    
+    colonnes = ', '.join(('IdLot', 'EstIgnore') + ATTRIBUTS_VALEURS_RESULTAT)
+    changement = ' OR '.join(f'OLD.{c} IS NOT NEW.{c}' for c in ('IdLot', 'EstIgnore') + ATTRIBUTS_VALEURS_RESULTAT)
+    instructions.append(f"""
+        CREATE TRIGGER IF NOT EXISTS "StatistiquesLot_Modification"
+        AFTER UPDATE OF {colonnes} ON "TableResultats"
+        WHEN {changement}
+        BEGIN
+            UPDATE "TableStatistiquesLotCumuls" SET AJour = 0 WHERE IdLot IN (OLD.IdLot, NEW.IdLot);
+        END""")
+    instructions.append("""
+        CREATE TRIGGER IF NOT EXISTS "StatistiquesLot_Suppression"
+        AFTER DELETE ON "TableResultats"
+        BEGIN
+            UPDATE "TableStatistiquesLotCumuls" SET AJour = 0 WHERE IdLot = OLD.IdLot;
+        END""")
+    instructions.append("""
+        CREATE TRIGGER IF NOT EXISTS "StatistiquesLot_SuppressionLot"
+        AFTER DELETE ON "TableLots"
+        BEGIN
+            DELETE FROM "TableStatistiquesLotCumuls" WHERE IdLot = OLD.IdLot;
+            DELETE FROM "TableStatistiquesLotGrandeurs" WHERE IdLot = OLD.IdLot;
+        END""")
+    return instructions
+
+def valeurs_numeriques(textes):
+    """Convertit des ParametreN (texte, virgule décimale) en tableau float64, NaN si non numérique."""
+    return np.array([float(texte.strip().replace(',', '.')) if isinstance(texte, str) and RE_VALEUR_NUMERIQUE.match(texte)
+                     else float(texte) if isinstance(texte, (int, float)) else np.nan
+                     for texte in textes], dtype=np.float64)
+
+def calculer_statistiques_lot(conn, id_lot):
+    """
+    Agrégats d'un lot recalculés entièrement (NumPy), sans écriture.
+
+    Returns:
+        tuple: (cumuls, {attribut: agrégat}) avec les colonnes de TableStatistiquesLotCumuls
+        et de TableStatistiquesLotGrandeurs
+    """
+    lignes = conn.execute(f"""
+        SELECT EstConformeManuelle, EstConformeCalculee, {', '.join(ATTRIBUTS_VALEURS_RESULTAT)}
+        FROM TableResultats WHERE IdLot = ? AND COALESCE(EstIgnore, 0) = 0""", (id_lot,)).fetchall()
+    manuelle = [ligne[0] for ligne in lignes]
+    calculee = [ligne[1] for ligne in lignes]
+    cumuls = {'IdLot': id_lot, 'NombreResultats': len(lignes),
+              'ConformesManuelle': manuelle.count(1), 'NonConformesManuelle': manuelle.count(0),
+              'ConformesCalculee': calculee.count(1), 'NonConformesCalculee': calculee.count(0), 'AJour': 1}
+    agregats = {}
+    for indice, attribut in enumerate(ATTRIBUTS_VALEURS_RESULTAT, start=2):
+        valeurs = valeurs_numeriques([ligne[indice] for ligne in lignes])
+        valeurs = valeurs[~np.isnan(valeurs)]
+        if valeurs.size:
+            moyenne = float(valeurs.mean())
+            agregats[attribut] = {'IdLot': id_lot, 'Attribut': attribut, 'Nombre': int(valeurs.size), 'Moyenne': moyenne,
+                                  'M2': float(((valeurs - moyenne) ** 2).sum()),
+                                  'Minimum': float(valeurs.min()), 'Maximum': float(valeurs.max())}
+    return cumuls, agregats
+
+def recalculer_statistiques_lot(conn, id_lot):
+    """
+    Recalcule et enregistre les agrégats d'un lot (lot créé avant la migration, suppression,
+    modification). Prend le verrou d'écriture : réservé aux routes d'écriture.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        cumuls, agregats = calculer_statistiques_lot(conn, id_lot)
+        conn.execute('DELETE FROM TableStatistiquesLotGrandeurs WHERE IdLot = ?', (id_lot,))
+        conn.execute(f"INSERT OR REPLACE INTO TableStatistiquesLotCumuls ({', '.join(cumuls)}) "
+                     f"VALUES ({', '.join('?' for _ in cumuls)})", tuple(cumuls.values()))
+        conn.executemany('INSERT INTO TableStatistiquesLotGrandeurs (IdLot, Attribut, Nombre, Moyenne, M2, Minimum, Maximum) '
+                         'VALUES (:IdLot, :Attribut, :Nombre, :Moyenne, :M2, :Minimum, :Maximum)', list(agregats.values()))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return cumuls, agregats
+
+# Vocabulaire supposé de TypeComparaison (la base de référence n'en contient aucun exemple) :
+# nom -> (forme, nombre de paramètres requis). Tout autre type est refusé, jamais ignoré.
+TYPES_COMPARAISON = {
+    'ENTRE': ('entre', 2), 'INTERVALLE': ('entre', 2),
+    'SUPERIEUR': ('superieur', 1), '>=': ('superieur', 1), '>': ('superieur', 1),
+    'INFERIEUR': ('inferieur', 1), '<=': ('inferieur', 1), '<': ('inferieur', 1),
+    'NOMINAL': ('nominal', 2),
+}
+
+def limites_critere(type_comparaison, parametres):
+    """
+    Bornes (inférieure, supérieure) d'un critère de conformité ; (None, None) sans TypeComparaison.
+    Lève ValueError pour un type inconnu ou un paramètre requis non numérique.
+    """
+    type_comparaison = (type_comparaison or '').strip().upper()
+    if not type_comparaison:
+        return None, None
+    if type_comparaison not in TYPES_COMPARAISON:
+        raise ValueError(f'TypeComparaison inconnu : {type_comparaison} (attendu : {", ".join(TYPES_COMPARAISON)})')
+    forme, nombre_requis = TYPES_COMPARAISON[type_comparaison]
+    valeurs = valeurs_numeriques(parametres)
+    valeurs = [None if np.isnan(v) else float(v) for v in valeurs]
+    manquants = [f'Parametre{i + 1}' for i in range(nombre_requis) if valeurs[i] is None]
+    if manquants:
+        raise ValueError(f'{type_comparaison} : {", ".join(manquants)} non numérique')
+    if forme == 'entre':
+        return valeurs[0], valeurs[1]
+    if forme == 'superieur':
+        return valeurs[0], None
+    if forme == 'inferieur':
+        return None, valeurs[0]
+    return valeurs[0] - valeurs[1], valeurs[0] + valeurs[1]
+
+def lire_grandeurs_programme(conn, id_programme):
+    """Attributs mesurés du programme, par ordre, avec les bornes de conformité choisies pour lui."""
+    lignes = conn.execute("""
+        SELECT m.IdConfResultatEchantillonModele, m.NomAttributResultatEchantillon, m.ReferenceTraduction,
+               s.TypeComparaison, s.IdUniteSelect, s.Parametre1, s.Parametre2, s.Parametre3, s.Parametre4, s.Parametre5
+        FROM TableProgramme p
+        JOIN TableConformiteResultatEchantillonModele m ON m.IdProgrammeModele = p.IdProgrammeModele
+        LEFT JOIN TableConformiteResultatEchantillonSelect s
+               ON s.IdProgramme = p.IdProgramme_a AND s.IdConfResultatEchantillonModele = m.IdConfResultatEchantillonModele
+        WHERE p.IdProgramme_a = ?
+        ORDER BY m.Ordre, m.IdConfResultatEchantillonModele""", (id_programme,)).fetchall()
+    grandeurs = []
+    for ligne in lignes:
+        if ligne['NomAttributResultatEchantillon'] not in ATTRIBUTS_VALEURS_RESULTAT:
+            continue
+        grandeur = {
+            'id_critere': ligne['IdConfResultatEchantillonModele'],
+            'attribut': ligne['NomAttributResultatEchantillon'],
+            'libelle': ligne['ReferenceTraduction'],
+            'type_comparaison': ligne['TypeComparaison'],
+            'unite': ligne['IdUniteSelect'],
+            'limite_inferieure': None,
+            'limite_superieure': None
+        }
+        try:
+            grandeur['limite_inferieure'], grandeur['limite_superieure'] = limites_critere(
+                ligne['TypeComparaison'], list(ligne)[5:10])
+        except ValueError as e:
+            grandeur['erreur_critere'] = str(e)
+        grandeurs.append(grandeur)
+    return grandeurs
+
+def indicateurs_grandeur(agregat, inferieure=None, superieure=None):
+    """Statistiques d'une grandeur à partir de ses agrégats (nombre, moyenne, M2, min, max)."""
+    nombre, moyenne, m2 = agregat['Nombre'], agregat['Moyenne'], agregat['M2']
+    variance_pop = m2 / nombre if nombre else None
+    variance_echantillon = m2 / (nombre - 1) if nombre > 1 else None
+    ecart_type = variance_echantillon ** 0.5 if variance_echantillon is not None else None
+    cp = cpk = None
+    if ecart_type:
+        ecarts = [ecart for ecart in (None if superieure is None else superieure - moyenne,
+                                      None if inferieure is None else moyenne - inferieure) if ecart is not None]
+        if inferieure is not None and superieure is not None:
+            cp = (superieure - inferieure) / (6 * ecart_type)
+        if ecarts:
+            cpk = min(ecarts) / (3 * ecart_type)
+    return {
+        'nombre': nombre,
+        'moyenne': moyenne if nombre else None,
+        'minimum': agregat['Minimum'],
+        'maximum': agregat['Maximum'],
+        'variance_pop': variance_pop,
+        'ecart_type_pop': variance_pop ** 0.5 if variance_pop is not None else None,
+        'variance_echantillon': variance_echantillon,
+        'ecart_type_echantillon': ecart_type,
+        'cp': cp,
+        'cpk': cpk
+    }
+
+# TypeAnalyse de TableStatistiquesLotModele -> indicateur ; le suffixe choisit la grandeur
+INDICATEURS_ANALYSE = {
+    'MOYENNE': 'moyenne', 'MAXIMUM': 'maximum', 'MINIMUM': 'minimum',
+    'VARIANCE_POP': 'variance_pop', 'ECART_TYPE_POP': 'ecart_type_pop',
+    'VARIANCE_ECHANTILLON': 'variance_echantillon', 'ECART_TYPE_ECHANTILLON': 'ecart_type_echantillon',
+    'CP': 'cp', 'CPK': 'cpk'
+}
+SUFFIXES_GRANDEUR = {'_PIC_1': 0, '_MAX': 0, '_PIC_2': 1, '_MIN': 1}
+
+def valeur_analyse(type_analyse, indicateurs, conformite):
+    type_analyse = (type_analyse or '').upper()
+    if type_analyse in ('TAUX_CONFORMITE_MANUELLE', 'TAUX_CONFORMITE_CALCULE'):
+        compteurs = conformite['manuelle' if type_analyse.endswith('MANUELLE') else 'calculee']
+        total = compteurs['conformes'] + compteurs['non_conformes']
+        return 100.0 * compteurs['conformes'] / total if total else None
+    indice = 0
+    for suffixe, indice_suffixe in SUFFIXES_GRANDEUR.items():
+        if type_analyse.endswith(suffixe):
+            type_analyse, indice = type_analyse[:-len(suffixe)], indice_suffixe
+            break
+    if type_analyse not in INDICATEURS_ANALYSE or indice >= len(indicateurs):
+        return None
+    return indicateurs[indice][INDICATEURS_ANALYSE[type_analyse]]
+
+def statistiques_lot(conn, lot, persister=False):
+    """
+    Statistiques d'un lot : O(1) tant que ses agrégats sont à jour. Sinon ils sont recalculés,
+    et enregistrés seulement si persister (routes d'écriture) : une lecture ne prend jamais le
+    verrou d'écriture face au logiciel d'acquisition.
+    """
+    id_lot = lot['IdLot']
+    cumuls = conn.execute('SELECT * FROM TableStatistiquesLotCumuls WHERE IdLot = ?', (id_lot,)).fetchone()
+    recalcule = cumuls is None or not cumuls['AJour']
+    if recalcule:
+        calcul = recalculer_statistiques_lot if persister else calculer_statistiques_lot
+        cumuls, agregats = calcul(conn, id_lot)
+    else:
+        agregats = {row['Attribut']: row for row in conn.execute(
+            'SELECT * FROM TableStatistiquesLotGrandeurs WHERE IdLot = ?', (id_lot,))}
+
+    grandeurs = lire_grandeurs_programme(conn, lot['IdProgramme'])
+    if not grandeurs:
+        grandeurs = [{'attribut': attribut} for attribut in ATTRIBUTS_VALEURS_RESULTAT if attribut in agregats]
+    vide = {'Nombre': 0, 'Moyenne': 0.0, 'M2': 0.0, 'Minimum': None, 'Maximum': None}
+    indicateurs = []
+    for grandeur in grandeurs:
+        grandeur.update(indicateurs_grandeur(agregats.get(grandeur['attribut'], vide),
+                                             grandeur.get('limite_inferieure'), grandeur.get('limite_superieure')))
+        indicateurs.append(grandeur)
+
+    # Statistiques choisies pour le programme, à défaut toutes celles de son modèle
+    analyses = conn.execute("""
+        SELECT m.IdStatistiquesLotModele, m.TypeAnalyse, m.ReferenceTraduction, m.Ordre,
+               COALESCE(s.IdUniteSelect, m.IdUniteModele) AS Unite
+        FROM TableStatistiquesLotSelect s
+        JOIN TableStatistiquesLotModele m ON m.IdStatistiquesLotModele = s.IdStatistiquesLotModele
+        WHERE s.IdProgramme = ?
+        ORDER BY m.Ordre""", (lot['IdProgramme'],)).fetchall()
+    if not analyses:
+        analyses = conn.execute("""
+            SELECT m.IdStatistiquesLotModele, m.TypeAnalyse, m.ReferenceTraduction, m.Ordre, m.IdUniteModele AS Unite
+            FROM TableProgramme p
+            JOIN TableStatistiquesLotModele m ON m.IdProgrammeModele = p.IdProgrammeModele
+            WHERE p.IdProgramme_a = ?
+            ORDER BY m.Ordre""", (lot['IdProgramme'],)).fetchall()
+
+    nombre = cumuls['NombreResultats']
+    conformite = {
+        'manuelle': {'conformes': cumuls['ConformesManuelle'], 'non_conformes': cumuls['NonConformesManuelle']},
+        'calculee': {'conformes': cumuls['ConformesCalculee'], 'non_conformes': cumuls['NonConformesCalculee']}
+    }
+    return {
+        'IdLot': id_lot,
+        'IdProgramme': lot['IdProgramme'],
+        'nombre_resultats': nombre,
+        'nombre_max_resultats': lot['NombreMaxResultats'],
+        'complet': bool(lot['NombreMaxResultats']) and nombre >= lot['NombreMaxResultats'],
+        'conformite': conformite,
+        'grandeurs': indicateurs,
+        'statistiques': [{
+            'IdStatistiquesLotModele': analyse['IdStatistiquesLotModele'],
+            'TypeAnalyse': analyse['TypeAnalyse'],
+            'ReferenceTraduction': analyse['ReferenceTraduction'],
+            'Ordre': analyse['Ordre'],
+            'Unite': analyse['Unite'],
+            'valeur': valeur_analyse(analyse['TypeAnalyse'], indicateurs, conformite)
+        } for analyse in analyses],
+        'recalcule': recalcule
+    }
+
+@app.route('/Lot/<int:idLot>/statistiques', methods=['GET'])
+def get_statistiques_lot(idLot):
     try:
         conn = get_db()
-        cursor = conn.cursor()
-        
-        # Vérification que l'utilisateur existe
-        cursor.execute("SELECT * FROM TableUtilisateurs WHERE IdUtilisateur = ?", (data['idUtilisateur'],))
-        utilisateur = cursor.fetchone()
-        if utilisateur is None:
+        if not catalogue_schema.existe('TableStatistiquesLotCumuls'):
+            return jsonify({'error': 'Statistiques indisponibles : migrations non appliquées (flask --app main migrer)'}), 503
+        lot = conn.execute('SELECT IdLot, IdProgramme, NombreMaxResultats FROM TableLots WHERE IdLot = ?', (idLot,)).fetchone()
+        if lot is None:
+            return jsonify({'error': 'Lot non trouvé'}), 404
+        return jsonify(statistiques_lot(conn, lot))
+    except sqlite3.Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if 'conn' in locals():
             conn.close()
-            return jsonify({'error': 'Utilisateur non trouvé'}), 404
-        
-        # Mise à jour du flag EstCloture
-        cursor.execute("""
-            UPDATE TableUtilisateurs 
-            SET EstCloture = 1
-            WHERE IdUtilisateur = ?
-        """, (data['idUtilisateur'],))
-        
-        conn.commit()
-        
-        return jsonify({
-            'message': 'Utilisateur supprimé avec succès',
-            'idUtilisateur': data['idUtilisateur']
-        }), 200
-        
-    except Exception as e:
+
+@app.route('/Lot/<int:idLot>/statistiques/recalculer', methods=['POST'])
+def recalculer_statistiques(idLot):
+    """Recalcule et enregistre les agrégats du lot (après des modifications ou suppressions de résultats)."""
+    try:
+        conn = get_db()
+        if not catalogue_schema.existe('TableStatistiquesLotCumuls'):
+            return jsonify({'error': 'Statistiques indisponibles : migrations non appliquées (flask --app main migrer)'}), 503
+        lot = conn.execute('SELECT IdLot, IdProgramme, NombreMaxResultats FROM TableLots WHERE IdLot = ?', (idLot,)).fetchone()
+        if lot is None:
+            return jsonify({'error': 'Lot non trouvé'}), 404
+        recalculer_statistiques_lot(conn, idLot)
+        return jsonify(statistiques_lot(conn, lot))
+    except sqlite3.Error as e:
         if 'conn' in locals():
             conn.rollback()
-        return jsonify({'error': f'Erreur lors de la suppression de l\'utilisateur: {str(e)}'}), 500
-        
+        return jsonify({'error': str(e)}), 500
     finally:
         if 'conn' in locals():
             conn.close()
 
-# Route pour lire le tableau des utilisateurs
-@app.route('/Capteur/TableauUtilisateurs', methods=['GET'])
-def lire_tableau_utilisateurs():
-    query = """
-    SELECT 
-        u.Nom as "TableUtilisateurs..Nom..",
-        u.MDP as "TableUtilisateurs..MDP..",
-        p.NomProfil as "TableProfils..NomProfil..",
-        u.IdProfil as "TableUtilisateurs..IdProfil..",
-        u.EstCloture as "TableUtilisateurs..EstCloture..",
-        u.IdUtilisateur as "TableUtilisateurs..IdUtilisateur.."
-    FROM TableUtilisateurs u
-    INNER JOIN TableProfils p ON u.IdProfil = p.IdProfil
+#------------------------------------------------------------------------------------------------------
+# Conformité
+#
+# POST /Lot/<id>/evaluer recalcule EstConformeCalculee de tous les résultats du lot : les valeurs
+# des grandeurs sont converties en REAL par SQLite, comparées aux bornes en une seule opération
+# NumPy (matrice résultats × critères), et seuls les indicateurs qui changent sont écrits
+# (executemany). Les critères sont ceux de lire_grandeurs_programme() ayant au moins une borne.
+# Le lot est conforme si tous ses résultats le sont et si ses statistiques respectent
+# TableConformitesStatistiquesLot.
+
+def criteres_conformite(conn, id_programme):
+    """Critères évaluables du programme (au moins une borne)."""
+    return [grandeur for grandeur in lire_grandeurs_programme(conn, id_programme)
+            if grandeur['limite_inferieure'] is not None or grandeur['limite_superieure'] is not None]
+
+def evaluer_resultats(valeurs, criteres):
     """
-    
-    result = ConvertiRequeteEnJSON(query)
-    return result
+    Conformité de chaque ligne de valeurs (float64, NaN si non numérique) : toutes les valeurs
+    dans leurs bornes. Une valeur absente est non conforme.
+    """
+    inferieures = np.array([-np.inf if c['limite_inferieure'] is None else c['limite_inferieure'] for c in criteres])
+    superieures = np.array([np.inf if c['limite_superieure'] is None else c['limite_superieure'] for c in criteres])
+    return ((valeurs >= inferieures) & (valeurs <= superieures)).all(axis=1)
 
-#======================================================================================================
+def criteres_statistiques_lot(conn, id_programme):
+    lignes = conn.execute("""
+        SELECT c.IdConfStatLot, c.IdStatistiquesLotModele, m.TypeAnalyse, c.TypeComparaison,
+               c.Parametre1, c.Parametre2, c.Parametre3, c.Parametre4, c.Parametre5
+        FROM TableConformitesStatistiquesLot c
+        JOIN TableStatistiquesLotModele m ON m.IdStatistiquesLotModele = c.IdStatistiquesLotModele
+        WHERE c.IdProgramme = ?
+        ORDER BY c.Ordre""", (id_programme,)).fetchall()
+    criteres = []
+    for ligne in lignes:
+        critere = {'IdConfStatLot': ligne['IdConfStatLot'], 'TypeAnalyse': ligne['TypeAnalyse'],
+                   'limite_inferieure': None, 'limite_superieure': None}
+        try:
+            critere['limite_inferieure'], critere['limite_superieure'] = limites_critere(
+                ligne['TypeComparaison'], list(ligne)[4:9])
+        except ValueError as e:
+            critere['erreur_critere'] = str(e)
+        criteres.append(critere)
+    return criteres
 
+def criteres_invalides(conn, id_programme):
+    """Critères du programme (résultats et lot) dont le TypeComparaison ou les paramètres sont inexploitables."""
+    invalides = [{'id_critere': g['id_critere'], 'attribut': g['attribut'], 'type_comparaison': g['type_comparaison'],
+                  'error': g['erreur_critere']}
+                 for g in lire_grandeurs_programme(conn, id_programme) if 'erreur_critere' in g]
+    invalides += [{'IdConfStatLot': c['IdConfStatLot'], 'TypeAnalyse': c['TypeAnalyse'], 'error': c['erreur_critere']}
+                  for c in criteres_statistiques_lot(conn, id_programme) if 'erreur_critere' in c]
+    return invalides
 
+def evaluer_lot(conn, lot):
+    debut = time.perf_counter()
+    id_lot = lot['IdLot']
+    criteres = criteres_conformite(conn, lot['IdProgramme'])
+    if not criteres:
+        return None
 
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # Conversion en REAL par SQLite (même règle que les triggers des statistiques)
+        colonnes = ', '.join(f"CASE WHEN {_sql_est_numerique(c['attribut'])} THEN {_sql_valeur(c['attribut'])} END"
+                             for c in criteres)
+        lignes = conn.execute(f"""
+            SELECT IdResultat, EstConformeCalculee, {colonnes}
+            FROM TableResultats WHERE IdLot = ? AND COALESCE(EstIgnore, 0) = 0""", (id_lot,)).fetchall()
+        ids = np.array([ligne[0] for ligne in lignes], dtype=np.int64)
+        anciens = np.array([-1 if ligne[1] is None else ligne[1] for ligne in lignes], dtype=np.int64)
+        valeurs = np.array([tuple(ligne)[2:] for ligne in lignes], dtype=np.float64).reshape(len(lignes), len(criteres))
+        conformes = evaluer_resultats(valeurs, criteres).astype(np.int64)
 
+        modifies = np.flatnonzero(conformes != anciens)
+        conn.executemany('UPDATE TableResultats SET EstConformeCalculee = ? WHERE IdResultat = ?',
+                         zip(conformes[modifies].tolist(), ids[modifies].tolist()))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
 
+    # Statistiques à jour (triggers) pour les critères du lot
+    statistiques = statistiques_lot(conn, lot, persister=True)
+    resultats_lot = []
+    for critere in criteres_statistiques_lot(conn, lot['IdProgramme']):
+        valeur = valeur_analyse(critere['TypeAnalyse'], statistiques['grandeurs'], statistiques['conformite'])
+        inferieure, superieure = critere['limite_inferieure'], critere['limite_superieure']
+        critere['valeur'] = valeur
+        critere['conforme'] = valeur is not None and (inferieure is None or valeur >= inferieure) \
+            and (superieure is None or valeur <= superieure)
+        resultats_lot.append(critere)
 
-#======================================================================================================
-# Overloads
+    lot_conforme = bool(len(conformes)) and bool(conformes.all()) and all(c['conforme'] for c in resultats_lot)
+    conn.execute('UPDATE TableLots SET EstConformeCalculee = ? WHERE IdLot = ?', (int(lot_conforme), id_lot))
+    conn.commit()
 
-# Route spécifique pour la lecture du tableau de capteurs
-@app.route('/Capteur/TableauOverloads', methods=['GET'])
-def lire_tableau_overloads():
+    return {
+        'IdLot': id_lot,
+        'criteres': criteres,
+        'criteres_lot': resultats_lot,
+        'resultats': len(conformes),
+        'conformes': int(conformes.sum()),
+        'non_conformes': ids[conformes == 0].tolist(),
+        'modifies': len(modifies),
+        'lot_conforme': lot_conforme,
+        'duree_ms': round((time.perf_counter() - debut) * 1000, 2)
+    }
+
+@app.route('/Lot/<int:idLot>/evaluer', methods=['POST'])
+def evaluer_conformite_lot(idLot):
     try:
         conn = get_db()
-        query=GenereSQLPourSelectEtoile('TableOverloads')
-        print(query)
-        return ConvertiRequeteEnJSON(query)
-        
-    except Exception as e:
+        if not catalogue_schema.existe('TableStatistiquesLotCumuls'):
+            return jsonify({'error': 'Évaluation indisponible : migrations non appliquées (flask --app main migrer)'}), 503
+        lot = conn.execute('SELECT IdLot, IdProgramme, NombreMaxResultats FROM TableLots WHERE IdLot = ?', (idLot,)).fetchone()
+        if lot is None:
+            return jsonify({'error': 'Lot non trouvé'}), 404
+        invalides = criteres_invalides(conn, lot['IdProgramme'])
+        if invalides:
+            return jsonify({'error': 'Critères de conformité invalides : lot non évalué', 'criteres_invalides': invalides}), 422
+        resultat = evaluer_lot(conn, lot)
+        if resultat is None:
+            return jsonify({'error': 'Aucun critère de conformité avec des bornes pour ce programme'}), 409
+        cache_reponses.invalider('TableResultats', 'TableLots')
+        return jsonify(resultat)
+    except sqlite3.Error as e:
+        if 'conn' in locals():
+            conn.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
         if 'conn' in locals():
             conn.close()
-
 #======================================================================================================
 
 
 
 #======================================================================================================
-# Droits
+# MIGRATIONS ET INDEX
+#
+# Les évolutions du schéma (index compris) sont des migrations numérotées, appliquées dans
+# l'ordre par create_app() ou « flask --app main migrer ». Chaque migration s'exécute dans sa
+# propre transaction (BEGIN IMMEDIATE : un seul processus migre à la fois) et est inscrite
+# dans TableMigrations ; une migration déjà appliquée n'est jamais rejouée. Une table ou une
+# colonne absente de la base (ancienne version du logiciel d'acquisition) est ignorée.
+#
+# Le conseiller d'index (GET /Index/Conseils) passe chaque requête SQL distincte émise par
+# l'API depuis le démarrage (relevée par les métriques) à EXPLAIN QUERY PLAN et signale les
+# parcours complets de table (SCAN sans index), avec l'index qui les éviterait.
 
-# Route spécifique pour la lecture du tableau de capteurs
-@app.route('/Capteur/TableauDroits', methods=['GET'])
-def lire_tableau_Droits():
-    try:
+def creer_index(conn, table, *colonnes):
+    """Crée l'index IndexTableCol1Col2 s'il n'existe pas ; ignore une table ou une colonne absente."""
+    existantes = {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+    if not existantes or not set(colonnes) <= existantes:
+        logger.info(f"Index {table}({', '.join(colonnes)}) ignoré : table ou colonne absente")
+        return
+    nom = 'Index' + table.removeprefix('Table') + ''.join(colonnes)
+    liste = '", "'.join(colonnes)
+    conn.execute(f'CREATE INDEX IF NOT EXISTS "{nom}" ON "{table}" ("{liste}")')
+
+def migration_droits(conn):
+    creer_index(conn, 'TableProfilsDroits', 'IdProfil', 'IdDroit')
+    creer_index(conn, 'TableUtilisateurs', 'IdProfil')
+
+def migration_resultats(conn):
+    creer_index(conn, 'TableResultats', 'IdLot')
+    creer_index(conn, 'TableResultats', 'IdProgramme')
+
+def migration_programmes(conn):
+    # Tables filtrées par programme (IHM : where[IdProgramme][eq]=N)
+    for table in ('TableLots', 'TableAnalyses', 'TableProgrammeCapteur', 'TableResultatsEchantillonsSelect',
+                  'TableStatistiquesLotSelect', 'TableConformiteResultatEchantillonSelect',
+                  'TableConformitesStatistiquesLot', 'TableEtapeActionnementSelect', 'TableTriggersFinSelect'):
+        creer_index(conn, table, 'IdProgramme')
+    for table in ('TableResultatsEchantillonsModele', 'TableStatistiquesLotModele',
+                  'TableConformiteResultatEchantillonModele', 'TableEtapeActionnementModele',
+                  'TableTriggersFinModele'):
+        creer_index(conn, table, 'IdProgrammeModele')
+
+def migration_appareils(conn):
+    creer_index(conn, 'TableConfigAppareil', 'IdAppareil')
+    creer_index(conn, 'TableOptionConfigAppareil', 'IdAppareil')
+
+def migration_resultats_courbes(conn):
+    for instruction in SQL_TABLE_RESULTATS_COURBES:
+        conn.execute(instruction)
+
+def migration_statistiques_lots(conn):
+    colonnes = {row[1] for row in conn.execute('PRAGMA table_info("TableResultats")')}
+    attendues = {'IdResultat', 'IdLot', 'EstIgnore', 'EstConformeManuelle', 'EstConformeCalculee'}
+    if not (attendues | set(ATTRIBUTS_VALEURS_RESULTAT)) <= colonnes:
+        logger.info("Statistiques des lots ignorées : TableResultats incomplète")
+        return
+    for instruction in sql_statistiques_lots():
+        conn.execute(instruction)
+
+def migration_journal_modifications(conn):
+    # Tables et taille du journal : SSE_TABLES et SSE_JOURNAL_MAX au moment de la migration
+    for instruction in diffuseur_modifications.instructions_journal(conn):
+        conn.execute(instruction)
+
+# (version, description, fonction) : ne jamais modifier ni renuméroter une migration publiée
+MIGRATIONS = [
+    (1, 'Index des droits par profil et des utilisateurs par profil', migration_droits),
+    (2, 'Index des résultats par lot et par programme', migration_resultats),
+    (3, 'Index IdProgramme / IdProgrammeModele des tables de programme', migration_programmes),
+    (4, 'Index des configurations par appareil', migration_appareils),
+    (5, 'Table de liaison TableResultatsCourbes', migration_resultats_courbes),
+    (6, 'Agrégats statistiques des lots (tables et triggers de TableResultats)', migration_statistiques_lots),
+    (7, 'Journal des modifications (SSE) et triggers des tables surveillées', migration_journal_modifications),
+]
+
+class GestionnaireMigrations:
+    """Applique les migrations en attente et décrit l'état du schéma."""
+
+    def __init__(self, migrations):
+        self.migrations = sorted(migrations, key=lambda migration: migration[0])
+        self._verrou = threading.Lock()
+
+    @staticmethod
+    def _assurer_table(conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS "TableMigrations" (
+                "Version"           INTEGER NOT NULL PRIMARY KEY,
+                "Description"       TEXT NOT NULL,
+                "DateApplication"   TEXT NOT NULL
+            )""")
+
+    @staticmethod
+    def _versions_appliquees(conn):
+        return {row[0] for row in conn.execute('SELECT Version FROM TableMigrations')}
+
+    def appliquer(self):
+        """Applique les migrations en attente ; retourne les versions appliquées."""
+        appliquees = []
+        with self._verrou:
+            conn = get_db()
+            try:
+                self._assurer_table(conn)
+                for version, description, fonction in self.migrations:
+                    conn.execute('BEGIN IMMEDIATE')
+                    try:
+                        # Relu sous verrou d'écriture : un autre processus a pu migrer entre-temps
+                        if version in self._versions_appliquees(conn):
+                            conn.rollback()
+                            continue
+                        debut = time.perf_counter()
+                        fonction(conn)
+                        conn.execute('INSERT INTO TableMigrations (Version, Description, DateApplication) VALUES (?, ?, ?)',
+                                     (version, description, datetime.now().isoformat(timespec='seconds')))
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        logger.exception(f"Échec de la migration {version} ({description})")
+                        raise
+                    appliquees.append(version)
+                    logger.info(f"Migration {version} appliquée ({description}) en {time.perf_counter() - debut:.3f} s")
+                if appliquees:
+                    # Statistiques des nouveaux index pour le planificateur
+                    conn.execute('PRAGMA optimize')
+                    catalogue_schema.invalider()
+            finally:
+                conn.close()
+        return appliquees
+
+    def etat(self):
         conn = get_db()
-        query="""
-            SELECT
-            TableDroits.IdDroit as 'TableDroits..IdDroit..',
-            TableDroits.Nom as 'TableDroits..Nom..',
-            TableDroits2.nom as 'TableDroits..IdDroitPrerequis..',
-            TableDroits.EstModifiable as 'TableDroits..EstModifiable..',
-            TableDroits.EstAffichable as 'TableDroits..EstAffichable..',
-            TableDroits.ReferenceTraduction as 'TableDroits..ReferenceTraduction..'
-            FROM TableDroits left join TableDroits TableDroits2 on TableDroits.IdDroitPrerequis=TableDroits2.IdDroit
-            """
-        print(query)
-        return ConvertiRequeteEnJSON(query)
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        if 'conn' in locals():
+        try:
+            # Lecture seule : sans TableMigrations, aucune migration n'est appliquée
+            appliquees = {}
+            if catalogue_schema.existe('TableMigrations'):
+                appliquees = {row['Version']: dict(row) for row in conn.execute('SELECT * FROM TableMigrations')}
+            index = [{'nom': row['name'], 'table': row['tbl_name'], 'sql': row['sql']} for row in conn.execute(
+                "SELECT name, tbl_name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL ORDER BY tbl_name, name")]
+        finally:
             conn.close()
+        return {
+            'version': max(appliquees, default=0),
+            'appliquees': [appliquees[version] for version in sorted(appliquees)],
+            'en_attente': [{'Version': version, 'Description': description}
+                           for version, description, _ in self.migrations if version not in appliquees],
+            'index': index
+        }
 
-#======================================================================================================
+gestionnaire_migrations = GestionnaireMigrations(MIGRATIONS)
 
+#------------------------------------------------------------------------------------------------------
+# Conseiller d'index
 
+RE_TABLE_ALIAS = re.compile(r'\b(?:FROM|JOIN|UPDATE)\s+["\[`]?(\w+)["\]`]?(?:\s+(?:AS\s+)?(?!WHERE\b|ON\b|JOIN\b|LEFT\b|INNER\b|CROSS\b|ORDER\b|GROUP\b|LIMIT\b|SET\b|USING\b)(\w+))?', re.IGNORECASE)
+RE_COLONNE_FILTRE = re.compile(r'(?:["\[`]?(\w+)["\]`]?\.)?["\[`]?(\w+)["\]`]?\s*(?:=|<=|>=|<|>|\bIN\b|\bIS\b|\bLIKE\b|\bBETWEEN\b)', re.IGNORECASE)
+RE_PLAN_SCAN = re.compile(r'^SCAN (\w+)(.*)$')
+RE_NOMBRE_PARAMETRES = re.compile(r'uses (\d+)')
+RE_PARAMETRES_NOMMES = re.compile(r'[:@$](\w+)')
 
+class ConseillerIndex:
+    """Analyse par EXPLAIN QUERY PLAN les requêtes émises par l'API."""
 
+    @staticmethod
+    def _plan(conn, sql):
+        # Les valeurs n'influencent pas le plan : NULL pour chaque paramètre
+        try:
+            return conn.execute(f'EXPLAIN QUERY PLAN {sql}').fetchall()
+        except sqlite3.ProgrammingError as e:
+            nombre = RE_NOMBRE_PARAMETRES.search(str(e))
+            if nombre:
+                parametres = (None,) * int(nombre.group(1))
+            else:
+                parametres = dict.fromkeys(RE_PARAMETRES_NOMMES.findall(sql))
+            return conn.execute(f'EXPLAIN QUERY PLAN {sql}', parametres).fetchall()
 
-#======================================================================================================
-# CAPTEURS
+    @staticmethod
+    def _colonnes_filtrees(sql, table, alias):
+        """Colonnes de la table parcourue comparées dans WHERE / ON, dans l'ordre d'apparition."""
+        position = re.search(r'\b(?:WHERE|ON)\b', sql, re.IGNORECASE)
+        if not position:
+            return []
+        fin = re.search(r'\b(?:ORDER\s+BY|GROUP\s+BY|LIMIT)\b', sql[position.start():], re.IGNORECASE)
+        clause = sql[position.start():position.start() + fin.start()] if fin else sql[position.start():]
+        noms = catalogue_schema.noms_colonnes(table)
+        colonnes = []
+        for qualificatif, colonne in RE_COLONNE_FILTRE.findall(clause):
+            if qualificatif and qualificatif not in (table, alias):
+                continue
+            if colonne in noms and colonne not in colonnes:
+                colonnes.append(colonne)
+        return colonnes
 
-# Route spécifique pour la lecture du tableau de capteurs
-@app.route('/Capteur/TableauCapteurs', methods=['GET'])
-def lire_tableau_capteurs():
-    try:
+    def analyser(self):
+        conseils = []
+        erreurs = []
+        requetes = metriques.requetes_distinctes()
         conn = get_db()
-        query=GenereSQLPourSelectEtoile('TableCapteur')
-        return ConvertiRequeteEnJSON(query)
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        if 'conn' in locals():
+        try:
+            nombre_lignes = {}
+            for sql in requetes:
+                try:
+                    plan = self._plan(conn, sql)
+                except sqlite3.Error as e:
+                    erreurs.append({'requete': sql, 'erreur': str(e)})
+                    continue
+                alias = {}
+                for table, nom in RE_TABLE_ALIAS.findall(sql):
+                    alias[nom or table] = table
+                tri_temporaire = any('TEMP B-TREE' in row['detail'] for row in plan)
+                for row in plan:
+                    scan = RE_PLAN_SCAN.match(row['detail'])
+                    if not scan or 'INDEX' in scan.group(2):
+                        continue
+                    table = alias.get(scan.group(1), scan.group(1))
+                    if not catalogue_schema.existe(table):
+                        continue  # sous-requête, CTE ou table virtuelle
+                    if table not in nombre_lignes:
+                        # Curseur non mesuré : ce comptage ne doit pas figurer parmi les requêtes de l'API
+                        nombre_lignes[table] = conn.cursor(sqlite3.Cursor).execute(
+                            f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+                    colonnes = self._colonnes_filtrees(sql, table, scan.group(1))
+                    conseil = {
+                        'requete': sql,
+                        'plan': [row['detail'] for row in plan],
+                        'table': table,
+                        'lignes': nombre_lignes[table],
+                        'tri_temporaire': tri_temporaire
+                    }
+                    if colonnes:
+                        nom = 'Index' + table.removeprefix('Table') + ''.join(colonnes)
+                        liste = '", "'.join(colonnes)
+                        conseil['index_suggere'] = f'CREATE INDEX "{nom}" ON "{table}" ("{liste}")'
+                    else:
+                        conseil['index_suggere'] = None
+                        conseil['remarque'] = 'lecture complète : aucun filtre indexable sur cette table'
+                    conseils.append(conseil)
+        finally:
             conn.close()
+        # Les parcours les plus coûteux d'abord, ceux qu'un index éviterait avant les lectures complètes
+        conseils.sort(key=lambda conseil: (conseil['index_suggere'] is None, -conseil['lignes']))
+        return {'requetes_analysees': len(requetes), 'parcours_complets': len(conseils),
+                'conseils': conseils, 'erreurs': erreurs}
+
+conseiller_index = ConseillerIndex()
 
+@app.cli.command('migrer')
+def commande_migrer():
+    """Applique les migrations de schéma en attente."""
+    configuration_logging.demarrer()
+    appliquees = gestionnaire_migrations.appliquer()
+    print(f"Migrations appliquées : {', '.join(map(str, appliquees))}" if appliquees else "Schéma à jour")
+
+@app.route('/Index/Migrations', methods=['GET'])
+def etat_migrations():
+    try:
+        return jsonify(gestionnaire_migrations.etat())
+    except sqlite3.Error as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/Index/Conseils', methods=['GET'])
+def conseils_index():
+    if not metriques.actif:
+        return jsonify({'error': 'Conseiller indisponible : METRIQUES_ACTIVES=0'}), 503
+    return jsonify(conseiller_index.analyser())
 #======================================================================================================
 
 
 
 #======================================================================================================
-# COURBES
-@app.route('/Courbe/CsvVersJson', methods=['GET'])
-def lire_csv_courbes():
-    try:
-        # Récupération du nom du fichier depuis les paramètres de requête
-        nom_fichier = request.args.get('nom_fichier')
-        if not nom_fichier:
-            return jsonify({'error': 'Le paramètre nom_fichier est requis'}), 400
+# FLUX DE MODIFICATIONS (Server-Sent Events)
+#
+# Des triggers AFTER INSERT/UPDATE/DELETE sur les tables surveillées (SSE_TABLES) inscrivent la
+# clé primaire de chaque ligne modifiée dans TableJournalModifications, dans la transaction de
+# l'écrivain (API ou logiciel d'acquisition). Le journal est borné à SSE_JOURNAL_MAX lignes par
+# un trigger de purge, sans écriture supplémentaire de l'API. Journal et triggers sont créés par
+# la migration 7 : une table ajoutée ensuite à SSE_TABLES demande une nouvelle migration.
+#
+# Un seul thread de surveillance par processus lit PRAGMA data_version toutes les SSE_INTERVALLE
+# secondes ; quand la base a changé, il lit les nouvelles lignes du journal, construit un
+# événement par table et le dépose dans la file de chaque abonné. Le coût ne dépend donc pas du
+# nombre d'écrans abonnés.
+#
+# GET /Flux/Modifications?tables=TableOverloads,TableCapteur[&lignes=1]
+#     event: modification
+#     id: <IdModification>
+#     data: {"table": "TableOverloads", "insert": [...], "update": [...], "delete": [...]}
+# Avec lignes=1, les lignes insérées ou modifiées sont jointes ("lignes"). Un client reconnecté
+# (en-tête Last-Event-ID) reçoit les modifications manquées ; si elles ne sont plus dans le
+# journal, ou si sa file a débordé, il reçoit un événement "resynchronisation" et doit relire
+# les tables.
+#
+# Le serveur est synchrone (gunicorn gthread, waitress) : chaque client SSE occupe un thread
+# de requête tant qu'il est connecté. SSE_ABONNES_MAX borne le nombre de clients par processus
+# (défaut : la moitié de SERVEUR_THREADS) pour laisser des threads aux autres requêtes ; au-delà
+# la route répond 503 avec Retry-After.
 
-        # Construction du chemin complet du fichier
-        chemin_fichier = os.path.join(nom_fichier)
-        print(f"Tentative de lecture du fichier : {chemin_fichier}")
-        
-        if not os.path.exists(chemin_fichier):
-            return jsonify({'error': f'Le fichier {nom_fichier} n\'existe pas'}), 404
+SSE_TABLES = [t.strip() for t in os.getenv('SSE_TABLES', 'TableOverloads,TableCapteur,TableResultats,TableLots').split(',') if t.strip()]
+SSE_INTERVALLE = float(os.getenv('SSE_INTERVALLE', '0.25'))
+SSE_JOURNAL_MAX = int(os.getenv('SSE_JOURNAL_MAX', '10000'))
+SSE_ABONNES_MAX = int(os.getenv('SSE_ABONNES_MAX', str(max(1, int(os.getenv('SERVEUR_THREADS', '4')) // 2))))
+SSE_PING = 15
+SSE_TAILLE_FILE = 256
+SSE_LIGNES_MAX = 500  # au-delà, l'événement ne porte que les clés
 
-        # Lecture du fichier CSV
-        import csv
-        import json
-        from datetime import datetime
+class Abonnement:
+    """File d'événements d'un client SSE."""
 
-        result = {
-            "metadata": [],
-            "data": []
-        }
+    def __init__(self, tables, lignes):
+        self.tables = set(tables)
+        self.lignes = lignes
+        self.file = queue.Queue(maxsize=SSE_TAILLE_FILE)
+        self.a_resynchroniser = False
 
-        with open(chemin_fichier, 'r', encoding='utf-8') as file:
-            # Lecture de la première ligne pour les types de données
-            types_line = next(csv.reader(file,delimiter=';'))
-            file.seek(0)  # Retour au début du fichier
-            
-            # Lecture des en-têtes
-            csv_reader = csv.reader(file,delimiter=';')
-            headers = next(csv_reader)
-            print(headers)
-
-            # Lecture des données
-            for row in csv_reader:
-                if len(row) != len(headers):
-                    print(f"Attention: ligne ignorée car nombre de colonnes incorrect: {row}")
+    def deposer(self, evenement):
+        try:
+            self.file.put_nowait(evenement)
+        except queue.Full:
+            self.a_resynchroniser = True
+
+    def suivant(self, delai):
+        """Prochain événement à envoyer, ou None après delai secondes sans événement."""
+        if self.a_resynchroniser:
+            self.a_resynchroniser = False
+            while not self.file.empty():
+                self.file.get_nowait()
+            return 'event: resynchronisation\ndata: {}\n\n'
+        try:
+            return self.file.get(timeout=delai)
+        except queue.Empty:
+            return None
+
+class DiffuseurModifications:
+    """Thread de surveillance unique et diffusion des modifications aux abonnés."""
+
+    def __init__(self, chemin_base, tables, intervalle, abonnes_max):
+        self.chemin_base = chemin_base
+        self.tables = tables
+        self.intervalle = intervalle
+        self.abonnes_max = abonnes_max
+        self._verrou = threading.Lock()
+        self._abonnements = []
+        self._thread = None
+        self._arret = threading.Event()
+        self._initialise = False
+        self.dernier_id = 0
+        self.evenements = 0
+        self.refus = 0
+
+    def instructions_journal(self, conn):
+        """
+        Instructions créant le journal, son trigger de purge et les triggers des tables
+        surveillées, exécutées par la migration 7. Les tables absentes sont ignorées.
+        """
+        instructions = ["""
+            CREATE TABLE IF NOT EXISTS "TableJournalModifications" (
+                "IdModification"    INTEGER PRIMARY KEY AUTOINCREMENT,
+                "NomTable"          TEXT NOT NULL,
+                "IdEnregistrement",                                 -- sans type : la clé garde son type d'origine
+                "Operation"         TEXT NOT NULL
+            )""", f"""
+            CREATE TRIGGER IF NOT EXISTS "JournalModifications_Purge"
+            AFTER INSERT ON "TableJournalModifications"
+            BEGIN
+                DELETE FROM "TableJournalModifications" WHERE "IdModification" <= NEW."IdModification" - {SSE_JOURNAL_MAX};
+            END"""]
+        for table in self.tables:
+            colonnes = conn.execute(f'PRAGMA table_info("{table}")').fetchall()
+            if not colonnes:
+                logger.warning(f"Table {table} introuvable, non surveillée")
+                continue
+            cles = [colonne[1] for colonne in colonnes if colonne[5]]
+            cle = cles[0] if len(cles) == 1 else 'rowid'
+            for operation, ligne in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+                instructions.append(f"""
+                    CREATE TRIGGER IF NOT EXISTS "JournalModifications_{table}_{operation}"
+                    AFTER {operation} ON "{table}"
+                    BEGIN
+                        INSERT INTO "TableJournalModifications" ("NomTable", "IdEnregistrement", "Operation")
+                        VALUES ('{table}', {ligne}."{cle}", '{operation.lower()}');
+                    END""")
+        return instructions
+
+    def tables_journalisees(self, conn):
+        """Tables surveillées dont les triggers de journalisation sont installés."""
+        triggers = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'JournalModifications_%'")}
+        return [table for table in self.tables if f'JournalModifications_{table}_INSERT' in triggers]
+
+    def _demarrer(self):
+        # Appelé sous verrou
+        if not self._initialise:
+            self.dernier_id = get_db().execute(
+                'SELECT COALESCE(MAX("IdModification"), 0) FROM "TableJournalModifications"').fetchone()[0]
+            self._initialise = True
+        if self._thread is None or not self._thread.is_alive():
+            self._arret.clear()
+            self._thread = threading.Thread(target=self._boucle, name='DiffuseurModifications', daemon=True)
+            self._thread.start()
+
+    def abonner(self, tables, lignes):
+        """
+        Inscrit un abonné ; retourne (abonnement, dernier IdModification déjà diffusé), ou
+        (None, None) si le nombre maximal d'abonnés est atteint.
+        """
+        abonnement = Abonnement(tables, lignes)
+        with self._verrou:
+            if len(self._abonnements) >= self.abonnes_max:
+                self.refus += 1
+                return None, None
+            self._demarrer()
+            self._abonnements.append(abonnement)
+            return abonnement, self.dernier_id
+
+    def desabonner(self, abonnement):
+        with self._verrou:
+            if abonnement in self._abonnements:
+                self._abonnements.remove(abonnement)
+
+    def lire_journal(self, conn, apres, jusqua=None):
+        filtre, params = '', [apres]
+        if jusqua is not None:
+            filtre, params = 'AND "IdModification" <= ?', [apres, jusqua]
+        return conn.execute(f"""
+            SELECT "IdModification", "NomTable", "IdEnregistrement", "Operation"
+            FROM "TableJournalModifications"
+            WHERE "IdModification" > ? {filtre}
+            ORDER BY "IdModification"
+        """, params).fetchall()
+
+    @staticmethod
+    def _regrouper(entrees):
+        """{table: (dernier id, {'insert': [...], 'update': [...], 'delete': [...]})}"""
+        par_table = {}
+        for id_modification, table, cle, operation in entrees:
+            dernier, cles = par_table.setdefault(table, [0, {'insert': {}, 'update': {}, 'delete': {}}])
+            par_table[table][0] = id_modification
+            cles[operation][cle] = None  # dict : ordre conservé, sans doublon
+        return {table: (dernier, {op: list(c) for op, c in cles.items()})
+                for table, (dernier, cles) in par_table.items()}
+
+    @staticmethod
+    def _lire_lignes(conn, table, cles):
+        cle = catalogue_schema.cle_primaire(table) or 'rowid'
+        valeurs = list(dict.fromkeys(cles['insert'] + cles['update']))
+        if not valeurs or len(valeurs) > SSE_LIGNES_MAX:
+            return None
+        placeholders = ', '.join('?' for _ in valeurs)
+        curseur = conn.execute(f'SELECT * FROM "{table}" WHERE "{cle}" IN ({placeholders})', valeurs)
+        return [dict(zip([d[0] for d in curseur.description], ligne)) for ligne in curseur.fetchall()]
+
+    @staticmethod
+    def _evenement(table, dernier, cles, lignes=None):
+        donnees = {'table': table, **cles}
+        if lignes is not None:
+            donnees['lignes'] = lignes
+        return f'id: {dernier}\nevent: modification\ndata: {json.dumps(donnees, default=str)}\n\n'
+
+    def evenements_journal(self, conn, entrees, avec_lignes, tables):
+        """Événements SSE correspondant à des lignes du journal, filtrés sur tables."""
+        for table, (dernier, cles) in self._regrouper(entrees).items():
+            if table in tables:
+                lignes = self._lire_lignes(conn, table, cles) if avec_lignes else None
+                yield self._evenement(table, dernier, cles, lignes)
+
+    def _diffuser(self, conn, entrees):
+        # Appelé sous verrou : un abonné inscrit pendant la diffusion voit dernier_id à jour
+        abonnements = self._abonnements
+        for table, (dernier, cles) in self._regrouper(entrees).items():
+            abonnes = [a for a in abonnements if table in a.tables]
+            if not abonnes:
+                continue
+            # Chaque variante de l'événement n'est construite qu'une fois pour tous les abonnés
+            sans_lignes = self._evenement(table, dernier, cles)
+            avec_lignes = None
+            if any(a.lignes for a in abonnes):
+                avec_lignes = self._evenement(table, dernier, cles, self._lire_lignes(conn, table, cles))
+            for abonnement in abonnes:
+                abonnement.deposer(avec_lignes if abonnement.lignes else sans_lignes)
+            self.evenements += 1
+
+    def _boucle(self):
+        conn = sqlite3.connect(self.chemin_base, check_same_thread=False)
+        version = version_donnees.lire()
+        try:
+            while not self._arret.wait(self.intervalle):
+                nouvelle_version = version_donnees.lire()
+                if nouvelle_version == version:
                     continue
-                    
-                row_dict = {}
-                for i, value in enumerate(row):
-                    if not value.strip():  # Si la valeur est vide
-                        row_dict[f"CSV..{headers[i]}.."] = None
-                        continue
-                        
-                    try:
-                        # Conversion selon le type spécifié
-                        type_champ = types_line[i] if i < len(types_line) else "string"
-                        if type_champ == "number":
-                            if '.' in value:
-                                row_dict[f"CSV..{headers[i]}.."] = float(value)
-                            else:
-                                row_dict[f"CSV..{headers[i]}.."] = int(value)
-                        elif type_champ == "date":
-                            row_dict[f"CSV..{headers[i]}.."] = datetime.strptime(value, '%Y-%m-%d %H:%M:%S').isoformat()
-                        else:
-                            row_dict[f"CSV..{headers[i]}.."] = value
-                    except Exception as e:
-                        print(f"Erreur de conversion pour la valeur '{value}' dans la colonne {headers[i]}: {str(e)}")
-                        row_dict[f"CSV..{headers[i]}.."] = value
-
-                result["data"].append(row_dict)
+                version = nouvelle_version
+                try:
+                    entrees = self.lire_journal(conn, self.dernier_id)
+                    if entrees:
+                        with self._verrou:
+                            self._diffuser(conn, entrees)
+                            self.dernier_id = entrees[-1][0]
+                except sqlite3.Error as e:
+                    logger.warning(f"Lecture du journal des modifications impossible : {str(e)}")
+        finally:
+            conn.close()
 
-        return jsonify(result)
+    def arreter(self):
+        self._arret.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
 
-    except Exception as e:
-        print(f"Erreur lors de la lecture du CSV: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+    def statistiques(self):
+        return {
+            'abonnes': len(self._abonnements),
+            'abonnes_max': self.abonnes_max,
+            'refus': self.refus,
+            'tables': self.tables,
+            'dernier_id': self.dernier_id,
+            'evenements': self.evenements,
+            'actif': self._thread is not None and self._thread.is_alive()
+        }
 
+diffuseur_modifications = DiffuseurModifications(DATABASE, SSE_TABLES, SSE_INTERVALLE, SSE_ABONNES_MAX)
+atexit.register(diffuseur_modifications.arreter)
 
+@app.route('/Flux/Modifications', methods=['GET'])
+def flux_modifications():
+    tables = [t for t in request.args.get('tables', '').split(',') if t]
+    if not tables:
+        return jsonify({'error': 'Le paramètre tables est requis'}), 400
+    non_surveillees = [t for t in tables if t not in SSE_TABLES]
+    if non_surveillees:
+        return jsonify({'error': f'Tables non surveillées : {", ".join(non_surveillees)} (SSE_TABLES : {", ".join(SSE_TABLES)})'}), 400
+    avec_lignes = request.args.get('lignes', '').lower() in ('1', 'true', 'oui')
 
+    dernier_recu = request.headers.get('Last-Event-ID', request.args.get('depuis'))
+    try:
+        dernier_recu = int(dernier_recu) if dernier_recu not in (None, '') else None
+    except ValueError:
+        return jsonify({'error': 'Last-Event-ID invalide'}), 400
 
-@app.route('/Courbe/TelechargerCSV', methods=['GET'])
-def telecharger_csv():
+    if not catalogue_schema.existe('TableJournalModifications'):
+        return jsonify({'error': 'Flux indisponible : migrations non appliquées (flask --app main migrer)'}), 503
     try:
-        # Récupération du nom du fichier depuis les paramètres de requête
-        nom_fichier = request.args.get('nom_fichier')
-        if not nom_fichier:
-            return jsonify({'error': 'Le paramètre nom_fichier est requis'}), 400
+        sans_journal = [t for t in tables if t not in diffuseur_modifications.tables_journalisees(get_db())]
+        if sans_journal:
+            return jsonify({'error': f'Tables sans journal des modifications : {", ".join(sans_journal)} '
+                                     f'(ajoutées à SSE_TABLES après la migration 7)'}), 503
+        abonnement, deja_diffuse = diffuseur_modifications.abonner(tables, avec_lignes)
+    except sqlite3.Error as e:
+        return jsonify({'error': f'Lecture du journal des modifications impossible : {str(e)}'}), 500
+    if abonnement is None:
+        response = jsonify({'error': f'Trop de clients connectés au flux ({diffuseur_modifications.abonnes_max} par processus, SSE_ABONNES_MAX)'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
 
-        # Construction du chemin complet du fichier
-        chemin_fichier = os.path.join(os.path.dirname(__file__), 'CSVCourbes', nom_fichier)
-        print(chemin_fichier)
-        
-        if not os.path.exists(chemin_fichier):
-            return jsonify({'error': f'Le fichier {nom_fichier} n\'existe pas'}), 404
+    def evenements():
+        try:
+            yield 'retry: 3000\n\n'
+            if dernier_recu is not None and dernier_recu < deja_diffuse:
+                # Rattrapage des modifications déjà diffusées que le client n'a pas reçues
+                conn = get_db()
+                entrees = diffuseur_modifications.lire_journal(conn, dernier_recu, deja_diffuse)
+                if not entrees or entrees[0][0] != dernier_recu + 1:
+                    # Le journal a été purgé depuis : le client doit tout relire
+                    yield 'event: resynchronisation\ndata: {}\n\n'
+                else:
+                    yield from diffuseur_modifications.evenements_journal(conn, entrees, avec_lignes, abonnement.tables)
+            while True:
+                evenement = abonnement.suivant(SSE_PING)
+                yield evenement if evenement is not None else ': ping\n\n'
+        finally:
+            diffuseur_modifications.desabonner(abonnement)
 
-        # Création de la réponse avec le fichier CSV
-        response = make_response(open(chemin_fichier, 'rb').read())
-        response.headers['Content-Type'] = 'text/csv'
-        response.headers['Content-Disposition'] = f'attachment; filename={nom_fichier}'
-        
-        return response
+    response = Response(evenements(), mimetype='text/event-stream')
+    # Un générateur jamais démarré ne passe pas par son finally : place libérée à la fermeture
+    response.call_on_close(lambda: diffuseur_modifications.desabonner(abonnement))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
-    except Exception as e:
-        print(f"Erreur lors du téléchargement du CSV: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+@app.route('/Flux/Statistiques', methods=['GET'])
+def statistiques_flux():
+    return jsonify(diffuseur_modifications.statistiques())
+#======================================================================================================
 
-@app.route('/Courbe/ListeFichiersCSV', methods=['GET'])
-def liste_fichiers_csv():
+
+
+#======================================================================================================
+# SERVEUR
+#
+# create_app() démarre le log, applique les migrations, construit les caches (schéma, TableDescriptionTable,
+# droits effectifs) et retourne l'application. La commande « flask --app main servir » (ou « python main.py
+# servir ») lance un serveur de production :
+#   - gunicorn sous Linux : plusieurs processus (workers) de plusieurs threads, application
+#     préchargée dans le processus maître pour ne construire les caches qu'une fois ;
+#   - waitress sous Windows : un processus, plusieurs threads.
+#
+#   SERVEUR_ADRESSE            0.0.0.0:5000
+#   SERVEUR_WORKERS            2 (gunicorn)
+#   SERVEUR_THREADS            4
+#   SERVEUR_KEEPALIVE          5 s
+#   SERVEUR_TIMEOUT            30 s (requête bloquée au-delà : le worker est redémarré)
+#   SERVEUR_ARRET_GRACIEUX     30 s (délai laissé aux requêtes en cours à l'arrêt)
+#
+# Chaque worker a ses propres caches, mais aucun ne dépend d'une invalidation locale pour
+# rester juste : le cache des réponses est vidé quand PRAGMA data_version change sans écriture
+# de ce worker, le schéma suit schema_version, TableDescriptionTable et les droits effectifs
+# se reconstruisent quand data_version a bougé. L'écriture faite par un worker est donc vue par les autres à la
+# requête suivante (au plus INTERVALLE_VERIFICATION_DROITS secondes pour les droits).
+
+def create_app():
+    """Démarre le log, applique les migrations, construit les caches puis retourne l'application Flask."""
+    configuration_logging.demarrer()
+    gestionnaire_migrations.appliquer()
+    catalogue_schema.tables()
+    cache_description.charger()
+    droits_effectifs.charger()
+    return app
+
+def fermer_connexions():
+    """Ferme les connexions SQLite, qui ne doivent pas traverser un fork."""
+    diffuseur_modifications.arreter()
+    pool_connexions.fermer_tout()
+    version_donnees.fermer()
+
+def liberer_ressources():
+    """Ferme les connexions SQLite et arrête le thread de log (à l'arrêt)."""
+    fermer_connexions()
+    configuration_logging.arreter()
+
+def configuration_serveur():
+    return {
+        'adresse': os.getenv('SERVEUR_ADRESSE', '0.0.0.0:5000'),
+        'workers': int(os.getenv('SERVEUR_WORKERS', '2')),
+        'threads': int(os.getenv('SERVEUR_THREADS', '4')),
+        'keepalive': int(os.getenv('SERVEUR_KEEPALIVE', '5')),
+        'timeout': int(os.getenv('SERVEUR_TIMEOUT', '30')),
+        'arret_gracieux': int(os.getenv('SERVEUR_ARRET_GRACIEUX', '30'))
+    }
+
+def servir_gunicorn(configuration):
+    from gunicorn.app.base import BaseApplication
+
+    def apres_chargement(server):
+        # Les caches sont construits dans le maître ; les connexions ne doivent pas traverser
+        # le fork, elles sont rouvertes à la demande dans chaque worker. Le maître garde son
+        # thread de log pour ses propres messages (démarrage, workers redémarrés).
+        fermer_connexions()
+
+    def apres_fork(server, worker):
+        configuration_logging.apres_fork()
+
+    def fin_worker(server, worker):
+        liberer_ressources()
+
+    class ApplicationGunicorn(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', configuration['adresse'])
+            self.cfg.set('workers', configuration['workers'])
+            self.cfg.set('threads', configuration['threads'])
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('keepalive', configuration['keepalive'])
+            self.cfg.set('timeout', configuration['timeout'])
+            self.cfg.set('graceful_timeout', configuration['arret_gracieux'])
+            self.cfg.set('preload_app', True)
+            self.cfg.set('when_ready', apres_chargement)
+            self.cfg.set('post_fork', apres_fork)
+            self.cfg.set('worker_exit', fin_worker)
+
+        def load(self):
+            return create_app()
+
+    ApplicationGunicorn().run()
+
+def servir_waitress(configuration):
+    from waitress import serve
+
+    hote, _, port = configuration['adresse'].rpartition(':')
     try:
-        # Chemin du dossier contenant les fichiers CSV
-        dossier = 'ACRN_API_REST_EMBARQ\CSVCourbes'
-        
-        # Liste tous les fichiers du dossier
-        fichiers = os.listdir(dossier)
-        
-        # Filtre pour ne garder que les fichiers CSV
-        fichiers_csv = [f for f in fichiers if f.lower().endswith('.csv')]
-        
-        # Création de la réponse JSON
-        result = {
-            "data": [{"NomFichierCSV": fichier} for fichier in fichiers_csv]
-        }
-        
-        return jsonify(result)
+        serve(create_app(), host=hote or '0.0.0.0', port=int(port),
+              threads=configuration['threads'],
+              channel_timeout=configuration['keepalive'] + configuration['timeout'])
+    finally:
+        liberer_ressources()
 
-    except Exception as e:
-        print(f"Erreur lors de la lecture des fichiers CSV: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+def servir():
+    """Lance l'API avec un serveur de production (gunicorn, ou waitress sous Windows)."""
+    configuration = configuration_serveur()
+    if os.name == 'posix':
+        try:
+            import gunicorn  # noqa: F401
+        except ImportError:
+            raise SystemExit("gunicorn n'est pas installé : pip install -r requirements.txt")
+        servir_gunicorn(configuration)
+    else:
+        try:
+            import waitress  # noqa: F401
+        except ImportError:
+            raise SystemExit("waitress n'est pas installé : pip install -r requirements.txt")
+        servir_waitress(configuration)
 
+@app.cli.command('servir')
+def commande_servir():
+    """Lance l'API avec un serveur de production (gunicorn, ou waitress sous Windows)."""
+    servir()
+#======================================================================================================
 
 
 
 if __name__ == '__main__':
-    DictDesriptionTable = get_table_description_dict()
-
-    app.run(debug=True) 
+    configuration_logging.demarrer()
+    if sys.argv[1:2] == ['servir']:
+        servir()
+    else:
+        create_app().run(debug=True) 
 
     
\ No newline at end of file
@@ -0,0 +1,59 @@
+"""
+Environnement de test : l'API tourne sur une copie temporaire de Bdd_Systeme_ACRN_NEW.db,
+remise à l'état de référence avant chaque test (fixture base).
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+import pytest
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASE_REFERENCE = os.path.join(RACINE, 'Bdd_Systeme_ACRN_NEW.db')
+DOSSIER_TEST = tempfile.mkdtemp(prefix='acrn-tests-')
+CHEMIN_BASE = os.path.join(DOSSIER_TEST, 'base.db')
+
+shutil.copy(BASE_REFERENCE, CHEMIN_BASE)
+os.environ['DATABASE_URL'] = 'sqlite:///' + CHEMIN_BASE
+os.environ['DOSSIER_COURBES'] = os.path.join(DOSSIER_TEST, 'CSVCourbes')
+os.environ['DOSSIER_CACHE_COURBES'] = os.path.join(DOSSIER_TEST, 'cache_courbes')
+os.environ.setdefault('LOG_NIVEAU', 'WARNING')
+sys.path.insert(0, RACINE)
+
+import main  # noqa: E402
+
+
+@pytest.fixture
+def base():
+    """Copie de référence de la base, connexions fermées et caches vidés."""
+    main.diffuseur_modifications.arreter()
+    main.diffuseur_modifications._initialise = False  # la base de référence est recopiée
+    main.pool_connexions.fermer_tout()
+    main.version_donnees.fermer()
+    for suffixe in ('-wal', '-shm'):
+        if os.path.exists(CHEMIN_BASE + suffixe):
+            os.remove(CHEMIN_BASE + suffixe)
+    shutil.copy(BASE_REFERENCE, CHEMIN_BASE)
+    shutil.rmtree(main.DOSSIER_COURBES, ignore_errors=True)
+    shutil.copytree(os.path.join(RACINE, 'CSVCourbes'), main.DOSSIER_COURBES)
+    main.cache_reponses.vider()
+    main.registre_etags.vider()
+    main.catalogue_schema.invalider()
+    main.create_app()
+    yield CHEMIN_BASE
+    main.pool_connexions.nettoyer()
+
+
+@pytest.fixture
+def client(base):
+    return main.app.test_client()
+
+
+@pytest.fixture
+def connexion_externe(base):
+    """Connexion hors API, comme celle du logiciel d'acquisition."""
+    conn = sqlite3.connect(base)
+    yield conn
+    conn.close()
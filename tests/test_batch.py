@@ -0,0 +1,72 @@
+"""Écritures par lot sur les tables génériques."""
+import json
+
+
+def compter(connexion_externe, condition=''):
+    return connexion_externe.execute(f"SELECT COUNT(*) FROM TableOverloads {condition}").fetchone()[0]
+
+
+def test_lot_tableau_json(client, connexion_externe):
+    avant = compter(connexion_externe)
+    id_existant = connexion_externe.execute("SELECT MIN(IdOverload) FROM TableOverloads").fetchone()[0]
+    reponse = client.post('/TableOverloads/batch', json=[
+        {'op': 'insert', 'data': {'TypeOverload': 'LOT', 'NomNumeroLot': 'lot_batch'}},
+        {'op': 'insert', 'data': {'TypeOverload': 'LOT', 'NomNumeroLot': 'lot_batch'}},
+        {'op': 'update', 'id': id_existant, 'data': {'NomNumeroLot': 'lot_batch'}},
+        {'op': 'delete', 'id': id_existant},
+    ])
+    assert reponse.status_code == 200, reponse.get_json()
+    corps = reponse.get_json()
+    assert (corps['insert'], corps['update'], corps['delete'], corps['erreurs']) == (2, 1, 1, [])
+    assert compter(connexion_externe) == avant + 1
+    assert compter(connexion_externe, "WHERE NomNumeroLot = 'lot_batch'") == 2
+
+
+def test_lot_ndjson(client, connexion_externe):
+    corps = '\n'.join(json.dumps({'op': 'insert', 'data': {'TypeOverload': 'NDJSON'}}) for _ in range(3))
+    reponse = client.post('/TableOverloads/batch', data=corps + '\n', content_type='application/x-ndjson')
+    assert reponse.status_code == 200, reponse.get_json()
+    assert reponse.get_json()['insert'] == 3
+    assert compter(connexion_externe, "WHERE TypeOverload = 'NDJSON'") == 3
+
+
+def test_mode_tout_annule_le_lot(client, connexion_externe):
+    avant = compter(connexion_externe)
+    id_existant = connexion_externe.execute("SELECT MIN(IdOverload) FROM TableOverloads").fetchone()[0]
+    reponse = client.post('/TableOverloads/batch', json=[
+        {'op': 'insert', 'data': {'TypeOverload': 'TOUT'}},
+        {'op': 'insert', 'data': {'IdOverload': id_existant, 'TypeOverload': 'TOUT'}},
+    ])
+    assert reponse.status_code == 409
+    assert [erreur['index'] for erreur in reponse.get_json()['erreurs']] == [1]
+    assert compter(connexion_externe) == avant
+
+
+def test_mode_ligne_applique_les_operations_valides(client, connexion_externe):
+    id_existant = connexion_externe.execute("SELECT MIN(IdOverload) FROM TableOverloads").fetchone()[0]
+    reponse = client.post('/TableOverloads/batch?mode=ligne', json=[
+        {'op': 'insert', 'data': {'TypeOverload': 'LIGNE'}},
+        {'op': 'insert', 'data': {'IdOverload': id_existant, 'TypeOverload': 'LIGNE'}},
+        {'op': 'delete', 'id': -1},
+        {'op': 'insert', 'data': {'Inconnue': 1}},
+    ])
+    assert reponse.status_code == 200
+    corps = reponse.get_json()
+    assert corps['appliquees'] == 1
+    assert [erreur['index'] for erreur in corps['erreurs']] == [1, 2, 3]
+    assert compter(connexion_externe, "WHERE TypeOverload = 'LIGNE'") == 1
+
+
+def test_validation_refusee_avant_ecriture(client, connexion_externe):
+    avant = compter(connexion_externe)
+    reponse = client.post('/TableOverloads/batch', json=[
+        {'op': 'insert', 'data': {'TypeOverload': 'VALIDATION'}},
+        {'op': 'update', 'data': {'TypeOverload': 'sans id'}},
+        {'op': 'upsert'},
+    ])
+    assert reponse.status_code == 400
+    assert [erreur['index'] for erreur in reponse.get_json()['erreurs']] == [1, 2]
+    assert compter(connexion_externe) == avant
+    assert client.post('/TableOverloads/batch', json={'op': 'insert'}).status_code == 400
+    assert client.post('/TableOverloads/batch?mode=partiel', json=[]).status_code == 400
+    assert client.post('/TableInexistante/batch', json=[]).status_code == 404
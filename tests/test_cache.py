@@ -0,0 +1,74 @@
+"""Cache des réponses : invalidation par table et écritures hors API."""
+import main
+
+
+def test_ecriture_externe_visible_meme_avec_if_none_match(client, connexion_externe):
+    """Une écriture hors API ne doit jamais laisser un 304 ou un corps périmé."""
+    premiere = client.get('/TableCapteur')
+    etag = premiere.headers['ETag']
+    assert client.get('/TableCapteur', headers={'If-None-Match': etag}).status_code == 304
+
+    connexion_externe.execute("UPDATE TableCapteur SET Version = 'version-externe'")
+    connexion_externe.commit()
+
+    conditionnelle = client.get('/TableCapteur', headers={'If-None-Match': etag})
+    assert conditionnelle.status_code == 200
+    assert b'version-externe' in conditionnelle.get_data()
+    nouvel_etag = conditionnelle.headers['ETag']
+    assert nouvel_etag != etag
+
+    # Et le nouvel ETag est bien celui du nouveau contenu
+    assert client.get('/TableCapteur', headers={'If-None-Match': nouvel_etag}).status_code == 304
+    assert b'version-externe' in client.get('/TableCapteur').get_data()
+
+
+def test_cache_sert_sans_relire_la_base(client):
+    client.get('/TableCapteur')
+    succes = main.cache_reponses.succes
+    client.get('/TableCapteur')
+    assert main.cache_reponses.succes == succes + 1
+
+
+def test_ecriture_externe_invalide_le_cache_avant_ttl(client, connexion_externe, monkeypatch):
+    monkeypatch.setattr(main.cache_reponses, 'ttl', 3600)
+    client.get('/TableCapteur')
+    connexion_externe.execute("UPDATE TableCapteur SET Version = 'apres-ttl'")
+    connexion_externe.commit()
+    assert b'apres-ttl' in client.get('/TableCapteur').get_data()
+
+
+def test_ecriture_api_ne_libere_que_les_tables_ecrites(client, monkeypatch):
+    monkeypatch.setattr(main.cache_reponses, 'ttl', 3600)
+    client.get('/TableCapteur')
+    overloads = client.get('/TableOverloads').get_json()
+    id_overload = overloads[0]['IdOverload']
+    assert client.delete(f'/TableOverloads/{id_overload}').status_code == 204
+
+    succes = main.cache_reponses.succes
+    client.get('/TableCapteur')
+    assert main.cache_reponses.succes == succes + 1
+    apres = client.get('/TableOverloads').get_json()
+    assert main.cache_reponses.succes == succes + 1
+    assert id_overload not in [ligne['IdOverload'] for ligne in apres]
+
+
+def test_ecriture_externe_apres_ecriture_api(client, connexion_externe, monkeypatch):
+    """La version adoptée après un commit de l'API n'absorbe pas une écriture externe ultérieure."""
+    monkeypatch.setattr(main.cache_reponses, 'ttl', 3600)
+    id_overload = client.get('/TableOverloads').get_json()[0]['IdOverload']
+    client.get('/TableCapteur')
+    assert client.delete(f'/TableOverloads/{id_overload}').status_code == 204
+    connexion_externe.execute("UPDATE TableCapteur SET Version = 'apres-api'")
+    connexion_externe.commit()
+    assert b'apres-api' in client.get('/TableCapteur').get_data()
+    assert main.cache_reponses.vidages_externes >= 1
+
+
+def test_compteurs_du_cache_en_counter_prometheus(client):
+    client.get('/TableCapteur')
+    client.get('/TableCapteur')
+    texte = client.get('/metrics').get_data(as_text=True)
+    assert '# TYPE acrn_cache_reponses_succes_total counter' in texte
+    assert '# TYPE acrn_cache_reponses_echecs_total counter' in texte
+    assert '# TYPE acrn_cache_reponses_octets gauge' in texte
+    assert 'acrn_cache_reponses_succes ' not in texte
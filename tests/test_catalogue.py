@@ -0,0 +1,33 @@
+"""Catalogue du schéma en mémoire."""
+import main
+
+
+def noms_colonnes(client, table):
+    return [colonne['name'] for colonne in client.get(f'/{table}/structure').get_json()['columns']]
+
+
+def test_catalogue_relu_apres_changement_de_schema(client, connexion_externe):
+    assert 'ColonneAjoutee' not in noms_colonnes(client, 'TableCapteur')
+    assert client.get('/TableAjoutee').status_code == 404
+
+    connexion_externe.execute('ALTER TABLE "TableCapteur" ADD COLUMN "ColonneAjoutee" TEXT')
+    connexion_externe.execute('CREATE TABLE "TableAjoutee" ("IdAjout" INTEGER PRIMARY KEY, "Nom" TEXT NOT NULL)')
+    connexion_externe.commit()
+
+    assert 'ColonneAjoutee' in noms_colonnes(client, 'TableCapteur')
+    assert client.get('/TableAjoutee').status_code == 200
+    assert main.get_primary_key('TableAjoutee') == 'IdAjout'
+    assert main.catalogue_schema.colonnes_obligatoires('TableAjoutee') == ['Nom']
+
+
+def test_ecriture_de_donnees_ne_relit_pas_le_schema(client, connexion_externe, monkeypatch):
+    client.get('/TableCapteur/structure')
+    lectures = []
+    lire_schema = main.CatalogueSchema._lire_schema
+    monkeypatch.setattr(main.CatalogueSchema, '_lire_schema',
+                        staticmethod(lambda conn: lectures.append(1) or lire_schema(conn)))
+
+    connexion_externe.execute("UPDATE TableCapteur SET Version = 'sans-changement-de-schema'")
+    connexion_externe.commit()
+    assert client.get('/TableCapteur/structure').status_code == 200
+    assert lectures == []
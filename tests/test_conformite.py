@@ -0,0 +1,72 @@
+"""Évaluation de la conformité des lots."""
+import pytest
+
+import main
+
+
+@pytest.fixture
+def lot_programme_4(base, connexion_externe):
+    """Lot du programme 4 (critère sur Parametre1) avec trois résultats."""
+    curseur = connexion_externe.execute("""
+        INSERT INTO TableLots (IdProgramme, NumeroLot, DateCreation, Statut)
+        VALUES (4, 'lot_conformite', '2026-01-01 00:00:00', 'EN_COURS')""")
+    id_lot = curseur.lastrowid
+    connexion_externe.executemany(
+        "INSERT INTO TableResultats (IdLot, IdProgramme, Parametre1, EstIgnore) VALUES (?, 4, ?, 0)",
+        [(id_lot, '1,0'), (id_lot, '5,0'), (id_lot, '9,0')])
+    connexion_externe.commit()
+    return id_lot
+
+
+def definir_critere(connexion, type_comparaison, parametre1, parametre2=None):
+    connexion.execute("""
+        INSERT INTO TableConformiteResultatEchantillonSelect
+            (IdProgramme, IdConfResultatEchantillonModele, TypeComparaison, IdUniteSelect, Parametre1, Parametre2)
+        VALUES (4, 4, ?, 1, ?, ?)""", (type_comparaison, parametre1, parametre2))
+    connexion.commit()
+
+
+@pytest.mark.parametrize('type_comparaison, parametres, bornes', [
+    ('ENTRE', ['1', '2'], (1.0, 2.0)),
+    ('superieur', ['1,5', ''], (1.5, None)),
+    ('<=', ['3', None], (None, 3.0)),
+    ('NOMINAL', ['10', '0,5'], (9.5, 10.5)),
+    (None, [None, None], (None, None)),
+])
+def test_limites_critere(type_comparaison, parametres, bornes):
+    assert main.limites_critere(type_comparaison, parametres) == bornes
+
+
+@pytest.mark.parametrize('type_comparaison, parametres', [
+    ('DIFFERENT', ['1', '2']),
+    ('ENTRE', ['1', 'abc']),
+    ('NOMINAL', ['10', None]),
+])
+def test_limites_critere_refuse_un_critere_inexploitable(type_comparaison, parametres):
+    with pytest.raises(ValueError):
+        main.limites_critere(type_comparaison, parametres)
+
+
+def test_evaluer_applique_les_bornes(client, connexion_externe, lot_programme_4):
+    definir_critere(connexion_externe, 'ENTRE', '2', '8')
+    reponse = client.post(f'/Lot/{lot_programme_4}/evaluer')
+    assert reponse.status_code == 200, reponse.get_json()
+    corps = reponse.get_json()
+    assert (corps['resultats'], corps['conformes'], corps['lot_conforme']) == (3, 1, False)
+    assert len(corps['non_conformes']) == 2
+
+
+def test_evaluer_refuse_un_type_inconnu(client, connexion_externe, lot_programme_4):
+    definir_critere(connexion_externe, 'DIFFERENT', '5')
+    reponse = client.post(f'/Lot/{lot_programme_4}/evaluer')
+    assert reponse.status_code == 422
+    invalides = reponse.get_json()['criteres_invalides']
+    assert [critere['id_critere'] for critere in invalides] == [4]
+    # Rien n'est écrit
+    assert connexion_externe.execute(
+        "SELECT COUNT(*) FROM TableResultats WHERE IdLot = ? AND EstConformeCalculee IS NOT NULL",
+        (lot_programme_4,)).fetchone()[0] == 0
+
+    # Les statistiques restent lisibles et signalent le critère
+    grandeurs = client.get(f'/Lot/{lot_programme_4}/statistiques').get_json()['grandeurs']
+    assert 'DIFFERENT' in grandeurs[0]['erreur_critere']
@@ -0,0 +1,301 @@
+"""Lecture, décimation, téléchargement, index et import des courbes."""
+import gzip
+import json
+import os
+
+import numpy as np
+import pytest
+
+import main
+
+
+def ecrire_courbe(nom, contenu):
+    """Écrit un CSV de courbe dans le dossier des courbes (recopié avant chaque test)."""
+    chemin = os.path.join(main.DOSSIER_COURBES, nom)
+    with open(chemin, 'wb') as f:
+        f.write(contenu)
+    return chemin
+
+
+@pytest.mark.parametrize('nb_points', [3, 4, 5, 50, 51, 1000])
+@pytest.mark.parametrize('taille', [10, 1001, 20000])
+def test_decimer_minmax_ne_depasse_pas_nb_points(nb_points, taille):
+    y = np.random.default_rng(taille).normal(size=taille)
+    indices = main.decimer_minmax(y, nb_points)
+    assert len(indices) <= max(nb_points, 1) or nb_points >= taille
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_decimer_minmax_garde_extremites_et_cretes():
+    y = np.sin(np.linspace(0, 20, 10000))
+    y[1234] = 5.0
+    y[8765] = -5.0
+    indices = main.decimer_minmax(y, 50)
+    assert len(indices) <= 50
+    assert indices[0] == 0 and indices[-1] == len(y) - 1
+    assert {1234, 8765} <= set(indices.tolist())
+
+
+def test_route_decime_respecte_points(client):
+    reponse = client.get('/Courbe/Decime?nom_fichier=Courbe.csv&points=50&methode=minmax')
+    assert reponse.status_code == 200
+    donnees = reponse.get_json()
+    assert len(donnees['x']) <= 50
+
+
+CSV_COURBE = b'0,0;1,5\n0,5;2,5\n1,0;3,5\n'
+
+
+def premier_resultat(connexion_externe):
+    return connexion_externe.execute("SELECT MIN(IdResultat) FROM TableResultats").fetchone()[0]
+
+
+def test_upload_lie_la_courbe_au_resultat(client, connexion_externe):
+    id_resultat = premier_resultat(connexion_externe)
+    reponse = client.post(f'/Courbe/Upload?nom_fichier=test_upload.csv&id_resultat={id_resultat}',
+                          data=CSV_COURBE, content_type='text/csv')
+    assert reponse.status_code == 201, reponse.get_json()
+    assert reponse.get_json()['nombrePoints'] == 3
+    assert connexion_externe.execute(
+        "SELECT IdResultat FROM TableResultatsCourbes WHERE NomFichierCSV = 'test_upload.csv'").fetchone()[0] == id_resultat
+
+
+def test_upload_sans_migration_ne_cree_pas_la_table(client, connexion_externe):
+    connexion_externe.execute('DROP TABLE "TableResultatsCourbes"')
+    connexion_externe.commit()
+    main.catalogue_schema.invalider()
+    reponse = client.post(f'/Courbe/Upload?nom_fichier=test_upload.csv&id_resultat={premier_resultat(connexion_externe)}',
+                          data=CSV_COURBE, content_type='text/csv')
+    assert reponse.status_code == 503
+    assert connexion_externe.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE name = 'TableResultatsCourbes'").fetchone()[0] == 0
+
+
+def test_analyse_numpy_virgule_decimale(base):
+    noms, colonnes = main.lire_courbe_colonnes(ecrire_courbe('test_numpy.csv', CSV_COURBE))
+    assert noms == ['Colonne1', 'Colonne2']
+    assert all(colonne.dtype == np.float64 for colonne in colonnes)
+    assert colonnes[0].tolist() == [0.0, 0.5, 1.0]
+    assert colonnes[1].tolist() == [1.5, 2.5, 3.5]
+
+
+def test_analyse_numpy_avec_entete(base):
+    noms, colonnes = main.lire_courbe_colonnes(ecrire_courbe('test_entete.csv', b'Temps;Force\n' + CSV_COURBE))
+    assert noms == ['Temps', 'Force']
+    assert colonnes[1].tolist() == [1.5, 2.5, 3.5]
+
+
+def test_analyse_fichier_irregulier_par_genfromtxt(base):
+    """Lignes au mauvais nombre de colonnes ignorées, cellules vides en NaN."""
+    chemin = ecrire_courbe('test_irregulier.csv', b'0,0;1,5\n0,5;\n1,0;3,5;9\nabc\n1,5;4,5\n')
+    noms, colonnes = main.lire_courbe_colonnes(chemin)
+    assert noms == ['Colonne1', 'Colonne2']
+    assert colonnes[0].tolist() == [0.0, 0.5, 1.5]
+    assert colonnes[1][0] == 1.5 and np.isnan(colonnes[1][1]) and colonnes[1][2] == 4.5
+
+
+def test_format_historique_csv_colonne(client):
+    """Non-régression du format d'origine de /Courbe/CsvVersJson : {"metadata", "data": [{"CSV..<colonne>..": ...}]}."""
+    ecrire_courbe('test_historique.csv', b'0,0;1,5\n0,5;\n1,0;3,5\n')
+    reponse = client.get('/Courbe/CsvVersJson?nom_fichier=test_historique.csv')
+    assert reponse.status_code == 200
+    assert reponse.get_json() == {
+        'metadata': [],
+        'data': [
+            {'CSV..Colonne1..': 0.0, 'CSV..Colonne2..': 1.5},
+            {'CSV..Colonne1..': 0.5, 'CSV..Colonne2..': None},
+            {'CSV..Colonne1..': 1.0, 'CSV..Colonne2..': 3.5}
+        ]
+    }
+
+    ecrire_courbe('test_historique_entete.csv', b'Temps;Force\n' + CSV_COURBE)
+    donnees = client.get('/Courbe/CsvVersJson?nom_fichier=test_historique_entete.csv').get_json()['data']
+    assert donnees[0] == {'CSV..Temps..': 0.0, 'CSV..Force..': 1.5}
+
+
+def test_format_colonnes(client):
+    ecrire_courbe('test_colonnes.csv', CSV_COURBE)
+    donnees = client.get('/Courbe/CsvVersJson?nom_fichier=test_colonnes.csv&format=colonnes').get_json()
+    assert donnees['columns'] == ['Colonne1', 'Colonne2']
+    assert donnees['x'] == [0.0, 0.5, 1.0] and donnees['y'] == [1.5, 2.5, 3.5]
+    assert donnees['series'] == {'Colonne2': [1.5, 2.5, 3.5]}
+
+
+def test_lecture_courbe_erreurs(client):
+    assert client.get('/Courbe/CsvVersJson').status_code == 400
+    assert client.get('/Courbe/CsvVersJson?nom_fichier=../../etc/passwd.csv').status_code == 400
+    assert client.get('/Courbe/CsvVersJson?nom_fichier=absent.csv').status_code == 404
+
+
+def entrees_cache_courbe(chemin):
+    """Entrées du cache .npy dont le CSV source est chemin."""
+    entrees = []
+    for entree in os.scandir(main.cache_courbes.dossier):
+        chemin_entete = os.path.join(entree.path, 'entete.json')
+        if entree.is_dir() and os.path.isfile(chemin_entete):
+            with open(chemin_entete, encoding='utf-8') as f:
+                if json.load(f)['source'] == os.path.realpath(chemin):
+                    entrees.append(entree.path)
+    return entrees
+
+
+def test_cache_npy_relu_en_memoire_mappee(base):
+    chemin = ecrire_courbe('test_cache_npy.csv', CSV_COURBE)
+    echecs, succes = main.cache_courbes.echecs, main.cache_courbes.succes
+    noms, colonnes, x_croissant = main.cache_courbes.charger(chemin)
+    assert main.cache_courbes.echecs == echecs + 1
+    assert noms == ['Colonne1', 'Colonne2'] and x_croissant
+
+    noms, colonnes, x_croissant = main.cache_courbes.charger(chemin)
+    assert main.cache_courbes.succes == succes + 1
+    assert isinstance(colonnes[0], np.memmap)
+    assert colonnes[1].tolist() == [1.5, 2.5, 3.5] and x_croissant
+    assert len(entrees_cache_courbe(chemin)) == 1
+
+
+def test_cache_npy_invalide_quand_le_csv_change(base):
+    chemin = ecrire_courbe('test_cache_modifie.csv', CSV_COURBE)
+    main.cache_courbes.charger(chemin)
+    mtime_ns = os.stat(chemin).st_mtime_ns
+
+    ecrire_courbe('test_cache_modifie.csv', b'0,0;7,5\n2,0;8,5\n1,0;9,5\n0,5;1,0\n')
+    os.utime(chemin, ns=(mtime_ns + 10**9, mtime_ns + 10**9))
+    echecs = main.cache_courbes.echecs
+    noms, colonnes, x_croissant = main.cache_courbes.charger(chemin)
+    assert main.cache_courbes.echecs == echecs + 1
+    assert colonnes[1].tolist() == [7.5, 8.5, 9.5, 1.0]
+    assert not x_croissant
+    # L'entrée de l'ancien contenu est supprimée à l'écriture de la nouvelle
+    assert len(entrees_cache_courbe(chemin)) == 1
+
+
+def test_fenetre_temps_par_dichotomie():
+    x = np.arange(0, 10, 0.5)
+    colonnes = [x, x * 2]
+    fenetre = main.fenetre_courbe(colonnes, True, {'t_min': '1,5', 't_max': '3'})
+    assert fenetre[0].tolist() == [1.5, 2.0, 2.5, 3.0]
+    assert fenetre[1].tolist() == [3.0, 4.0, 5.0, 6.0]
+    assert main.fenetre_courbe(colonnes, True, {'t_min': '9'})[0].tolist() == [9.0, 9.5]
+    assert main.fenetre_courbe(colonnes, True, {'t_max': '0'})[0].tolist() == [0.0]
+    assert main.fenetre_courbe(colonnes, True, {'t_min': '5', 't_max': '4'})[0].size == 0
+    assert main.fenetre_courbe(colonnes, True, {}) is colonnes
+
+
+def test_fenetre_temps_non_monotone():
+    x = np.array([0.0, 2.0, 1.0, 3.0, 1.5])
+    fenetre = main.fenetre_courbe([x, x * 10], False, {'t_min': '1', 't_max': '2'})
+    assert fenetre[0].tolist() == [2.0, 1.0, 1.5]
+    assert fenetre[1].tolist() == [20.0, 10.0, 15.0]
+
+
+def test_fenetre_temps_borne_invalide():
+    with pytest.raises(ValueError):
+        main.fenetre_courbe([np.arange(3.0)], True, {'t_min': 'abc'})
+
+
+def test_routes_courbe_avec_fenetre(client):
+    ecrire_courbe('test_fenetre.csv', CSV_COURBE)
+    donnees = client.get('/Courbe/CsvVersJson?nom_fichier=test_fenetre.csv&format=colonnes&t_min=0,5&t_max=1').get_json()
+    assert donnees['x'] == [0.5, 1.0] and donnees['y'] == [2.5, 3.5]
+    assert client.get('/Courbe/CsvVersJson?nom_fichier=test_fenetre.csv&t_min=x').status_code == 400
+
+    decime = client.get('/Courbe/Decime?nom_fichier=Courbe.csv&points=50&t_max=0,02').get_json()
+    assert decime['points_origine'] < len(main.cache_courbes.charger(os.path.join(main.DOSSIER_COURBES, 'Courbe.csv'))[1][0])
+    assert max(decime['x']) <= 0.02
+
+
+def noms_index(client, parametres=''):
+    reponse = client.get('/Courbe/ListeFichiersCSV' + parametres)
+    assert reponse.status_code == 200, reponse.get_json()
+    return [entree['NomFichierCSV'] for entree in reponse.get_json()['data']]
+
+
+def test_index_statistiques_et_filtres(client):
+    ecrire_courbe('test_index.csv', CSV_COURBE)
+    entree = next(e for e in client.get('/Courbe/ListeFichiersCSV').get_json()['data']
+                  if e['NomFichierCSV'] == 'test_index.csv')
+    assert entree['NombrePoints'] == 3
+    assert (entree['TempsDebut'], entree['TempsFin'], entree['Duree']) == (0.0, 1.0, 1.0)
+    assert entree['Colonnes'][1] == {'Nom': 'Colonne2', 'Min': 1.5, 'Max': 3.5, 'Moyenne': 2.5}
+
+    assert noms_index(client, '?contient=TEST_IND') == ['test_index.csv']
+    assert 'test_index.csv' in noms_index(client, '?points_max=3')
+    assert all(e['NombrePoints'] >= 1000 for e in client.get('/Courbe/ListeFichiersCSV?points_min=1000').get_json()['data'])
+    assert 'test_index.csv' not in noms_index(client, '?points_min=4')
+    assert 'test_index.csv' in noms_index(client, '?duree_min=1&duree_max=1,0')
+    assert client.get('/Courbe/ListeFichiersCSV?points_min=abc').status_code == 400
+
+
+def test_index_tri(client):
+    noms = noms_index(client)
+    assert noms == sorted(noms)
+    assert noms_index(client, '?tri=NomFichierCSV&ordre=desc') == sorted(noms, reverse=True)
+    points = [e['NombrePoints'] for e in client.get('/Courbe/ListeFichiersCSV?tri=NombrePoints').get_json()['data']]
+    assert points == sorted(points)
+    assert client.get('/Courbe/ListeFichiersCSV?tri=Inconnu').status_code == 400
+
+
+def test_index_suit_les_fichiers_modifies_et_supprimes(client):
+    chemin = ecrire_courbe('test_index_suivi.csv', CSV_COURBE)
+    assert 'test_index_suivi.csv' in noms_index(client)
+    ecrire_courbe('test_index_suivi.csv', CSV_COURBE + b'1,5;4,5\n')
+    entree = next(e for e in client.get('/Courbe/ListeFichiersCSV').get_json()['data']
+                  if e['NomFichierCSV'] == 'test_index_suivi.csv')
+    assert entree['NombrePoints'] == 4
+    os.remove(chemin)
+    assert 'test_index_suivi.csv' not in noms_index(client)
+
+
+def test_telechargement_conditionnel_et_plage(client):
+    contenu = CSV_COURBE * 100
+    ecrire_courbe('test_telechargement.csv', contenu)
+    url = '/Courbe/TelechargerCSV?nom_fichier=test_telechargement.csv'
+
+    reponse = client.get(url)
+    assert reponse.status_code == 200
+    assert reponse.get_data() == contenu
+    assert reponse.headers['Accept-Ranges'] == 'bytes'
+    assert 'test_telechargement.csv' in reponse.headers['Content-Disposition']
+    etag = reponse.headers['ETag']
+
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    plage = client.get(url, headers={'Range': 'bytes=10-19'})
+    assert plage.status_code == 206
+    assert plage.get_data() == contenu[10:20]
+    assert plage.headers['Content-Range'] == f'bytes 10-19/{len(contenu)}'
+
+
+def test_telechargement_gzip(client):
+    contenu = CSV_COURBE * 100
+    ecrire_courbe('test_telechargement_gz.csv', contenu)
+    url = '/Courbe/TelechargerCSV?nom_fichier=test_telechargement_gz.csv'
+
+    reponse = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert reponse.status_code == 200
+    assert reponse.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in reponse.headers['Vary']
+    assert gzip.decompress(reponse.get_data()) == contenu
+    etag = reponse.headers['ETag']
+    assert etag != client.get(url).headers['ETag']
+
+    conditionnelle = client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert conditionnelle.status_code == 304
+
+    # Une plage porte sur le fichier brut, jamais sur le flux compressé
+    plage = client.get(url, headers={'Accept-Encoding': 'gzip', 'Range': 'bytes=0-4'})
+    assert plage.status_code == 206
+    assert 'Content-Encoding' not in plage.headers
+    assert plage.get_data() == contenu[:5]
+
+
+def test_index_couvre_les_courbes_de_la_racine(client):
+    """Mêmes emplacements que resoudre_chemin_courbe : les « Mesure simple » de la racine sont listées."""
+    def csv(dossier):
+        return {nom for nom in os.listdir(dossier) if nom.lower().endswith('.csv')}
+
+    noms = noms_index(client)
+    assert csv(main.DOSSIER_BASE) and csv(main.DOSSIER_BASE) <= set(noms)
+    assert csv(main.DOSSIER_COURBES) <= set(noms)
+    for nom in noms:
+        assert main.resoudre_chemin_courbe(nom) is not None
@@ -0,0 +1,64 @@
+"""Plans de requêtes de ConvertiRequeteEnJSON et cache de TableDescriptionTable."""
+import main
+
+
+def libelle(reponse, nom_complet):
+    return next(champ['libelle'] for champ in reponse.get_json()['metadata'] if champ['NomComplet'] == nom_complet)
+
+
+def test_plan_compile_une_seule_fois(client, monkeypatch):
+    constructions = []
+    construire = main._construire_metadonnees
+    monkeypatch.setattr(main, '_construire_metadonnees', lambda description: constructions.append(1) or construire(description))
+    monkeypatch.setattr(main.registre_plans, '_plans', {})
+
+    requete = main.GenereSQLPourSelectEtoile('TableCapteur')
+    premier = main.ConvertiRequeteEnJSON(requete)
+    second = main.ConvertiRequeteEnJSON(requete)
+    assert constructions == [1]
+    assert second['metadata'] is premier['metadata']
+    assert second['data'] == premier['data']
+
+
+def test_plan_recompile_apres_modification_de_la_description(client, connexion_externe, monkeypatch):
+    monkeypatch.setattr(main.cache_description, 'intervalle', 0)
+    reponse = client.get('/Capteur/TableauCapteurs')
+    assert libelle(reponse, 'TableCapteur..Version..') == 'Version'
+    version = main.cache_description.version()
+
+    connexion_externe.execute("UPDATE TableDescriptionTable SET LibelleChamp = 'Version logicielle' "
+                              "WHERE NomComplet = 'TableCapteur..Version..'")
+    connexion_externe.commit()
+
+    reponse = client.get('/Capteur/TableauCapteurs')
+    assert libelle(reponse, 'TableCapteur..Version..') == 'Version logicielle'
+    assert main.cache_description.version() == version + 1
+
+
+def test_description_relue_apres_modification_externe(base, connexion_externe, monkeypatch):
+    monkeypatch.setattr(main.cache_description, 'intervalle', 0)
+    assert main.cache_description.obtenir('TableCapteur..Version..')['LibelleChamp'] == 'Version'
+    version = main.cache_description.version()
+
+    # Écriture sur une autre table : relecture, mais contenu et version inchangés
+    connexion_externe.execute("UPDATE TableCapteur SET Version = 'autre-table'")
+    connexion_externe.commit()
+    assert main.cache_description.version() == version
+
+    connexion_externe.execute("UPDATE TableDescriptionTable SET LibelleChamp = 'Version logicielle' "
+                              "WHERE NomComplet = 'TableCapteur..Version..'")
+    connexion_externe.commit()
+    assert main.cache_description.obtenir('TableCapteur..Version..')['LibelleChamp'] == 'Version logicielle'
+    assert main.cache_description.version() == version + 1
+
+
+def test_description_verifiee_au_plus_une_fois_par_intervalle(base, connexion_externe, monkeypatch):
+    monkeypatch.setattr(main.cache_description, 'intervalle', 3600)
+    main.cache_description.charger()
+    connexion_externe.execute("UPDATE TableDescriptionTable SET LibelleChamp = 'Plus tard' "
+                              "WHERE NomComplet = 'TableCapteur..Version..'")
+    connexion_externe.commit()
+    assert main.cache_description.obtenir('TableCapteur..Version..')['LibelleChamp'] == 'Version'
+
+    monkeypatch.setattr(main.cache_description, 'intervalle', 0)
+    assert main.cache_description.obtenir('TableCapteur..Version..')['LibelleChamp'] == 'Plus tard'
@@ -0,0 +1,67 @@
+"""Droits effectifs maintenus en mémoire."""
+import main
+
+
+def reconstructions(client):
+    return client.get('/Droits/Statistiques').get_json()['reconstructions']
+
+
+def test_prerequis_resolus(client):
+    detail = client.get('/profil/4/droits/effectifs').get_json()
+    assert 'Acces_Appareil' in detail['droits']
+    assert 'Acces_Appareil' in detail['accordes']
+
+
+def test_ecriture_api_sans_reconstruction_complete(client, monkeypatch):
+    monkeypatch.setattr(main.droits_effectifs, 'intervalle', 0)
+    avant = reconstructions(client)
+    reponse = client.put('/profil/droits', json={
+        'idProfil': 4, 'idDroit': 'Acces_Parametre', 'typeAction': 'Supprimer'
+    })
+    assert reponse.status_code == 200, reponse.get_json()
+
+    # La mise à jour ciblée suffit : le prérequis retiré désactive les droits qui en dépendent
+    detail = client.get('/profil/4/droits/effectifs').get_json()
+    assert 'Acces_Parametre' not in detail['droits']
+    assert 'Acces_Appareil' not in detail['droits']
+    assert 'Acces_Parametre' in detail['inactifs']['Acces_Appareil']
+    assert reconstructions(client) == avant
+
+
+def test_ecriture_lot_sans_reconstruction_complete(client, monkeypatch):
+    monkeypatch.setattr(main.droits_effectifs, 'intervalle', 0)
+    avant = reconstructions(client)
+    reponse = client.put('/profil/droits/lot', json={
+        'idProfils': [4, 5],
+        'operations': [{'idDroit': 'Acces_Parametre', 'typeAction': 'Supprimer'}]
+    })
+    assert reponse.status_code == 200, reponse.get_json()
+    assert 'Acces_Parametre' not in client.get('/profil/5/droits/effectifs').get_json()['droits']
+    assert reconstructions(client) == avant
+
+
+def test_ecriture_externe_reconstruit(client, connexion_externe, monkeypatch):
+    monkeypatch.setattr(main.droits_effectifs, 'intervalle', 0)
+    avant = reconstructions(client)
+    connexion_externe.execute("DELETE FROM TableProfilsDroits WHERE IdProfil = 4 AND IdDroit = 'Acces_Parametre'")
+    connexion_externe.commit()
+
+    detail = client.get('/profil/4/droits/effectifs').get_json()
+    assert 'Acces_Appareil' not in detail['droits']
+    assert reconstructions(client) == avant + 1
+
+
+def test_ecriture_externe_non_absorbee_par_une_mise_a_jour_ciblee(client, connexion_externe, monkeypatch):
+    monkeypatch.setattr(main.droits_effectifs, 'intervalle', 0)
+    assert 'Acces_Appareil' in client.get('/profil/4/droits/effectifs').get_json()['droits']
+
+    # Écriture d'un tiers sur le profil 4, puis écriture de l'API sur un autre profil
+    connexion_externe.execute("DELETE FROM TableProfilsDroits WHERE IdProfil = 4 AND IdDroit = 'Acces_Parametre'")
+    connexion_externe.commit()
+    reponse = client.put('/profil/droits', json={
+        'idProfil': 5, 'idDroit': 'Acces_Parametre', 'typeAction': 'Supprimer'
+    })
+    assert reponse.status_code == 200, reponse.get_json()
+
+    monkeypatch.setattr(main.droits_effectifs, 'intervalle', 3600)
+    assert 'Acces_Appareil' not in client.get('/profil/4/droits/effectifs').get_json()['droits']
@@ -0,0 +1,45 @@
+"""ETag et requêtes conditionnelles."""
+
+
+def test_etag_et_304(client):
+    premiere = client.get('/TableCapteur')
+    assert premiere.status_code == 200
+    etag = premiere.headers['ETag']
+    seconde = client.get('/TableCapteur', headers={'If-None-Match': etag})
+    assert seconde.status_code == 304
+    assert seconde.headers['ETag'] == etag
+
+
+def test_etag_change_apres_ecriture_api(client):
+    premiere = client.get('/TableOverloads')
+    etag = premiere.headers['ETag']
+    id_overload = premiere.get_json()[0]['IdOverload']
+    assert client.delete(f'/TableOverloads/{id_overload}').status_code == 204
+    reponse = client.get('/TableOverloads', headers={'If-None-Match': etag})
+    assert reponse.status_code == 200
+    assert reponse.headers['ETag'] != etag
+    assert id_overload not in [ligne['IdOverload'] for ligne in reponse.get_json()]
+
+
+def test_etag_par_enregistrement(client):
+    premiere = client.get('/TableCapteur/1')
+    if premiere.status_code == 404:
+        identifiant = client.get('/TableCapteur').get_json()[0]['IdCapteur']
+        premiere = client.get(f'/TableCapteur/{identifiant}')
+    assert premiere.status_code == 200
+    etag = premiere.headers['ETag']
+    assert client.get(premiere.request.path, headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_etag_different_selon_parametres(client):
+    tous = client.get('/TableCapteur')
+    projection = client.get('/TableCapteur?fields=IdCapteur')
+    assert tous.headers['ETag'] != projection.headers['ETag']
+    assert client.get('/TableCapteur?fields=IdCapteur',
+                      headers={'If-None-Match': tous.headers['ETag']}).status_code == 200
+
+
+def test_pas_d_etag_sur_erreur(client):
+    reponse = client.get('/TableInexistante')
+    assert reponse.status_code >= 400
+    assert 'ETag' not in reponse.headers
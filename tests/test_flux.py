@@ -0,0 +1,75 @@
+"""Journal des modifications et flux SSE."""
+import json
+
+import main
+
+
+def schema(connexion):
+    return connexion.execute("SELECT type, name, sql FROM sqlite_master ORDER BY name").fetchall()
+
+
+def test_journal_installe_par_migration(connexion_externe):
+    assert connexion_externe.execute("SELECT 1 FROM TableMigrations WHERE Version = 7").fetchone()
+    triggers = {row[0] for row in connexion_externe.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    for operation in ('INSERT', 'UPDATE', 'DELETE'):
+        assert f'JournalModifications_TableOverloads_{operation}' in triggers
+
+
+def test_flux_diffuse_une_ecriture_externe(client, connexion_externe, monkeypatch):
+    monkeypatch.setattr(main.diffuseur_modifications, 'intervalle', 0.01)
+    avant = schema(connexion_externe)
+    reponse = client.get('/Flux/Modifications?tables=TableOverloads', buffered=False)
+    try:
+        assert reponse.status_code == 200
+        flux = (morceau.decode() for morceau in reponse.response)
+        assert next(flux).startswith('retry:')
+        # L'abonnement ne modifie pas le schéma
+        assert schema(connexion_externe) == avant
+
+        id_overload = connexion_externe.execute("SELECT MIN(IdOverload) FROM TableOverloads").fetchone()[0]
+        connexion_externe.execute("DELETE FROM TableOverloads WHERE IdOverload = ?", (id_overload,))
+        connexion_externe.commit()
+
+        evenement = next(flux)
+        assert 'event: modification' in evenement
+        donnees = json.loads(evenement.split('data: ', 1)[1])
+        assert donnees['table'] == 'TableOverloads' and donnees['delete'] == [id_overload]
+    finally:
+        reponse.close()
+
+
+def test_flux_sans_migration(client, connexion_externe):
+    connexion_externe.execute('DROP TABLE "TableJournalModifications"')
+    connexion_externe.commit()
+    main.catalogue_schema.invalider()
+    assert client.get('/Flux/Modifications?tables=TableOverloads').status_code == 503
+    assert connexion_externe.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE name = 'TableJournalModifications'").fetchone()[0] == 0
+
+
+def test_table_sans_triggers(client, connexion_externe):
+    connexion_externe.execute('DROP TRIGGER "JournalModifications_TableCapteur_INSERT"')
+    connexion_externe.commit()
+    reponse = client.get('/Flux/Modifications?tables=TableCapteur')
+    assert reponse.status_code == 503
+    assert 'TableCapteur' in reponse.get_json()['error']
+
+
+def test_nombre_de_clients_borne(client, monkeypatch):
+    monkeypatch.setattr(main.diffuseur_modifications, 'abonnes_max', 1)
+    refus_avant = main.diffuseur_modifications.refus
+    premier = client.get('/Flux/Modifications?tables=TableOverloads', buffered=False)
+    try:
+        assert premier.status_code == 200
+        refus = client.get('/Flux/Modifications?tables=TableOverloads', buffered=False)
+        assert refus.status_code == 503
+        assert refus.headers['Retry-After']
+        assert main.diffuseur_modifications.statistiques()['refus'] == refus_avant + 1
+    finally:
+        premier.close()
+    # La place est libérée à la fermeture, même sans événement lu
+    second = client.get('/Flux/Modifications?tables=TableOverloads', buffered=False)
+    try:
+        assert second.status_code == 200
+    finally:
+        second.close()
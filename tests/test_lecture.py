@@ -0,0 +1,95 @@
+"""Lecture paginée, filtrée et triée des tables génériques."""
+import base64
+import json
+
+import pytest
+
+
+def toutes_les_pages(client, url):
+    lignes, curseur = [], None
+    for _ in range(100):
+        page = client.get(url + (f'&after={curseur}' if curseur else ''))
+        assert page.status_code == 200, page.get_json()
+        corps = page.get_json()
+        lignes += corps['data']
+        curseur = corps['next_cursor']
+        if curseur is None:
+            return lignes
+    raise AssertionError('pagination sans fin')
+
+
+@pytest.mark.parametrize('ordre', ['NomProfil', '-NomProfil', 'IdProfil', '-IdProfil', 'EstModifiable'])
+def test_pagination_parcourt_toutes_les_lignes(client, ordre):
+    completes = client.get(f'/TableProfils?order_by={ordre}').get_json()
+    paginees = toutes_les_pages(client, f'/TableProfils?order_by={ordre}&limit=5')
+    assert [ligne['IdProfil'] for ligne in paginees] == [ligne['IdProfil'] for ligne in completes]
+    assert len(paginees) == len(client.get('/TableProfils').get_json())
+
+
+def test_pagination_par_defaut_sur_la_cle(client):
+    paginees = toutes_les_pages(client, '/TableProfils?limit=3')
+    ids = [ligne['IdProfil'] for ligne in paginees]
+    assert ids == sorted(ids)
+
+
+def test_filtres_et_projection(client):
+    lignes = client.get('/TableProfils?where[ModeProfil][eq]=NOMINATIF&where[IdProfil][lt]=10&fields=IdProfil,ModeProfil').get_json()
+    assert lignes and all(set(ligne) == {'IdProfil', 'ModeProfil'} for ligne in lignes)
+    assert all(ligne['ModeProfil'] == 'NOMINATIF' and ligne['IdProfil'] < 10 for ligne in lignes)
+    assert [l['IdProfil'] for l in client.get('/TableProfils?where[IdProfil][in]=1,3').get_json()] == [1, 3]
+    assert all(l['NomProfil'] is None for l in client.get('/TableProfils?where[NomProfil][null]=1').get_json())
+
+
+@pytest.mark.parametrize('requete', [
+    'order_by=Inconnue',
+    'fields=IdProfil,"NomProfil"',
+    'where[Inconnue][eq]=1',
+    'where[IdProfil][regexp]=1',
+    'limit=abc',
+    'limit=0',
+    'limit=5&order_by=NomProfil&after=pas-un-curseur',
+    'limit=5&order_by=NomProfil&after=' + base64.urlsafe_b64encode(json.dumps([1, 2, 3]).encode()).decode(),
+    'limit=5&order_by=NomProfil&after=' + base64.urlsafe_b64encode(b'{"a": 1}').decode(),
+])
+def test_parametres_refuses(client, requete):
+    reponse = client.get(f'/TableProfils?{requete}')
+    assert reponse.status_code == 400
+    assert 'error' in reponse.get_json()
+
+
+def lignes_ndjson(reponse):
+    assert reponse.status_code == 200
+    assert reponse.mimetype == 'application/x-ndjson'
+    texte = reponse.get_data(as_text=True)
+    assert texte.endswith('\n')
+    return [json.loads(ligne) for ligne in texte.splitlines()]
+
+
+def test_flux_ndjson_une_ligne_par_enregistrement(client):
+    completes = client.get('/TableProfils').get_json()
+    lignes = lignes_ndjson(client.get('/TableProfils?stream=1'))
+    assert lignes[0]['metadata']['table'] == 'TableProfils'
+    assert lignes[1:] == completes
+    # Même réponse par négociation de contenu
+    assert lignes_ndjson(client.get('/TableProfils', headers={'Accept': 'application/x-ndjson'})) == lignes
+
+
+def test_flux_ndjson_pagine_termine_par_next_cursor(client):
+    paginees, curseur = [], None
+    for _ in range(100):
+        lignes = lignes_ndjson(client.get('/TableProfils?order_by=NomProfil&limit=4&stream=1'
+                                          + (f'&after={curseur}' if curseur else '')))
+        assert 'metadata' in lignes[0] and set(lignes[-1]) == {'next_cursor'}
+        assert len(lignes[1:-1]) <= 4
+        paginees += lignes[1:-1]
+        curseur = lignes[-1]['next_cursor']
+        if curseur is None:
+            break
+    assert paginees == client.get('/TableProfils?order_by=NomProfil').get_json()
+
+
+def test_flux_ndjson_converti_requete(client):
+    completes = client.get('/Capteur/TableauCapteurs').get_json()
+    lignes = lignes_ndjson(client.get('/Capteur/TableauCapteurs?stream=1'))
+    assert lignes[0] == {'metadata': completes['metadata']}
+    assert lignes[1:] == completes['data']
@@ -0,0 +1,65 @@
+"""Journal des requêtes : échantillonnage par route et erreurs toujours journalisées."""
+import json
+import logging
+
+import pytest
+
+import main
+
+
+class Collecteur(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.enregistrements = []
+
+    def emit(self, record):
+        self.enregistrements.append(record)
+
+
+@pytest.fixture
+def journal(monkeypatch):
+    collecteur = Collecteur()
+    niveau = main.logger_requetes.level
+    main.logger_requetes.addHandler(collecteur)
+    main.logger_requetes.setLevel(logging.INFO)
+    yield collecteur.enregistrements
+    main.logger_requetes.removeHandler(collecteur)
+    main.logger_requetes.setLevel(niveau)
+
+
+def chemins(enregistrements):
+    return [record.donnees['chemin'] for record in enregistrements]
+
+
+def test_taux_par_route_premier_motif(monkeypatch):
+    monkeypatch.setattr(main, 'ECHANTILLONNAGE_ROUTES', [('/Courbe/*', 0.05), ('/*', 0.5)])
+    monkeypatch.setattr(main, 'LOG_TAUX_REQUETES', 1.0)
+    assert main.taux_echantillonnage('/Courbe/Decime') == 0.05
+    assert main.taux_echantillonnage('/TableCapteur') == 0.5
+    monkeypatch.setattr(main, 'ECHANTILLONNAGE_ROUTES', [('/Courbe/*', 0.05)])
+    assert main.taux_echantillonnage('/TableCapteur') == 1.0
+
+
+def test_requetes_echantillonnees_mais_erreurs_toujours_journalisees(client, journal, monkeypatch):
+    monkeypatch.setattr(main, 'ECHANTILLONNAGE_ROUTES', [('/Table*', 0.0)])
+    monkeypatch.setattr(main, 'LOG_TAUX_REQUETES', 1.0)
+    assert client.get('/TableCapteur').status_code == 200
+    assert client.get('/TableInexistante').status_code == 404
+    assert client.get('/Cache/Statistiques').status_code == 200
+
+    assert chemins(journal) == ['/TableInexistante', '/Cache/Statistiques']
+    erreur = journal[0]
+    assert erreur.levelno == logging.INFO
+    assert erreur.donnees['statut'] == 404 and erreur.donnees['methode'] == 'GET'
+    assert erreur.donnees['duree_ms'] >= 0
+    assert 'corps' not in erreur.donnees
+    ligne = json.loads(main.FormateurJSON().format(erreur))
+    assert ligne['logger'] == 'acrn.requetes' and ligne['statut'] == 404
+
+
+def test_corps_tronque_au_niveau_debug(client, journal, monkeypatch):
+    main.logger_requetes.setLevel(logging.DEBUG)
+    monkeypatch.setattr(main, 'LOG_TAILLE_MAX_CORPS', 10)
+    assert client.post('/TableOverloads/batch?mode=inconnu', json=[{'op': 'insert', 'valeurs': {}}]).status_code == 400
+    corps = journal[-1].donnees['corps']
+    assert len(corps) == 11 and corps.endswith('…')
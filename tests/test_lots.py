@@ -0,0 +1,77 @@
+"""Statistiques des lots tenues par triggers."""
+import sqlite3
+
+import numpy as np
+import pytest
+
+import main
+
+
+@pytest.mark.parametrize('valeur', [
+    '12', '-1,5', '0,002', ' 3.2e-4 ', '.5', '5.', '+1', '1E+05', 5.5, 3,
+    '1-2', '1e', '', ' ', 'abc', '1.2.3', '1,2,3', 'e5', '- 5', '0x10', '12abc', '1 2', '٣', None,
+])
+def test_detection_numerique_identique_en_sql_et_en_python(valeur):
+    conn = sqlite3.connect(':memory:')
+    en_sql = conn.execute(f"SELECT {main._sql_est_numerique('?1')}", (valeur,)).fetchone()[0]
+    en_python = not np.isnan(main.valeurs_numeriques([valeur])[0])
+    assert bool(en_sql) == en_python
+    if en_python:
+        assert conn.execute(f"SELECT {main._sql_valeur('?1')}", (valeur,)).fetchone()[0] == pytest.approx(
+            main.valeurs_numeriques([valeur])[0])
+
+
+def grandeur(connexion, id_lot, attribut):
+    return connexion.execute("""
+        SELECT Nombre, Moyenne, Minimum, Maximum FROM TableStatistiquesLotGrandeurs
+        WHERE IdLot = ? AND Attribut = ?""", (id_lot, attribut)).fetchone()
+
+
+def test_trigger_ignore_les_textes_non_numeriques(client, connexion_externe):
+    assert client.post('/Lot/2/statistiques/recalculer').status_code == 200
+    assert connexion_externe.execute("SELECT AJour FROM TableStatistiquesLotCumuls WHERE IdLot = 2").fetchone()[0] == 1
+
+    connexion_externe.executemany(
+        "INSERT INTO TableResultats (IdLot, IdProgramme, Parametre1, EstIgnore) "
+        "SELECT 2, IdProgramme, ?, 0 FROM TableLots WHERE IdLot = 2",
+        [('1,5',), ('2.5',), ('1-2',), ('abc',)])
+    connexion_externe.commit()
+
+    reponse = client.get('/Lot/2/statistiques').get_json()
+    assert reponse['recalcule'] is False
+    incremental = grandeur(connexion_externe, 2, 'Parametre1')
+    assert incremental[0] == 2 and incremental[2:] == (1.5, 2.5)
+
+    # Le recalcul complet (NumPy) donne les mêmes agrégats
+    main.recalculer_statistiques_lot(main.get_db(), 2)
+    assert grandeur(connexion_externe, 2, 'Parametre1') == pytest.approx(incremental)
+
+
+def test_trigger_de_la_migration_sans_glob(connexion_externe):
+    sql = connexion_externe.execute(
+        "SELECT sql FROM sqlite_master WHERE name = 'StatistiquesLot_Insertion'").fetchone()[0]
+    assert 'GLOB' not in sql
+
+
+def test_lecture_d_un_lot_perime_sans_ecriture(client, connexion_externe):
+    connexion_externe.execute("UPDATE TableStatistiquesLotCumuls SET AJour = 0 WHERE IdLot = 2")
+    connexion_externe.execute("DELETE FROM TableStatistiquesLotGrandeurs WHERE IdLot = 2")
+    connexion_externe.commit()
+    # Verrou d'écriture tenu par un autre écrivain : la lecture doit aboutir sans l'attendre
+    connexion_externe.execute("BEGIN IMMEDIATE")
+    try:
+        reponse = client.get('/Lot/2/statistiques')
+    finally:
+        connexion_externe.rollback()
+    assert reponse.status_code == 200
+    corps = reponse.get_json()
+    assert corps['recalcule'] is True and corps['nombre_resultats'] == connexion_externe.execute(
+        "SELECT COUNT(*) FROM TableResultats WHERE IdLot = 2 AND COALESCE(EstIgnore, 0) = 0").fetchone()[0]
+    assert connexion_externe.execute(
+        "SELECT COUNT(*) FROM TableStatistiquesLotCumuls WHERE IdLot = 2 AND AJour = 1").fetchone()[0] == 0
+
+    reponse = client.post('/Lot/2/statistiques/recalculer')
+    assert reponse.status_code == 200
+    assert connexion_externe.execute("SELECT AJour FROM TableStatistiquesLotCumuls WHERE IdLot = 2").fetchone()[0] == 1
+    assert client.get('/Lot/2/statistiques').get_json()['recalcule'] is False
+    assert client.post('/Lot/999999/statistiques/recalculer').status_code == 404
@@ -0,0 +1,92 @@
+"""Métriques exposées par GET /metrics (format texte Prometheus et JSON)."""
+import re
+
+import main
+
+RE_ECHANTILLON = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})? (\S+)$')
+
+
+def test_format_texte_prometheus():
+    registre = main.RegistreMetriques(True)
+    registre.declarer('essai_duree_secondes', 'histogram', 'Durée', (0.1, 1.0))
+    registre.declarer('essai_total', 'counter', 'Compteur')
+    registre.observer('essai_duree_secondes', 0.05, route='a"b')
+    registre.observer('essai_duree_secondes', 2.0, route='a"b')
+    registre.incrementer('essai_total', 3, statut=200)
+
+    texte = registre.texte_prometheus({'essai_jauge': ('Jauge', [({'etat': 'libre'}, 4)])},
+                                      {'essai_externe_total': ('Externe', [({}, 7)])})
+    assert texte == (
+        '# HELP essai_duree_secondes Durée\n'
+        '# TYPE essai_duree_secondes histogram\n'
+        'essai_duree_secondes_bucket{route="a\\"b",le="0.1"} 1\n'
+        'essai_duree_secondes_bucket{route="a\\"b",le="1.0"} 1\n'
+        'essai_duree_secondes_bucket{route="a\\"b",le="+Inf"} 2\n'
+        'essai_duree_secondes_sum{route="a\\"b"} 2.05\n'
+        'essai_duree_secondes_count{route="a\\"b"} 2\n'
+        '# HELP essai_total Compteur\n'
+        '# TYPE essai_total counter\n'
+        'essai_total{statut="200"} 3\n'
+        '# HELP essai_jauge Jauge\n'
+        '# TYPE essai_jauge gauge\n'
+        'essai_jauge{etat="libre"} 4\n'
+        '# HELP essai_externe_total Externe\n'
+        '# TYPE essai_externe_total counter\n'
+        'essai_externe_total 7\n'
+    )
+
+
+def test_registre_inactif_n_enregistre_rien():
+    registre = main.RegistreMetriques(False)
+    registre.declarer('essai_total', 'counter', 'Compteur')
+    registre.incrementer('essai_total')
+    assert registre.texte_prometheus({}) == '# HELP essai_total Compteur\n# TYPE essai_total counter\n'
+    assert registre.en_json({}) == {'essai_total': []}
+
+
+def valeur(texte, nom, **etiquettes):
+    for ligne in texte.splitlines():
+        correspondance = RE_ECHANTILLON.match(ligne)
+        if correspondance and correspondance.group(1) == nom and all(
+                f'{cle}="{val}"' in (correspondance.group(2) or '') for cle, val in etiquettes.items()):
+            return float(correspondance.group(3))
+    return None
+
+
+def test_route_metrics(client):
+    avant = valeur(client.get('/metrics').get_data(as_text=True), 'acrn_requetes_total',
+                   endpoint='get_all_records', statut='200') or 0
+    # La durée est mesurée à la fermeture de la réponse, comme le fait le serveur WSGI
+    client.get('/TableCapteur').close()
+    client.get('/TableCapteur').close()
+    reponse = client.get('/metrics')
+    assert reponse.status_code == 200
+    assert reponse.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    texte = reponse.get_data(as_text=True)
+
+    types = {}
+    for ligne in texte.splitlines():
+        if ligne.startswith('# TYPE '):
+            _, _, nom, type_metrique = ligne.split(' ')
+            types[nom] = type_metrique
+        elif not ligne.startswith('# HELP '):
+            correspondance = RE_ECHANTILLON.match(ligne)
+            assert correspondance, ligne
+            nom = re.sub(r'_(bucket|sum|count)$', '', correspondance.group(1))
+            assert correspondance.group(1) in types or nom in types, ligne
+            float(correspondance.group(3))
+
+    assert types['acrn_requete_duree_secondes'] == 'histogram'
+    assert types['acrn_requetes_total'] == 'counter'
+    assert types['acrn_sqlite_connexions'] == 'gauge'
+    assert valeur(texte, 'acrn_requetes_total', endpoint='get_all_records', statut='200') == avant + 2
+
+    # Histogramme : compartiments cumulés, +Inf égal au nombre d'observations
+    compartiments = [float(m.group(1)) for m in re.finditer(
+        r'^acrn_sql_duree_secondes_bucket\{operation="SELECT",table="TableCapteur",le="[^"]+"\} (\S+)$', texte, re.M)]
+    assert compartiments == sorted(compartiments)
+    assert compartiments[-1] == valeur(texte, 'acrn_sql_duree_secondes_count', operation='SELECT', table='TableCapteur')
+
+    json = client.get('/metrics?format=json').get_json()
+    assert json['acrn_requete_duree_secondes'][0]['nombre'] >= 1
+    assert json['acrn_cache_reponses_succes_total'][0]['valeur'] >= 1
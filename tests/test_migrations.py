@@ -0,0 +1,49 @@
+"""Migrations numérotées et conseiller d'index."""
+import main
+
+
+def test_migrations_appliquees_une_seule_fois(base, connexion_externe):
+    versions = [row[0] for row in connexion_externe.execute("SELECT Version FROM TableMigrations ORDER BY Version")]
+    assert versions == [version for version, _, _ in main.MIGRATIONS]
+    assert main.gestionnaire_migrations.appliquer() == []
+    assert connexion_externe.execute("SELECT COUNT(*) FROM TableMigrations").fetchone()[0] == len(versions)
+
+
+def test_migration_en_attente_appliquee(base, connexion_externe):
+    connexion_externe.execute('DROP INDEX "IndexResultatsIdLot"')
+    connexion_externe.execute("DELETE FROM TableMigrations WHERE Version = 2")
+    connexion_externe.commit()
+    assert main.gestionnaire_migrations.appliquer() == [2]
+    assert connexion_externe.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND name = 'IndexResultatsIdLot'").fetchone()[0] == 1
+
+
+def test_etat_des_migrations(client):
+    etat = client.get('/Index/Migrations').get_json()
+    assert etat['version'] == max(version for version, _, _ in main.MIGRATIONS)
+    assert etat['en_attente'] == []
+    noms = {index['nom'] for index in etat['index']}
+    assert {'IndexProfilsDroitsIdProfilIdDroit', 'IndexResultatsIdLot', 'IndexResultatsIdProgramme'} <= noms
+
+
+def test_conseiller_signale_un_parcours_complet(client):
+    assert client.get('/TableOverloads?where[NomNumeroLot][eq]=lot_test_1').status_code == 200
+    assert client.get('/TableResultats?where[IdLot][eq]=1').status_code == 200
+    conseils = client.get('/Index/Conseils').get_json()['conseils']
+
+    suggestions = {conseil['index_suggere'] for conseil in conseils if conseil['table'] == 'TableOverloads'}
+    assert 'CREATE INDEX "IndexOverloadsNomNumeroLot" ON "TableOverloads" ("NomNumeroLot")' in suggestions
+    # IdLot est indexé par la migration 2 : aucun parcours complet filtré sur cette colonne
+    assert not [conseil for conseil in conseils
+                if conseil['table'] == 'TableResultats' and 'IdLot' in (conseil['index_suggere'] or '')]
+
+
+def test_etat_sans_table_des_migrations_ne_modifie_pas_le_schema(client, connexion_externe):
+    connexion_externe.execute('DROP TABLE "TableMigrations"')
+    connexion_externe.commit()
+    main.catalogue_schema.invalider()
+    etat = client.get('/Index/Migrations').get_json()
+    assert etat['version'] == 0
+    assert len(etat['en_attente']) == len(main.MIGRATIONS)
+    assert connexion_externe.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE name = 'TableMigrations'").fetchone()[0] == 0
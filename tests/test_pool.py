@@ -0,0 +1,28 @@
+"""Connexions persistantes du pool."""
+import main
+
+
+def test_connexion_reutilisee_par_le_thread(base):
+    assert main.get_db() is main.get_db()
+
+
+def test_close_imbrique_ne_defait_pas_la_transaction(base):
+    conn = main.get_db()
+    conn.execute("UPDATE TableCapteur SET Version = 'pendant-transaction'")
+    # Une fonction utilitaire qui prend et rend la connexion au milieu de l'écriture
+    main.get_db().close()
+    main.catalogue_schema.tables()
+    assert conn.in_transaction
+    conn.commit()
+    assert main.get_db().execute(
+        "SELECT COUNT(*) FROM TableCapteur WHERE Version = 'pendant-transaction'").fetchone()[0] > 0
+
+
+def test_transaction_abandonnee_annulee_en_fin_de_requete(base):
+    # Une route interrompue laisse sa transaction ouverte : teardown_request l'annule
+    with main.app.test_request_context('/TableCapteur'):
+        main.get_db().execute("UPDATE TableCapteur SET Version = 'abandonnee'")
+        assert main.get_db().in_transaction
+    conn = main.get_db()
+    assert not conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM TableCapteur WHERE Version = 'abandonnee'").fetchone()[0] == 0
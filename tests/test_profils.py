@@ -0,0 +1,47 @@
+"""Modification des droits en lot."""
+import pytest
+
+
+def profil_et_droit(client):
+    profil = client.get('/TableProfils').get_json()[0]['IdProfil']
+    droit = client.get('/TableDroits').get_json()[0]['IdDroit']
+    return profil, droit
+
+
+@pytest.mark.parametrize('id_profil', [lambda p: p, lambda p: str(p)])
+def test_lot_accepte_identifiants_entiers_ou_texte(client, id_profil):
+    profil, droit = profil_et_droit(client)
+    reponse = client.put('/profil/droits/lot', json={
+        'idProfils': [id_profil(profil)],
+        'operations': [{'idDroit': droit, 'typeAction': 'Supprimer'}]
+    })
+    assert reponse.status_code == 200, reponse.get_json()
+    assert droit not in [d['IdDroit'] for d in reponse.get_json()['profils'][0]['droits']]
+
+    reponse = client.put('/profil/droits/lot', json={
+        'idProfils': [id_profil(profil)],
+        'operations': [{'idDroit': droit, 'typeAction': 'Ajouter'}]
+    })
+    assert reponse.status_code == 200
+    assert droit in [d['IdDroit'] for d in reponse.get_json()['profils'][0]['droits']]
+
+
+@pytest.mark.parametrize('corps', [
+    {'idProfils': [1], 'operations': []},
+    {'idProfils': [], 'operations': [{'idDroit': 'x', 'typeAction': 'Ajouter'}]},
+    {'idProfils': ['abc'], 'operations': [{'idDroit': 'x', 'typeAction': 'Ajouter'}]},
+    {'idProfils': [True], 'operations': [{'idDroit': 'x', 'typeAction': 'Ajouter'}]},
+    {'idProfils': [1], 'operations': [{'idDroit': 'x', 'typeAction': 'Remplacer'}]},
+])
+def test_lot_refuse_requete_invalide(client, corps):
+    assert client.put('/profil/droits/lot', json=corps).status_code == 400
+
+
+def test_lot_profil_ou_droit_inconnu(client):
+    profil, droit = profil_et_droit(client)
+    assert client.put('/profil/droits/lot', json={
+        'idProfils': [987654], 'operations': [{'idDroit': droit, 'typeAction': 'Ajouter'}]
+    }).status_code == 404
+    assert client.put('/profil/droits/lot', json={
+        'idProfils': [profil], 'operations': [{'idDroit': 'Droit_Inexistant', 'typeAction': 'Ajouter'}]
+    }).status_code == 404
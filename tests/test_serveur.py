@@ -0,0 +1,99 @@
+"""Hooks du serveur de production."""
+import logging
+import os
+import subprocess
+import sys
+
+import pytest
+
+import main
+
+
+def test_fermer_connexions_garde_le_log_du_maitre(base):
+    ecouteur = main.configuration_logging.ecouteur
+    main.fermer_connexions()
+    assert main.configuration_logging.ecouteur is ecouteur
+    assert ecouteur._thread is not None and ecouteur._thread.is_alive()
+    # Les connexions sont rouvertes à la demande
+    assert main.get_db().execute("SELECT 1").fetchone()[0] == 1
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='fork indisponible')
+def test_log_redemarre_dans_le_worker(base):
+    main.fermer_connexions()
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            main.configuration_logging.apres_fork()
+            main.logger.warning('worker démarré')
+            ecouteur = main.configuration_logging.ecouteur
+            if ecouteur._thread.is_alive() and main.get_db().execute("SELECT 1").fetchone()[0] == 1:
+                code = 0
+            main.liberer_ressources()
+        finally:
+            os._exit(code)
+    _, statut = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(statut) == 0
+    assert main.configuration_logging.ecouteur._thread.is_alive()
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='fork indisponible')
+def test_ecriture_d_un_autre_worker_visible(client, monkeypatch):
+    monkeypatch.setattr(main.cache_reponses, 'ttl', 3600)
+    lignes = client.get('/TableOverloads').get_json()
+    id_overload = lignes[0]['IdOverload']
+    assert client.get('/TableOverloads').get_json() == lignes  # servi depuis le cache
+
+    main.fermer_connexions()
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            # Autre worker : son invalidation locale n'atteint pas le cache du parent
+            main.configuration_logging.apres_fork()
+            if main.app.test_client().delete(f'/TableOverloads/{id_overload}').status_code == 204:
+                code = 0
+            main.liberer_ressources()
+        finally:
+            os._exit(code)
+    _, statut = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(statut) == 0
+
+    reponse = client.get('/TableOverloads')
+    assert id_overload not in [ligne['IdOverload'] for ligne in reponse.get_json()]
+
+
+def test_import_sans_acces_a_la_base(tmp_path):
+    """Importer main (outil, worker avant fork) ne doit ni ouvrir ni créer la base."""
+    chemin = tmp_path / 'absente.db'
+    environnement = dict(os.environ, DATABASE_URL=f'sqlite:///{chemin}',
+                         DOSSIER_CACHE_COURBES=str(tmp_path / 'cache'))
+    subprocess.run([sys.executable, '-c', 'import main'], cwd=os.path.dirname(main.__file__),
+                   env=environnement, check=True, timeout=60)
+    assert not chemin.exists()
+
+
+def test_log_sur_les_loggers_acrn_seulement(base):
+    handler = main.configuration_logging.handler
+    assert handler in logging.getLogger('acrn').handlers
+    assert handler not in logging.getLogger().handlers
+    assert main.logger_requetes.name.startswith('acrn.')
+
+
+def test_import_ne_touche_pas_au_logging_de_l_hote(tmp_path):
+    script = (
+        'import logging\n'
+        'handler = logging.StreamHandler()\n'
+        'logging.getLogger().addHandler(handler)\n'
+        'import main\n'
+        'assert logging.getLogger().handlers == [handler]\n'
+        'assert main.configuration_logging.ecouteur is None\n'
+        'main.configuration_logging.demarrer()\n'
+        'assert logging.getLogger().handlers == [handler]\n'
+        'main.configuration_logging.arreter()\n'
+    )
+    environnement = dict(os.environ, DATABASE_URL=f'sqlite:///{tmp_path / "base.db"}',
+                         DOSSIER_CACHE_COURBES=str(tmp_path / 'cache'))
+    subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(main.__file__),
+                   env=environnement, check=True, timeout=60)